@@ -0,0 +1,220 @@
+"""Admission control for expensive routes.
+
+`AdmissionMiddleware` (pure ASGI) runs before routing, body parsing and
+validation. For each configured (method, path) it applies, in order:
+
+* a per-client token bucket; an empty bucket answers 429,
+* a concurrency limit with a bounded FIFO wait queue; a full queue, or a
+  request that waits longer than `queue_timeout`, answers 503.
+
+Both carry `Retry-After`. The client key is the connection's peer address.
+Behind proxies every request comes from the nearest proxy, so set
+`trusted_hops` to the number of proxies in front of the app: the key is then
+the X-Forwarded-For entry the outermost one appended, which clients cannot
+forge. Limits are per worker process.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+from metrics import admission_admitted, admission_in_flight, admission_queued, admission_shed
+
+
+class TokenBuckets:
+    """Per-key token buckets in an LRU map of at most `max_keys` entries.
+
+    A bucket idle long enough to have refilled completely is indistinguishable
+    from a new one, so such keys are dropped from the cold end on every call.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.refill_seconds = burst / rate
+        # key -> [tokens, last update]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Consume one token; returns 0 when allowed, else seconds until the next token."""
+        now = time.monotonic() if now is None else now
+        self._evict_idle(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def _evict_idle(self, now: float):
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < self.refill_seconds:
+                break
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """At most `limit` holders; up to `max_queue` more wait in FIFO order."""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> Optional[str]:
+        """Returns None once a slot is held, or the reason the request was shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if waiter.done():
+            return None
+        self._abandon(waiter)
+        return "queue_timeout"
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done():
+            # A slot was handed over just before we gave up; pass it on
+            self.release()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter so newcomers cannot jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+
+@dataclass
+class AdmissionRule:
+    method: str
+    path: str
+    max_concurrency: int
+    max_queue: int
+    queue_timeout: float
+    # Per-client requests per second and burst; a rate of 0 disables the buckets
+    rate: float = 0.0
+    burst: int = 1
+    max_clients: int = 10000
+
+
+REJECTIONS = {
+    429: "Muitas requisições. Tente novamente em instantes.",
+    503: "Servidor ocupado. Tente novamente em instantes.",
+}
+
+
+def client_key(scope, trusted_hops: int = 0) -> str:
+    """The address buckets are keyed on: peer address, or the X-Forwarded-For entry `trusted_hops` from the right."""
+    if trusted_hops > 0:
+        forwarded = [
+            entry.strip()
+            for name, value in scope.get("headers", [])
+            if name == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",")
+        ]
+        # Fewer entries means the request did not come through every proxy: use the peer
+        if len(forwarded) >= trusted_hops and forwarded[-trusted_hops]:
+            return forwarded[-trusted_hops]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, rules=(), trusted_hops: int = 0):
+        self.app = app
+        self.trusted_hops = trusted_hops
+        self.rules: Dict[Tuple[str, str], AdmissionRule] = {(r.method, r.path): r for r in rules}
+        self.limiters = {key: ConcurrencyLimiter(r.max_concurrency, r.max_queue, r.queue_timeout)
+                         for key, r in self.rules.items()}
+        self.buckets = {key: TokenBuckets(r.rate, r.burst, r.max_clients)
+                        for key, r in self.rules.items() if r.rate > 0}
+
+    async def __call__(self, scope, receive, send):
+        key = (scope.get("method"), scope.get("path"))
+        if scope["type"] != "http" or key not in self.rules:
+            await self.app(scope, receive, send)
+            return
+
+        rule = self.rules[key]
+        route = f"{rule.method} {rule.path}"
+
+        buckets = self.buckets.get(key)
+        if buckets is not None:
+            wait = buckets.take(client_key(scope, self.trusted_hops))
+            if wait:
+                admission_shed.inc(route, "rate_limited")
+                await self._reject(send, 429, wait)
+                return
+
+        limiter = self.limiters[key]
+        # The uncontended path never suspends, so a scrape only sees requests actually waiting
+        admission_queued.inc(route)
+        try:
+            reason = await limiter.acquire()
+        finally:
+            admission_queued.dec(route)
+        if reason:
+            admission_shed.inc(route, reason)
+            await self._reject(send, 503, rule.queue_timeout)
+            return
+
+        admission_admitted.inc(route)
+        admission_in_flight.inc(route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission_in_flight.dec(route)
+            limiter.release()
+
+    @staticmethod
+    async def _reject(send, status: int, retry_after: float):
+        body = json.dumps({"detail": REJECTIONS[status]}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
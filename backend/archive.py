@@ -0,0 +1,107 @@
+"""Archival of old closed/converted contacts out of the hot `contacts` collection.
+
+Contacts whose status is `closed` or `converted` and that have not changed for
+`older_than_days` are moved to `contacts_archive`, which list and export reads
+include on request (`include_archived=true`). Stats counters and timeseries
+rollups keep counting archived contacts.
+
+The job works in batches, newest first by (created_at, id):
+
+1. upsert the batch into the archive (keyed on `id`, so repeating it is safe),
+2. delete the same contacts from `contacts`, but only while they are still
+   eligible; a contact whose status changed meanwhile stays hot and its
+   archive copy is removed again,
+3. bump the contacts write version so ETags and cached pages move on.
+
+Every batch is complete on its own, so an interrupted run is resumed by
+running the job again. Run `python cli.py archive` to see how many contacts
+are eligible and `--apply` to move them.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from pagination import encode_cursor, keyset_filter, keyset_sort
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "contacts_archive"
+ARCHIVABLE_STATUSES = ("closed", "converted")
+# Default age, since the last change, at which closed/converted contacts are archived
+ARCHIVE_AFTER_DAYS = float(os.environ.get('ARCHIVE_AFTER_DAYS', '365'))
+
+
+def archivable_filter(older_than_days: float, now: Optional[datetime] = None) -> dict:
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    return {"status": {"$in": list(ARCHIVABLE_STATUSES)}, "updated_at": {"$lt": cutoff}}
+
+
+async def count_archivable(db, older_than_days: float) -> int:
+    return await db.contacts.count_documents(archivable_filter(older_than_days))
+
+
+async def archive_contacts(
+    db,
+    older_than_days: float,
+    batch_size: int = 1000,
+    on_batch: Optional[Callable[[], Awaitable[None]]] = None,
+) -> int:
+    """Move eligible contacts to the archive; returns how many were moved.
+
+    `on_batch` runs after every batch, once its contacts are gone from `contacts`.
+    """
+    # storage_schema imports this module for ARCHIVE_COLLECTION
+    from storage_schema import ReplaceOne
+
+    now = datetime.utcnow()
+    eligible = archivable_filter(older_than_days, now)
+    moved = 0
+    after = None
+    while True:
+        query = eligible if after is None else {"$and": [eligible, keyset_filter("created_at", after)]}
+        batch = await db.contacts.find(query, {"_id": 0}).sort(keyset_sort("created_at")).to_list(batch_size)
+        if not batch:
+            break
+        ids = [doc["id"] for doc in batch]
+
+        await db[ARCHIVE_COLLECTION].bulk_write(
+            [ReplaceOne({"id": doc["id"]}, {**doc, "archived_at": now}, upsert=True) for doc in batch],
+            ordered=False,
+        )
+        deleted = await db.contacts.delete_many({"id": {"$in": ids}, **eligible})
+        if deleted.deleted_count < len(ids):
+            # Changed between the copy and the delete: the hot copy wins
+            kept = [doc["id"] async for doc in db.contacts.find({"id": {"$in": ids}}, {"_id": 0, "id": 1})]
+            if kept:
+                await db[ARCHIVE_COLLECTION].delete_many({"id": {"$in": kept}})
+
+        moved += deleted.deleted_count
+        after = encode_cursor(batch[-1]["created_at"], batch[-1]["id"])
+        if on_batch is not None:
+            await on_batch()
+        logger.info(f"Archived {moved} contacts so far")
+    return moved
+
+
+async def _main(older_than_days: float, apply: bool, batch_size: int):
+    from conditional import WriteVersions
+    from database import create_mongo_client
+    from server import db_name, mongo_url
+    from storage_schema import storage_database
+
+    client = create_mongo_client(mongo_url)
+    db = storage_database(client[db_name])
+    try:
+        if not apply:
+            eligible = await count_archivable(db, older_than_days)
+            print(f"{eligible} closed/converted contact(s) unchanged for {older_than_days:g} days would be archived")
+            return
+        versions = WriteVersions()
+        moved = await archive_contacts(
+            db, older_than_days, batch_size, on_batch=lambda: versions.bump(db, "contacts")
+        )
+        print(f"{moved} contact(s) moved to {ARCHIVE_COLLECTION}")
+    finally:
+        client.close()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for NDJSON contact ingestion (POST /api/contacts/bulk)
+
+Streams a generated NDJSON payload through the same line splitter, validator
+and chunked insert_many used by the endpoint, against the MongoDB configured
+in backend/.env (MONGO_URL / DB_NAME), writing to a scratch collection that
+is dropped afterwards.
+
+    python benchmarks/bench_bulk_ingest.py --lines 20000 --chunk-sizes 100,500,1000,5000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bulk_ingest import ingest_lines, iter_ndjson_lines  # noqa: E402
+from database import create_mongo_client  # noqa: E402
+from server import contact_document_from_json, db_name, mongo_url  # noqa: E402
+
+SCRATCH_COLLECTION = "bench_contacts"
+READ_SIZE = 64 * 1024
+
+
+def build_payload(lines: int, invalid_every: int) -> bytes:
+    rows = []
+    for i in range(lines):
+        if invalid_every and i % invalid_every == 0:
+            rows.append(json.dumps({"name": "X", "email": "invalido", "message": "curta"}))
+        else:
+            rows.append(json.dumps({
+                "name": f"Contato {i}",
+                "email": f"contato{i}@example.com",
+                "phone": "(11) 99999-9999",
+                "service": f"Serviço {i % 7}",
+                "message": "Gostaria de saber mais sobre os serviços oferecidos pela empresa.",
+            }, ensure_ascii=False))
+    return ("\n".join(rows) + "\n").encode("utf-8")
+
+
+async def body_chunks(payload: bytes):
+    for start in range(0, len(payload), READ_SIZE):
+        yield payload[start:start + READ_SIZE]
+
+
+async def run(lines: int, chunk_sizes, invalid_every: int):
+    client = create_mongo_client(mongo_url)
+    db = client[db_name]
+    payload = build_payload(lines, invalid_every)
+    print(f"Payload: {lines} lines, {len(payload) / 1024 / 1024:.1f} MiB")
+    print(f"{'chunk':>8} {'seconds':>9} {'lines/s':>10} {'inserted':>9} {'failed':>7}")
+    try:
+        for chunk_size in chunk_sizes:
+            await db[SCRATCH_COLLECTION].drop()
+            started = time.perf_counter()
+            report = await ingest_lines(
+                iter_ndjson_lines(body_chunks(payload)), contact_document_from_json, db[SCRATCH_COLLECTION], chunk_size
+            )
+            elapsed = time.perf_counter() - started
+            print(f"{chunk_size:>8} {elapsed:>9.3f} {lines / elapsed:>10.0f} {report['inserted']:>9} {report['failed']:>7}")
+    finally:
+        await db[SCRATCH_COLLECTION].drop()
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--chunk-sizes", default="100,500,1000,5000")
+    parser.add_argument("--invalid-every", type=int, default=50, help="make every Nth line invalid (0 = none)")
+    args = parser.parse_args()
+    asyncio.run(run(args.lines, [int(size) for size in args.chunk_sizes.split(",")], args.invalid_every))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark req/s scaling of the contact endpoints across worker counts
+
+Starts `python cli.py serve --workers N` for each N in --workers (default
+1, 2, 4, ... up to the CPU count), waits for /api/health/ready, then drives the
+contact endpoints from several client processes so the load generator is not
+the bottleneck. Needs the mongod at MONGO_URL; the server writes to DB_NAME.
+
+    python benchmarks/bench_scaling.py --workers 1,2,4,8 --clients 4 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+import httpx  # noqa: E402
+
+from benchmarks.load_test import contact_payload, run_endpoint  # noqa: E402
+
+CONTACT_ENDPOINTS = ["POST /contacts", "GET /contacts"]
+
+
+def default_worker_counts():
+    cpus = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    return counts + [cpus]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "cli.py", "serve", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND,
+        # All load comes from one address, so the per-client rate limit would cap every run
+        env={**os.environ, "CONTACT_RATE_PER_MINUTE": "0"},
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with {process.returncode} before becoming ready")
+        try:
+            if httpx.get(f"{url}/api/health/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"server not ready after {timeout:.0f}s")
+
+
+def stop_server(process: subprocess.Popen):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def client_run(url: str, endpoint: str, concurrency: int, requests: int) -> dict:
+    async def run():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as http:
+            return await run_endpoint(http, endpoint, concurrency, requests)
+
+    return asyncio.run(run())
+
+
+def measure(pool, url: str, endpoint: str, clients: int, concurrency: int, requests: int) -> dict:
+    per_client = max(1, concurrency // clients)
+    started = time.perf_counter()
+    rows = pool.starmap(client_run, [(url, endpoint, per_client, requests // clients)] * clients)
+    elapsed = time.perf_counter() - started
+    total = sum(row["requests"] for row in rows)
+    return {
+        "endpoint": endpoint,
+        "requests": total,
+        "errors": sum(row["errors"] for row in rows),
+        "rps": total / elapsed if elapsed else 0.0,
+        # worst client, a conservative upper bound for the merged percentile
+        "p99_ms": max(row["p99_ms"] for row in rows),
+    }
+
+
+def seed(url: str, size: int):
+    if size <= 0:
+        return
+    lines = "\n".join(json.dumps(contact_payload(i)) for i in range(size))
+    httpx.post(f"{url}/api/contacts/bulk", content=lines.encode("utf-8"), timeout=None).raise_for_status()
+
+
+def main(args):
+    url = f"http://127.0.0.1:{args.port}"
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(args.clients) as pool:
+        for index, workers in enumerate(args.workers):
+            process = start_server(workers, args.port)
+            try:
+                wait_ready(url, process)
+                if index == 0:
+                    seed(url, args.seed)
+                for endpoint in CONTACT_ENDPOINTS:
+                    row = measure(pool, url, endpoint, args.clients, args.concurrency, args.requests)
+                    row["workers"] = workers
+                    results.append(row)
+                    print(f"workers={workers:<3} {endpoint:<16} {row['rps']:>9.0f} req/s  p99 {row['p99_ms']:.1f} ms  errors {row['errors']}")
+            finally:
+                stop_server(process)
+
+    print(f"\n{'endpoint':<16} {'workers':>7} {'req/s':>9} {'speedup':>8} {'p99 ms':>8}")
+    for endpoint in CONTACT_ENDPOINTS:
+        rows = [row for row in results if row["endpoint"] == endpoint]
+        base = rows[0]["rps"] if rows else 0
+        for row in rows:
+            speedup = row["rps"] / base if base else 0.0
+            print(f"{endpoint:<16} {row['workers']:>7} {row['rps']:>9.0f} {speedup:>7.2f}x {row['p99_ms']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump({"cpus": os.cpu_count(), "results": results}, handle, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+def int_list(value: str):
+    return [int(part) for part in value.split(",") if part]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int_list, default=default_worker_counts(), help="worker counts to compare")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--clients", type=int, default=min(4, os.cpu_count() or 1), help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="in-flight requests across all clients")
+    parser.add_argument("--requests", type=int, default=4000, help="requests per endpoint and worker count")
+    parser.add_argument("--seed", type=int, default=10000, help="contacts inserted before the first run")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the in-process contact search index (CONTACT_SEARCH_BACKEND=memory)
+
+Indexes synthetic Portuguese contacts and reports build time, memory of the
+postings and p50/p99 latency for selective and common queries. No database
+is needed. The default MongoDB text index backend is measured by
+load_test.py against a real mongod.
+
+    python benchmarks/bench_search.py --documents 100000,1000000 --queries 200
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from search_index import ContactSearchIndex  # noqa: E402
+
+FIRST_NAMES = ["João", "Maria", "José", "Ana", "Antônio", "Francisca", "Carlos", "Paulo", "Luíza", "Márcia"]
+LAST_NAMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Gonçalves"]
+SERVICES = ["Consultoria Empresarial", "Planejamento Estratégico", "Gestão Financeira", "Auditoria", "Treinamento"]
+WORDS = (
+    "gostaria saber mais sobre serviços consultoria empresa preciso ajuda planejamento estratégico orçamento "
+    "auditoria contábil gestão financeira equipe treinamento prazo urgente reunião proposta fiscal tributário "
+    "custos processos indústria comércio licitação obra engenharia topografia levantamento georreferenciamento"
+).split()
+
+# Synthetic messages draw from a small vocabulary, so message terms match a large share of contacts
+QUERIES = {
+    "selective": ["joao goncalves", "contato123@example.com", "luiza ferreira auditoria", "marcia topografia"],
+    "common": ["consultoria", "gestao financeira", "topografia urgente", "servicos empresa"],
+}
+
+
+def make_contact(i: int, now: datetime, rng: random.Random) -> dict:
+    return {
+        "id": f"c{i}",
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "email": f"contato{i}@example.com",
+        "service": rng.choice(SERVICES),
+        "message": " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 40))),
+        "created_at": now + timedelta(seconds=i),
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run(documents: int, queries: int):
+    rng = random.Random(documents)
+    now = datetime.utcnow()
+    index = ContactSearchIndex()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(documents):
+        index.add(make_contact(i, now, rng))
+    build = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{documents:>9} docs: built in {build:.1f}s, {memory / 1e6:.0f} MB, {index.stats()['terms']} terms")
+
+    for kind, texts in QUERIES.items():
+        latencies, matches = [], 0
+        for n in range(queries):
+            started = time.perf_counter()
+            total, _ = index.search(texts[n % len(texts)], 0, 20)
+            latencies.append(time.perf_counter() - started)
+            matches += total
+        print(
+            f"{'':>9}   {kind:<9} p50 {percentile(latencies, 0.5) * 1000:8.2f} ms  "
+            f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms  avg matches {matches // queries}"
+        )
+
+
+def int_list(value: str):
+    return [int(part) for part in value.split(",") if part]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int_list, default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=100, help="queries per kind")
+    args = parser.parse_args()
+    for size in args.documents:
+        run(size, args.queries)
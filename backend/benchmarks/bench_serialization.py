@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for GET /api/contacts list responses
+
+Compares, for pages of 50, 500 and 5000 rows shaped like Motor results:
+
+  legacy  - Contact(**row) per row, ContactsListResponse, then FastAPI's own
+            response_model validation/serialization and JSONResponse
+  fast    - projected dicts encoded directly by FastJSONResponse
+
+No database is needed; rows are generated in memory.
+
+    python benchmarks/bench_serialization.py --sizes 50,500,5000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+from fast_json import FastJSONResponse, orjson  # noqa: E402
+from server import CONTACT_PROJECTION, Contact, ContactsListResponse, app  # noqa: E402
+
+
+def make_rows(count: int, with_id: bool) -> list:
+    now = datetime.utcnow().replace(microsecond=0)
+    rows = []
+    for i in range(count):
+        row = {
+            "id": str(uuid.uuid4()),
+            "name": f"Contato {i}",
+            "email": f"contato{i}@example.com",
+            "phone": "(11) 99999-9999",
+            "service": "Consultoria Empresarial",
+            "message": "Gostaria de saber mais sobre os serviços de consultoria para minha empresa. " * 3,
+            "status": "new",
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now - timedelta(seconds=i),
+        }
+        if with_id:
+            row["_id"] = ObjectId()
+        rows.append(row)
+    return rows
+
+
+def contacts_response_field():
+    for route in app.routes:
+        if getattr(route, "path", None) == "/api/contacts" and "GET" in route.methods:
+            return route.secure_cloned_response_field
+    raise RuntimeError("GET /api/contacts route not found")
+
+
+async def legacy_path(rows, field) -> bytes:
+    response = ContactsListResponse(success=True, contacts=[Contact(**row) for row in rows], total=len(rows))
+    content = await serialize_response(field=field, response_content=response, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def fast_path(rows, field) -> bytes:
+    # Motor already applied CONTACT_PROJECTION, so rows carry no _id
+    return FastJSONResponse({"success": True, "contacts": rows, "total": len(rows), "next_cursor": None}).body
+
+
+async def measure(path, rows, field, repeat: int) -> float:
+    await path(rows, field)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await path(rows, field)
+    return len(rows) * repeat / (time.perf_counter() - started)
+
+
+async def run(sizes, repeat: int):
+    field = contacts_response_field()
+    print(f"encoder: {'orjson' if orjson is not None else 'json (stdlib)'}; projected fields: {sorted(k for k, v in CONTACT_PROJECTION.items() if v)}")
+    print(f"{'rows':>6} {'legacy rows/s':>15} {'fast rows/s':>13} {'speedup':>8}")
+    for size in sizes:
+        legacy = await measure(legacy_path, make_rows(size, with_id=True), field, repeat)
+        fast = await measure(fast_path, make_rows(size, with_id=False), field, repeat)
+        print(f"{size:>6} {legacy:>15.0f} {fast:>13.0f} {fast / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="50,500,5000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run([int(size) for size in args.sizes.split(",")], args.repeat))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Validation throughput benchmark for ContactCreate
+
+Reports validations/sec for valid and invalid payloads, from Python dicts
+(what FastAPI hands the model) and from raw JSON (the bulk/batch entry point),
+for both the current model and a copy of the previous v1-style model
+(@validator hooks, re.match with an uncompiled pattern, uncached EmailStr).
+The "unique emails" rows run with an empty email cache and never hit it:
+there the current model gains nothing (~5.5k/s before and after), since
+email-validator dominates. The speedup on repeated payloads comes entirely
+from the email cache.
+
+    python benchmarks/bench_validation.py --iterations 20000
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydantic import BaseModel, EmailStr, Field, ValidationError  # noqa: E402
+
+from server import ContactCreate, _check_email  # noqa: E402
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from pydantic import validator
+
+    class LegacyContactCreate(BaseModel):
+        name: str = Field(..., min_length=2, max_length=100)
+        email: EmailStr
+        phone: Optional[str] = Field(None, max_length=20)
+        service: Optional[str] = Field(None, max_length=100)
+        message: str = Field(..., min_length=10, max_length=1000)
+
+        @validator('name')
+        def validate_name(cls, v):
+            if not v.strip():
+                raise ValueError('Nome não pode estar vazio')
+            return v.strip()
+
+        @validator('phone')
+        def validate_phone(cls, v):
+            if v and v.strip():
+                phone_pattern = r'^[\(\)\+\-\s\d]+$'
+                if not re.match(phone_pattern, v.strip()):
+                    raise ValueError('Telefone inválido')
+                return v.strip()
+            return None
+
+        @validator('message')
+        def validate_message(cls, v):
+            if not v.strip():
+                raise ValueError('Mensagem não pode estar vazia')
+            return v.strip()
+
+
+VALID = {
+    "name": "João Silva",
+    "email": "joao.silva@email.com",
+    "phone": "(11) 99999-9999",
+    "service": "Consultoria Empresarial",
+    "message": "Gostaria de saber mais sobre os serviços de consultoria para minha empresa.",
+}
+# Typical form spam: bad phone plus a too-short message
+INVALID = {
+    "name": "Spam Bot",
+    "email": "bot@spam.example",
+    "phone": "call-me-now",
+    "message": "buy now",
+}
+
+
+def rate(validate, payloads, iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        try:
+            validate(payloads[i % len(payloads)])
+        except ValidationError:
+            pass
+    return iterations / (time.perf_counter() - started)
+
+
+def run(iterations: int):
+    # Distinct addresses defeat the email cache and show the cold-path cost
+    unique = [dict(VALID, email=f"contato{i}@empresa{i % 97}.com.br") for i in range(iterations)]
+    scenarios = [
+        ("valid", [VALID]),
+        ("valid, unique emails", unique),
+        ("invalid", [INVALID]),
+    ]
+    models = [("before", LegacyContactCreate), ("after", ContactCreate)]
+    print(f"{'model':<7} {'input':<5} {'payload':<21} {'validations/s':>14}")
+    for kind in ("dict", "json"):
+        for name, payloads in scenarios:
+            if kind == "json":
+                payloads = [json.dumps(payload).encode() for payload in payloads]
+            for label, model in models:
+                validate = model.model_validate if kind == "dict" else model.model_validate_json
+                rate(validate, payloads[-1:], 100)  # warm-up
+                if name == "valid, unique emails":
+                    # Otherwise the previous pass over the same addresses left them cached
+                    _check_email.cache_clear()
+                print(f"{label:<7} {kind:<5} {name:<21} {rate(validate, payloads, iterations):>14.0f}")
+    print("unique emails: cold email validation, no gain; repeated emails: the speedup is the email cache")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.iterations)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Local load test and latency benchmark for every API route
+
+Drives the FastAPI app in-process through httpx's ASGI transport (default) or
+a locally started server (--url http://127.0.0.1:8001), and reports p50 / p95 /
+p99 latency and req/s per endpoint for each concurrency level and dataset
+size. Results can be written as JSON and compared against an earlier run:
+
+    python benchmarks/load_test.py --db memory --concurrency 1,16,64 --datasets 0,10000 --json after.json
+    python benchmarks/load_test.py --db memory --compare before.json
+
+In-process runs use either an in-memory MongoDB stand-in (--db memory,
+needs mongomock-motor) or the mongod at MONGO_URL (--db mongod), writing to a
+scratch database (--bench-db) that is dropped between datasets. With --url
+the target server's own database is used and seeded through
+POST /api/contacts/bulk; start it with CONTACT_RATE_PER_MINUTE=0 so the
+per-client rate limit does not reject the load.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+SERVICES = ["Consultoria Empresarial", "Planejamento Estratégico", "Gestão Financeira", "Auditoria", "Treinamento"]
+
+
+def contact_payload(i: int) -> dict:
+    return {
+        "name": f"Contato {i}",
+        "email": f"contato{i}@example.com",
+        "phone": "(11) 99999-9999",
+        "service": SERVICES[i % len(SERVICES)],
+        "message": "Gostaria de saber mais sobre os serviços de consultoria para minha empresa.",
+    }
+
+
+# name -> (method, path, body factory)
+ENDPOINTS = {
+    "POST /contacts": ("POST", "/api/contacts", lambda i: contact_payload(random.randrange(10**9))),
+    "GET /contacts": ("GET", "/api/contacts?limit=50", None),
+    "GET /contacts sum": ("GET", "/api/contacts?limit=50&fields=summary", None),
+    "GET /stats": ("GET", "/api/stats", None),
+    "POST /status": ("POST", "/api/status", lambda i: {"client_name": f"client-{i % 20}"}),
+    "GET /status": ("GET", "/api/status?limit=100", None),
+}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+async def run_endpoint(http: httpx.AsyncClient, name: str, concurrency: int, requests: int) -> dict:
+    method, path, body = ENDPOINTS[name]
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < requests:
+            i = issued
+            issued += 1
+            started = time.perf_counter()
+            try:
+                response = await http.request(method, path, json=body(i) if body else None)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def seed(http: httpx.AsyncClient, size: int, chunk: int = 5000):
+    for start in range(0, size, chunk):
+        lines = "\n".join(json.dumps(contact_payload(i)) for i in range(start, min(size, start + chunk)))
+        response = await http.post("/api/contacts/bulk", content=lines.encode("utf-8"), timeout=None)
+        response.raise_for_status()
+
+
+def use_database(server, mode: str, bench_db: str):
+    """Point the app at a fresh scratch database for one dataset."""
+    if mode == "memory":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise SystemExit("--db memory needs mongomock-motor (pip install mongomock-motor)")
+        server.client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        server.client = AsyncIOMotorClient(server.mongo_url)
+    server.db = server.storage_database(server.client[bench_db])
+    server.response_cache.invalidate()
+
+
+async def run_dataset(args, dataset: int, endpoints) -> list:
+    if args.url:
+        http = httpx.AsyncClient(base_url=args.url, timeout=30)
+        async with http:
+            await seed(http, dataset)
+            return [await run_endpoint(http, name, c, args.requests) for c in args.concurrency for name in endpoints]
+
+    if args.db == "memory":
+        # server.py insists on these even though the stand-in never connects
+        os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+        os.environ.setdefault("DB_NAME", args.bench_db)
+    # Every request comes from one client address; keep the per-client limit out of the numbers
+    os.environ.setdefault("CONTACT_RATE_PER_MINUTE", "0")
+    import server
+
+    # Per-request INFO lines would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    use_database(server, args.db, args.bench_db)
+    await server.client.drop_database(args.bench_db)
+    results = []
+    try:
+        async with server.app.router.lifespan_context(server.app):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as http:
+                await seed(http, dataset)
+                for concurrency in args.concurrency:
+                    for name in endpoints:
+                        results.append(await run_endpoint(http, name, concurrency, args.requests))
+    finally:
+        await server.client.drop_database(args.bench_db)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_table(results):
+    print(f"{'dataset':>8} {'endpoint':<16} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for row in results:
+        print(
+            f"{row['dataset']:>8} {row['endpoint']:<16} {row['concurrency']:>5} {row['rps']:>9.0f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['errors']:>7}"
+        )
+
+
+def print_comparison(results, baseline_path: str):
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    previous = {(r["dataset"], r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit', '?')}):")
+    print(f"{'dataset':>8} {'endpoint':<16} {'conc':>5} {'req/s':>9} {'p95':>9} {'p99':>9}")
+    for row in results:
+        old = previous.get((row["dataset"], row["endpoint"], row["concurrency"]))
+        if not old:
+            continue
+
+        def change(key):
+            return f"{(row[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else "n/a"
+
+        print(f"{row['dataset']:>8} {row['endpoint']:<16} {row['concurrency']:>5} {change('rps'):>9} {change('p95_ms'):>9} {change('p99_ms'):>9}")
+
+
+async def main(args):
+    endpoints = args.endpoints or list(ENDPOINTS)
+    results = []
+    for dataset in args.datasets:
+        for row in await run_dataset(args, dataset, endpoints):
+            row["dataset"] = dataset
+            results.append(row)
+
+    print_table(results)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "target": args.url or f"asgi+{args.db}",
+        "requests_per_run": args.requests,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+def int_list(value: str):
+    return [int(part) for part in value.split(",") if part]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--db", choices=["memory", "mongod"], default="memory", help="database for in-process runs")
+    parser.add_argument("--bench-db", default=os.environ.get("BENCH_DB_NAME", "mensura_maat_bench"))
+    parser.add_argument("--concurrency", type=int_list, default=[1, 16, 64])
+    parser.add_argument("--datasets", type=int_list, default=[0, 10000], help="contacts seeded before each run")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint and concurrency level")
+    parser.add_argument("--endpoints", type=lambda v: v.split(","), help=f"subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,122 @@
+"""Streaming NDJSON ingestion for POST /api/contacts/bulk.
+
+The request body is consumed chunk by chunk and split into lines as it
+arrives, so memory is bounded by `chunk_size` documents plus one line, not by
+the size of the upload. Each line is validated independently and the valid
+ones are inserted with `insert_many(ordered=False)` one chunk at a time.
+"""
+
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+MAX_LINE_BYTES = 64 * 1024
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Yield `(line_number, line)` for each non-blank line of an NDJSON stream.
+
+    Lines longer than `max_line_bytes` are yielded as `None` (and skipped
+    without being buffered) so one runaway line cannot exhaust memory.
+    """
+    buffer = b""
+    line_number = 0
+    oversized = False
+    async for chunk in chunks:
+        if oversized:
+            # Discard the rest of an oversized line up to its newline
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                continue
+            line_number += 1
+            oversized = False
+            yield line_number, None
+            chunk = chunk[newline + 1:]
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            line_number += 1
+            if len(line) > max_line_bytes:
+                yield line_number, None
+            elif line.strip():
+                yield line_number, line
+        if len(buffer) > max_line_bytes:
+            oversized = True
+            buffer = b""
+    if oversized:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, buffer
+
+
+async def ingest_lines(
+    lines: AsyncIterator[Tuple[int, Optional[bytes]]],
+    build_document: Callable[[bytes], dict],
+    collection,
+    chunk_size: int,
+    on_stored: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+) -> dict:
+    """Validate and insert NDJSON lines in chunks, returning per-line results.
+
+    `build_document` turns a raw line into the document to store and raises
+    `ValueError` (pydantic's ValidationError included) for invalid input.
+    """
+    results = []
+    pending: List[Tuple[int, dict]] = []
+
+    async def flush():
+        documents = [document for _, document in pending]
+        failed = {}
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error.get("errmsg", "write error") for error in e.details.get("writeErrors", [])}
+        except PyMongoError as e:
+            # Which documents landed is unknown: report the whole chunk and go on with the next one
+            failed = dict.fromkeys(range(len(documents)), f"Falha ao gravar no banco: {e}")
+        stored = []
+        for position, (line_number, document) in enumerate(pending):
+            if position in failed:
+                results.append({"line": line_number, "success": False, "errors": [failed[position]]})
+            else:
+                stored.append(document)
+                results.append({"line": line_number, "success": True, "contact_id": document["id"]})
+        pending.clear()
+        if stored and on_stored is not None:
+            await on_stored(stored)
+
+    async for line_number, line in lines:
+        if line is None:
+            results.append({"line": line_number, "success": False, "errors": ["Linha excede o tamanho máximo"]})
+            continue
+        try:
+            pending.append((line_number, build_document(line)))
+        except ValueError as e:
+            results.append({"line": line_number, "success": False, "errors": _error_messages(e)})
+            continue
+        if len(pending) >= chunk_size:
+            await flush()
+    if pending:
+        await flush()
+
+    # Validation failures are recorded before their chunk's successes
+    results.sort(key=lambda result: result["line"])
+    inserted = sum(1 for result in results if result["success"])
+    return {
+        "success": inserted == len(results),
+        "received": len(results),
+        "inserted": inserted,
+        "failed": len(results) - inserted,
+        "results": results,
+    }
+
+
+def _error_messages(error: ValueError) -> List[str]:
+    if hasattr(error, "errors"):
+        return [
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" if item["loc"] else item["msg"]
+            for item in error.errors()
+        ]
+    return [str(error)]
@@ -0,0 +1,117 @@
+"""Small in-process async cache for read endpoints.
+
+Entries are kept in a bounded LRU. Each entry is fresh for `ttl` seconds and
+may then be served stale for `stale_ttl` more seconds while a single
+background task reloads it. Concurrent misses for the same key share one
+load (single-flight), so a burst of dashboard polls costs one MongoDB query.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        stale_ttl: float = 0.0,
+    ) -> Any:
+        """Return the cached value for `key`, loading it with `loader` if needed."""
+        if ttl <= 0 or self.max_entries <= 0:
+            return await loader()
+
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            if now < stale_until:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    task = self._start_load(key, loader, ttl, stale_ttl)
+                    self._background.add(task)
+                    task.add_done_callback(self._finish_background)
+                return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = self._start_load(key, loader, ttl, stale_ttl)
+        else:
+            self.coalesced += 1
+        # Shielded so one cancelled request does not cancel the shared load
+        return await asyncio.shield(task)
+
+    def _start_load(self, key, loader, ttl, stale_ttl) -> asyncio.Task:
+        task = asyncio.ensure_future(self._load(key, loader, ttl, stale_ttl))
+        self._inflight[key] = task
+        return task
+
+    async def _load(self, key, loader, ttl, stale_ttl):
+        try:
+            value = await loader()
+        except BaseException:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+            raise
+        # Only store if no invalidation happened while loading
+        if self._inflight.get(key) is asyncio.current_task():
+            del self._inflight[key]
+            now = time.monotonic()
+            self._store(key, (value, now + ttl, now + ttl + stale_ttl))
+        return value
+
+    def _store(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _finish_background(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background cache refresh failed: {str(task.exception())}")
+
+    def invalidate(self, prefix: str = ""):
+        """Drop every entry (and pending load) whose key starts with `prefix`."""
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+            self.invalidations += 1
+        for key in [k for k in self._inflight if k.startswith(prefix)]:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
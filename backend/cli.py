@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Command line entry point for the Mensura Maat API
+
+    python cli.py serve --workers 4 --port 8001
+    python cli.py indexes --apply
+    python cli.py stats-counters --apply
+    python cli.py rollups --apply
+    python cli.py archive --days 365 --apply
+    python cli.py storage-schema --apply
+    python cli.py outbox --retry-dead
+    python cli.py smtp-sink --port 1025
+
+`serve` binds the listening socket once and runs N uvicorn worker processes
+on it. Workers are started with `spawn`, so each one imports the app fresh
+and opens its own MongoDB pool in the lifespan (nothing is inherited across
+a fork). Send SIGHUP to the launcher for a rolling restart: workers are
+replaced one at a time and an old worker is only stopped once its
+replacement has finished startup. Workers that die are restarted with an
+exponential backoff (1s doubling up to 60s); after `--max-restarts` crashes
+in a row the launcher stops and exits with status 1.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import typer
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+logger = logging.getLogger("mensura.launcher")
+
+cli = typer.Typer(help="Mensura Maat API management commands", add_completion=False)
+
+spawn = multiprocessing.get_context("spawn")
+
+
+def default_workers() -> int:
+    """WEB_CONCURRENCY if set, otherwise one worker per CPU."""
+    if os.environ.get("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    return max(1, os.cpu_count() or 1)
+
+
+class ShutdownAwareServer(uvicorn.Server):
+    """Ends the open live-feed streams as soon as a stop is requested.
+
+    Uvicorn runs the lifespan shutdown only after connections drain, so SSE
+    clients would otherwise keep a stopping worker up for the whole graceful
+    timeout.
+    """
+
+    def handle_exit(self, sig, frame) -> None:
+        super().handle_exit(sig, frame)
+        # Already imported by the worker (config "server:app"); never import from a signal handler
+        app_module = sys.modules.get("server")
+        if app_module is not None:
+            app_module.live_feed.close()
+
+
+def _run_worker(config: uvicorn.Config, sockets, ready) -> None:
+    """Child process body: serve on the inherited socket, flag readiness."""
+    config.configure_logging()
+    server = ShutdownAwareServer(config)
+
+    async def serve():
+        task = asyncio.ensure_future(server.serve(sockets=sockets))
+        # server.started flips once the lifespan startup (pool warm-up, indexes) is done
+        while not server.started and not task.done():
+            await asyncio.sleep(0.05)
+        if server.started:
+            ready.set()
+        await task
+
+    asyncio.run(serve())
+    if not server.started:
+        # uvicorn returns normally when the lifespan startup fails: let the launcher count it as a crash
+        raise SystemExit(1)
+
+
+class Worker:
+    def __init__(self, config: uvicorn.Config, sockets):
+        self.ready = spawn.Event()
+        self.process = spawn.Process(target=_run_worker, args=(config, sockets, self.ready), daemon=False)
+        self.process.start()
+        self.started_at = time.monotonic()
+
+    def stop(self, timeout: float):
+        """SIGTERM lets uvicorn finish in-flight requests and run the lifespan shutdown."""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning(f"Worker {self.process.pid} did not stop in {timeout:.0f}s, killing it")
+            self.process.kill()
+            self.process.join()
+
+
+# A worker that ran this long before exiting counts as healthy: its restart backoff starts over
+STABLE_WORKER_SECONDS = 60.0
+
+
+class Launcher:
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        ready_timeout: float,
+        graceful_timeout: float,
+        max_restarts: int = 10,
+        max_backoff: float = 60.0,
+    ):
+        self.config = config
+        self.count = workers
+        self.ready_timeout = ready_timeout
+        self.graceful_timeout = graceful_timeout
+        self.max_restarts = max_restarts
+        self.max_backoff = max_backoff
+        self.sockets = [config.bind_socket()]
+        # None while a crashed worker's slot waits out its backoff
+        self.workers: List[Optional[Worker]] = []
+        self.crashes: List[int] = []
+        self.restart_at: List[float] = []
+        self.failed = False
+        self.should_exit = threading.Event()
+        self.should_reload = threading.Event()
+
+    def spawn_worker(self, wait_ready: bool) -> Optional[Worker]:
+        worker = Worker(self.config, self.sockets)
+        if wait_ready and not worker.ready.wait(self.ready_timeout):
+            logger.error(f"Worker {worker.process.pid} not ready after {self.ready_timeout:.0f}s")
+            worker.stop(self.graceful_timeout)
+            return None
+        logger.info(f"Worker {worker.process.pid} started")
+        return worker
+
+    def rolling_restart(self):
+        logger.info("Rolling restart requested")
+        for index, old in enumerate(list(self.workers)):
+            replacement = self.spawn_worker(wait_ready=True)
+            if replacement is None:
+                logger.error("Aborting rolling restart; remaining workers keep running")
+                return
+            self.workers[index] = replacement
+            # A fresh worker gets a fresh restart budget
+            self.crashes[index] = 0
+            if old is not None:
+                old.stop(self.graceful_timeout)
+        logger.info("Rolling restart finished")
+
+    def check_worker(self, index: int):
+        """Restart a crashed worker after an exponential backoff, within the restart budget."""
+        worker, now = self.workers[index], time.monotonic()
+        if worker is None:
+            if now >= self.restart_at[index]:
+                self.workers[index] = self.spawn_worker(wait_ready=False)
+            return
+        if worker.process.is_alive() or self.should_exit.is_set():
+            return
+        if now - worker.started_at >= STABLE_WORKER_SECONDS:
+            self.crashes[index] = 0
+        self.crashes[index] += 1
+        if self.crashes[index] > self.max_restarts:
+            logger.error(
+                f"Worker {worker.process.pid} exited with {worker.process.exitcode} after "
+                f"{self.max_restarts} restarts in a row, giving up"
+            )
+            self.failed = True
+            self.should_exit.set()
+            return
+        delay = min(self.max_backoff, 2 ** (self.crashes[index] - 1))
+        logger.warning(
+            f"Worker {worker.process.pid} exited with {worker.process.exitcode}, restarting in {delay:.0f}s "
+            f"({self.crashes[index]}/{self.max_restarts})"
+        )
+        self.workers[index] = None
+        self.restart_at[index] = now + delay
+
+    def run(self):
+        signal.signal(signal.SIGINT, lambda *_: self.should_exit.set())
+        signal.signal(signal.SIGTERM, lambda *_: self.should_exit.set())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: self.should_reload.set())
+
+        logger.info(f"Launcher {os.getpid()} starting {self.count} worker(s) on {self.config.host}:{self.config.port}")
+        self.workers = [self.spawn_worker(wait_ready=False) for _ in range(self.count)]
+        self.crashes = [0] * self.count
+        self.restart_at = [0.0] * self.count
+
+        while not self.should_exit.wait(0.5):
+            if self.should_reload.is_set():
+                self.should_reload.clear()
+                self.rolling_restart()
+            for index in range(len(self.workers)):
+                self.check_worker(index)
+
+        logger.info("Stopping workers")
+        workers = [worker for worker in self.workers if worker is not None]
+        for worker in workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for worker in workers:
+            worker.stop(self.graceful_timeout)
+        for sock in self.sockets:
+            sock.close()
+        if self.failed:
+            # Leave it to the process supervisor (systemd, the orchestrator) to decide what next
+            raise SystemExit(1)
+
+
+@cli.command()
+def serve(
+    host: str = typer.Option("0.0.0.0", help="Interface to bind"),
+    port: int = typer.Option(8001, help="Port to bind"),
+    workers: int = typer.Option(default_workers(), help="Worker processes (default: WEB_CONCURRENCY or CPU count)"),
+    ready_timeout: float = typer.Option(60.0, help="Seconds a new worker may take to finish startup"),
+    graceful_timeout: float = typer.Option(30.0, help="Seconds a stopping worker may take to drain"),
+    max_restarts: int = typer.Option(10, help="Crash restarts in a row (with backoff up to 60s) before the launcher exits"),
+    log_level: str = typer.Option("info"),
+):
+    """Run the API with N worker processes sharing one socket."""
+    logging.basicConfig(level=log_level.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = uvicorn.Config(
+        "server:app",
+        host=host,
+        port=port,
+        log_level=log_level,
+        timeout_graceful_shutdown=int(graceful_timeout),
+        proxy_headers=True,
+    )
+    if workers == 1:
+        server = ShutdownAwareServer(config)
+        server.run()
+        if not server.started:
+            raise SystemExit(1)
+        return
+    Launcher(config, workers, ready_timeout, graceful_timeout, max_restarts=max_restarts).run()
+
+
+@cli.command()
+def indexes(apply: bool = typer.Option(False, help="Create missing indexes instead of only reporting")):
+    """Report the indexes the API relies on."""
+    from indexes import _main
+
+    asyncio.run(_main(apply))
+
+
+@cli.command("stats-counters")
+def stats_counters(apply: bool = typer.Option(False, help="Rewrite counters from the contacts collection")):
+    """Compare (and optionally rebuild) the GET /api/stats counters."""
+    from stats_counters import _main
+
+    asyncio.run(_main(apply))
+
+
+@cli.command()
+def rollups(
+    apply: bool = typer.Option(False, help="Rewrite rollups from the contacts collection"),
+    settle_days: int = typer.Option(1, help="Leave the buckets of the last N days to the live increments"),
+):
+    """Compare (and optionally rebuild) the GET /api/stats/timeseries rollups of settled days."""
+    from stats_timeseries import _main
+
+    asyncio.run(_main(apply, settle_days))
+
+
+@cli.command()
+def archive(
+    days: Optional[float] = typer.Option(None, help="Archive contacts unchanged for this many days (default: ARCHIVE_AFTER_DAYS or 365)"),
+    apply: bool = typer.Option(False, help="Move the contacts instead of only counting them"),
+    batch_size: int = typer.Option(1000, help="Contacts moved per batch"),
+):
+    """Move old closed/converted contacts to contacts_archive (resumable)."""
+    from archive import ARCHIVE_AFTER_DAYS, _main
+
+    asyncio.run(_main(ARCHIVE_AFTER_DAYS if days is None else days, apply, batch_size))
+
+
+@cli.command("storage-schema")
+def storage_schema(
+    apply: bool = typer.Option(False, help="Re-key ObjectId documents and drop the unique id indexes"),
+    strip: bool = typer.Option(False, help="With --apply: remove id fields and id indexes (every worker on STORAGE_SCHEMA=compact)"),
+    batch_size: int = typer.Option(1000, help="Documents per batch"),
+):
+    """Report (and migrate to) the compact storage schema; see storage_schema.py for the steps."""
+    from storage_schema import _main
+
+    asyncio.run(_main(apply, strip, batch_size))
+
+
+@cli.command()
+def outbox(retry_dead: bool = typer.Option(False, help="Give dead-lettered notifications a fresh set of attempts")):
+    """Count outbox notifications by status and kind."""
+    from notifications import _main
+
+    asyncio.run(_main(retry_dead))
+
+
+@cli.command("smtp-sink")
+def smtp_sink(
+    host: str = typer.Option("127.0.0.1", help="Interface to bind"),
+    port: int = typer.Option(1025, help="Port to bind"),
+):
+    """Local SMTP server that accepts and prints every message (point NOTIFY_SMTP_HOST/PORT at it)."""
+    from notifications import SMTPSink
+
+    async def run():
+        sink = SMTPSink()
+        await sink.start(host, port)
+        typer.echo(f"SMTP sink listening on {host}:{port}")
+        printed = 0
+        while True:
+            await asyncio.sleep(0.5)
+            for message in sink.messages[printed:]:
+                typer.echo(f"--- To: {message['To']} | Subject: {message['Subject']}\n{message.get_content()}")
+            printed = len(sink.messages)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,201 @@
+"""Negotiated gzip / brotli compression of large text responses.
+
+`CompressionMiddleware` picks the best encoding the client accepts
+(`Accept-Encoding` q-values; brotli first when the `brotli` package is
+installed) and compresses JSON, NDJSON, CSV and other text bodies once they
+reach `minimum_size` bytes. Streaming responses are compressed chunk by chunk;
+`text/event-stream` is never touched, since buffering in the compressor would
+hold events back.
+
+Every response with a compressible type carries `Vary: Accept-Encoding`,
+including identity ones (no Accept-Encoding, or a body below `minimum_size`),
+so shared caches never serve a stored gzip body to a client that cannot read
+it, or the reverse. A compressed body is a different representation, so a
+strong ETag gets the encoding appended ("abc" -> "abc-gzip"), as Apache does; `strip_encoding`
+undoes that when If-None-Match comes back.
+"""
+
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from metrics import compression_bytes_in, compression_bytes_out
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+EXCLUDED_TYPES = ("text/event-stream",)
+ETAG_SUFFIXES = ("-br", "-gzip")
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    accepted = accepted_encodings(header)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def strip_encoding(etag: str) -> str:
+    """The ETag the application issued, without the suffix added on compression."""
+    for suffix in ETAG_SUFFIXES:
+        if etag.endswith(suffix + '"'):
+            return etag[:-len(suffix) - 1] + '"'
+    return etag
+
+
+class _Encoder:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self.encoding == "br" else self._gzip.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self.encoding == "br" else self._gzip.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+        # Identity responses are still negotiated: they need Vary too
+        encoding = choose_encoding(accept) if accept else None
+        await self.app(scope, receive, _Responder(self, encoding, send).send)
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether compression pays off
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = list(start.get("headers", []))
+            # A 304 stands for the negotiated 200 and must repeat its Vary
+            negotiable = start["status"] == 304 or self._negotiable(headers)
+            if (
+                self.encoding is None
+                or not negotiable
+                or not self._compressible(start["status"])
+                or (not more_body and len(body) < self.middleware.minimum_size)
+            ):
+                self.passthrough = True
+                await self.downstream({**start, "headers": self._vary(headers)} if negotiable else start)
+            else:
+                self.encoder = _Encoder(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+                headers = self._compressed_headers(headers)
+                if not more_body:
+                    # Whole body in one message: send it with its compressed length
+                    compressed = self._compress(body, more_body)
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await self.downstream({**start, "headers": headers})
+                    await self.downstream({"type": "http.response.body", "body": compressed})
+                    return
+                # Streaming: the compressed length is unknown, so the body goes out chunked
+                await self.downstream({**start, "headers": headers})
+
+        if self.passthrough:
+            await self.downstream(message)
+            return
+        compressed = self._compress(body, more_body)
+        await self.downstream({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    def _compress(self, body: bytes, more_body: bool) -> bytes:
+        compressed = self.encoder.compress(body)
+        if not more_body:
+            compressed += self.encoder.finish()
+        compression_bytes_in.inc(self.encoding, amount=len(body))
+        compression_bytes_out.inc(self.encoding, amount=len(compressed))
+        return compressed
+
+    @staticmethod
+    def _compressible(status: int) -> bool:
+        return status >= 200 and status not in (204, 304)
+
+    @staticmethod
+    def _negotiable(headers: List[Tuple[bytes, bytes]]) -> bool:
+        """Whether this body type is one we would compress for a client that accepts it."""
+        content_type = ""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        if content_type.startswith(EXCLUDED_TYPES):
+            return False
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+        vary = [value for name, value in headers if name == b"vary"]
+        if any(b"accept-encoding" in value.lower() or value.strip() == b"*" for value in vary):
+            return headers
+        result = [(name, value) for name, value in headers if name != b"vary"]
+        result.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        return result
+
+    def _compressed_headers(self, headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+        result = [(name, value) for name, value in self._vary(headers) if name not in (b"content-length", b"etag")]
+        result.append((b"content-encoding", self.encoding.encode("latin-1")))
+        for name, value in headers:
+            if name == b"etag":
+                if value.startswith(b'"'):
+                    value = value[:-1] + f'-{self.encoding}"'.encode("latin-1")
+                result.append((name, value))
+        return result
@@ -0,0 +1,80 @@
+"""Write versions and strong ETags for conditional GETs.
+
+Every write to a collection replaces a random token in the `write_versions`
+collection (`{"_id": "contacts", "token": "…"}`). Read endpoints build their
+ETag from the tokens of the collections they read, so an `If-None-Match` that
+still matches is answered with 304 before any query runs or any JSON is
+encoded.
+
+Tokens are cached per worker for `ttl` seconds; a worker's own writes update
+its cache immediately. The token is read before the data, and bumped only
+after a write (and its counters) are stored, so a body is never older than
+the ETag it is sent with. A cached token can be up to `ttl` behind another
+worker's write, which would answer a revalidation with a stale 304, so
+requests carrying If-None-Match read the token uncached (`fresh`): one
+primary-key lookup, still far cheaper than the query it saves. Random tokens,
+rather than counters, cannot repeat if the version documents are ever dropped.
+"""
+
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from compression import strip_encoding
+
+COLLECTION = "write_versions"
+
+
+def new_token() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class WriteVersions:
+    def __init__(self, ttl: float = 1.0):
+        self.ttl = ttl
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+
+    async def get(self, db, name: str, fresh: bool = False) -> str:
+        """The current token of `name`; `fresh` skips this worker's cache."""
+        cached = self._tokens.get(name)
+        now = time.monotonic()
+        if not fresh and cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+        doc = await db[COLLECTION].find_one({"_id": name}, {"token": 1})
+        if doc is None:
+            # Fresh database: whichever worker upserts first sets the token for all
+            await db[COLLECTION].update_one({"_id": name}, {"$setOnInsert": {"token": new_token()}}, upsert=True)
+            doc = await db[COLLECTION].find_one({"_id": name}, {"token": 1})
+        self._tokens[name] = (doc["token"], now)
+        return doc["token"]
+
+    async def bump(self, db, name: str):
+        """Record that `name` changed; call after the write is stored."""
+        token = new_token()
+        # Local readers see the change even if the shared write fails
+        self._tokens[name] = (token, time.monotonic())
+        await db[COLLECTION].update_one(
+            {"_id": name}, {"$set": {"token": token, "updated_at": datetime.utcnow()}}, upsert=True
+        )
+
+
+def make_etag(*parts: str) -> str:
+    return '"' + ".".join(parts) + '"'
+
+
+def matching_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """The tag from If-None-Match that matches `etag` (in any content coding), if any.
+
+    304 responses echo that tag, so clients keep the one stored with their copy.
+    """
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses the weak comparison
+        if strip_encoding(candidate.removeprefix("W/")) == etag:
+            return candidate
+    return None
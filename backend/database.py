@@ -0,0 +1,79 @@
+"""MongoDB client construction, pool tuning and warm-up.
+
+The client is created inside the application lifespan, i.e. once per worker
+process after any fork, never at import time. Pool size, timeouts and wire
+compression come from the environment:
+
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_COMPRESSORS (e.g. "zstd,snappy,zlib")
+"""
+
+import asyncio
+import logging
+import os
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from metrics import MongoCommandListener, MongoPoolListener
+
+logger = logging.getLogger(__name__)
+
+# env var -> (pymongo option, type, default); None means pymongo's default
+_POOL_SETTINGS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int, 100),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int, 5),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int, None),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int, 5000),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int, None),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int, 5000),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int, None),
+    "MONGO_COMPRESSORS": ("compressors", str, None),
+}
+
+
+def client_options() -> dict:
+    options = {}
+    for env, (option, cast, default) in _POOL_SETTINGS.items():
+        raw = os.environ.get(env)
+        value = cast(raw) if raw not in (None, "") else default
+        if value is not None:
+            options[option] = value
+    return options
+
+
+def create_mongo_client(mongo_url: str) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        mongo_url,
+        event_listeners=[MongoCommandListener(), MongoPoolListener()],
+        **client_options(),
+    )
+
+
+async def warm_up(client, db_name: str, timeout: float = 30.0):
+    """Ping until the server answers, then pre-open `minPoolSize` connections.
+
+    Concurrent pings each check out their own connection, so the pool holds
+    that many open sockets before the first real request arrives. Raises
+    `TimeoutError` when MongoDB cannot be reached within `timeout` seconds.
+    """
+    db = client[db_name]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.5
+    while True:
+        try:
+            await db.command("ping")
+            break
+        except Exception as e:
+            if loop.time() + delay > deadline:
+                raise TimeoutError(f"MongoDB not reachable after {timeout:.0f}s: {str(e)}") from e
+            logger.warning(f"MongoDB not reachable yet, retrying in {delay:.1f}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    min_pool = client_options().get("minPoolSize", 0)
+    if min_pool > 1:
+        await asyncio.gather(*[db.command("ping") for _ in range(min_pool)])
+    logger.info(f"MongoDB connection pool warmed ({max(min_pool, 1)} connection(s))")
@@ -0,0 +1,60 @@
+"""Streaming CSV / NDJSON export over a Motor cursor.
+
+Rows are encoded as they come off the cursor and yielded in small chunks, so
+memory stays flat regardless of collection size: nothing is `to_list`ed and
+no Pydantic models are built.
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, List
+
+from fast_json import dumps
+
+ROWS_PER_CHUNK = 500
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def stream_csv(cursor, fields: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    async for document in cursor:
+        writer.writerow([_csv_value(document.get(field)) for field in fields])
+        rows += 1
+        if rows % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def stream_ndjson(cursor, fields: List[str]) -> AsyncIterator[bytes]:
+    lines = []
+    async for document in cursor:
+        lines.append(dumps({field: document.get(field) for field in fields}))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def stream_rows(cursor, fields: List[str], format: str) -> AsyncIterator[bytes]:
+    if format == "csv":
+        return stream_csv(cursor, fields)
+    return stream_ndjson(cursor, fields)
@@ -0,0 +1,35 @@
+"""Fast JSON responses for trusted payloads.
+
+List endpoints read rows we wrote ourselves, so instead of rebuilding a
+Pydantic model per row (and having `response_model` validate it again) they
+project the stored fields and encode the plain dicts directly. orjson is used
+when installed; the stdlib encoder is the fallback.
+"""
+
+import json
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # bson ObjectId and similar scalar types
+    return str(value)
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
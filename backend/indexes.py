@@ -0,0 +1,295 @@
+"""Index declarations for every query shape the API runs, plus startup bootstrap.
+
+Run `python indexes.py` from the backend directory to see which indexes the
+API relies on and whether they exist; add `--apply` to create missing ones.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from search_index import FIELD_WEIGHTS
+from storage_schema import COMPACT_COLLECTIONS, STORAGE_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+TEXT_SEARCH_INDEX = "contacts_text"
+
+# Status checks are deleted by MongoDB's TTL monitor this long after their timestamp. Off (0) by
+# default: the first index build would otherwise delete every older check at once
+STATUS_CHECK_RETENTION_DAYS = float(os.environ.get('STATUS_CHECK_RETENTION_DAYS', '0'))
+
+# Trailing keys that complete the ContactSummary projection on the contact list indexes
+_SUMMARY_FIELDS = ("status", "service", "name", "email")
+
+
+def _summary_keys(*leading: Tuple[str, int]) -> Tuple[Tuple[str, int], ...]:
+    used = {name for name, _ in leading}
+    return leading + tuple((name, 1) for name in _SUMMARY_FIELDS if name not in used)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    name: str
+    purpose: str
+    options: dict = field(default_factory=dict)
+
+
+def schema_indexes(specs: List[IndexSpec], schema: str = STORAGE_SCHEMA) -> List[IndexSpec]:
+    """The declarations as they apply to a storage schema (see storage_schema.py).
+
+    `migrating` swaps the unique `id` indexes for non-unique lookups, so
+    documents without `id` can be stored once the migration drops the unique
+    ones; `compact` keys everything on `_id`, whose own index serves lookups.
+    """
+    if schema not in ("migrating", "compact"):
+        return specs
+    result = []
+    for spec in specs:
+        if spec.collection not in COMPACT_COLLECTIONS or "id" not in dict(spec.keys):
+            result.append(spec)
+        elif spec.keys == (("id", 1),):
+            if schema == "migrating":
+                result.append(IndexSpec(
+                    spec.collection, (("id", 1), ("_id", 1)), f"{spec.collection}_id_lookup", spec.purpose,
+                ))
+        elif schema == "compact":
+            keys = tuple(("_id" if name == "id" else name, direction) for name, direction in spec.keys)
+            result.append(IndexSpec(spec.collection, keys, f"{spec.name}_compact", spec.purpose, spec.options))
+        else:
+            result.append(spec)
+    return result
+
+
+INDEXES: List[IndexSpec] = schema_indexes([
+    IndexSpec(
+        "contacts", (("id", 1),), "contacts_id_unique",
+        "lookups by public contact id", {"unique": True},
+    ),
+    # The summary indexes carry every ContactSummary field, so fields=summary lists
+    # (and filtered counts) are covered queries that never load the documents
+    IndexSpec(
+        "contacts", _summary_keys(("created_at", -1), ("id", -1)), "contacts_created_at_summary",
+        "GET /api/contacts sort and cursor, date window",
+    ),
+    IndexSpec(
+        "contacts", _summary_keys(("status", 1), ("created_at", -1), ("id", -1)), "contacts_status_summary",
+        "GET /api/contacts?status=, stats counter rebuild by status",
+    ),
+    IndexSpec(
+        "contacts", _summary_keys(("service", 1), ("created_at", -1), ("id", -1)), "contacts_service_summary",
+        "GET /api/contacts?service=, stats counter rebuild by service",
+    ),
+    IndexSpec(
+        "contacts", (("idempotency_key", 1),), "contacts_idempotency_key_unique",
+        "POST /api/contacts duplicate submissions across workers",
+        {"unique": True, "partialFilterExpression": {"idempotency_key": {"$exists": True}}},
+    ),
+    IndexSpec(
+        "contacts", tuple((field, "text") for field in FIELD_WEIGHTS), TEXT_SEARCH_INDEX,
+        "GET /api/contacts/search ranking",
+        {"weights": FIELD_WEIGHTS, "default_language": "portuguese"},
+    ),
+    IndexSpec(
+        "contact_rollups", (("day", 1), ("service", 1)), "contact_rollups_day_service",
+        "GET /api/stats/timeseries date range",
+    ),
+    IndexSpec(
+        "contacts_archive", (("id", 1),), "contacts_archive_id_unique",
+        "archival upserts, lookups by public contact id", {"unique": True},
+    ),
+    IndexSpec(
+        "contacts_archive", _summary_keys(("created_at", -1), ("id", -1)), "contacts_archive_created_at_summary",
+        "GET /api/contacts?include_archived=true sort and cursor",
+    ),
+    IndexSpec(
+        "contacts", (("created_at", 1),), "contacts_notification_pending",
+        "outbox sweep for contacts whose notifications were not queued",
+        {"partialFilterExpression": {"notification_pending": True}},
+    ),
+    IndexSpec(
+        "outbox", (("status", 1), ("next_attempt_at", 1)), "outbox_status_next_attempt",
+        "notification dispatchers claiming due documents",
+    ),
+    IndexSpec(
+        "outbox", (("sent_at", 1),), "outbox_sent_at_ttl",
+        "drops delivered notifications after a week", {"expireAfterSeconds": 7 * 24 * 3600},
+    ),
+    IndexSpec(
+        "stats_counters", (("kind", 1), ("count", -1)), "stats_counters_kind_count",
+        "GET /api/stats popular services from counters",
+    ),
+    IndexSpec(
+        "status_checks", (("id", 1),), "status_checks_id_unique",
+        "lookups by public status check id", {"unique": True},
+    ),
+    IndexSpec(
+        "status_checks", (("timestamp", -1), ("id", -1)), "status_checks_timestamp_id",
+        "GET /api/status time window, sort and cursor",
+    ),
+    *([IndexSpec(
+        "status_checks", (("timestamp", 1),), "status_checks_timestamp_ttl",
+        "status check retention", {"expireAfterSeconds": int(STATUS_CHECK_RETENTION_DAYS * 86400)},
+    )] if STATUS_CHECK_RETENTION_DAYS > 0 else []),
+    IndexSpec(
+        "status_checks", (("client_name", 1), ("timestamp", -1), ("id", -1)), "status_checks_client_timestamp",
+        "GET /api/status?client_name= and GET /api/status/latest",
+    ),
+])
+
+# Options that make two indexes with the same keys behave differently
+_COMPARED_OPTIONS = (
+    "unique", "sparse", "partialFilterExpression", "expireAfterSeconds", "weights", "default_language",
+)
+
+
+def _normalize_keys(keys) -> tuple:
+    # Servers may report numeric directions as floats; text/hashed stay strings
+    return tuple((k, d if isinstance(d, str) else int(d)) for k, d in keys)
+
+
+def _same_keys(spec: IndexSpec, info: dict) -> bool:
+    keys = _normalize_keys(info["key"])
+    text_fields = {k for k, d in spec.keys if d == "text"}
+    if text_fields:
+        # Text indexes are reported as _fts/_ftsx, with the fields listed under "weights"
+        return ("_fts", "text") in keys and set(info.get("weights", {})) == text_fields
+    return keys == spec.keys
+
+
+def _differences(spec: IndexSpec, existing: dict) -> List[str]:
+    diffs = []
+    for option in _COMPARED_OPTIONS:
+        wanted = spec.options.get(option)
+        actual = existing.get(option)
+        if option in ("unique", "sparse"):
+            wanted, actual = bool(wanted), bool(actual)
+        if wanted != actual:
+            diffs.append(f"{option}: expected {wanted!r}, found {actual!r}")
+    return diffs
+
+
+async def ensure_indexes(db, dry_run: bool = False, specs: List[IndexSpec] = None) -> List[dict]:
+    """Compare declared indexes with the database and create the missing ones.
+
+    Indexes that exist with different options are only reported, never
+    dropped: rebuilding them is an operator decision. A changed TTL period is
+    the exception, applied in place with collMod. TTL indexes that match no
+    declaration (retention turned back off) are dropped, since they keep
+    deleting documents. With `dry_run` nothing is created, changed or dropped.
+    Returns one report row per declared index and per stale TTL index.
+    """
+    specs = specs if specs is not None else INDEXES
+    report = []
+    info_by_collection = {}
+    for spec in specs:
+        if spec.collection not in info_by_collection:
+            info_by_collection[spec.collection] = await db[spec.collection].index_information()
+        existing_name, existing = next(
+            ((name, info) for name, info in info_by_collection[spec.collection].items()
+             if _same_keys(spec, info)),
+            (None, None),
+        )
+
+        row = {
+            "collection": spec.collection,
+            "name": spec.name,
+            "keys": [list(k) for k in spec.keys],
+            "purpose": spec.purpose,
+        }
+        if existing is not None:
+            diffs = _differences(spec, existing)
+            ttl_only = "expireAfterSeconds" in spec.options and all(d.startswith("expireAfterSeconds") for d in diffs)
+            if diffs and ttl_only and not dry_run:
+                # A new retention period is applied in place, without rebuilding the index
+                try:
+                    await db.command(
+                        "collMod", spec.collection,
+                        index={"name": existing_name, "expireAfterSeconds": spec.options["expireAfterSeconds"]},
+                    )
+                    row["status"] = "updated"
+                    logger.info(f"Updated index {spec.collection}.{spec.name}: {diffs[0]}")
+                except Exception as e:
+                    row["status"] = "error"
+                    row["details"] = [str(e)]
+                    logger.error(f"Could not update index {spec.collection}.{spec.name}: {str(e)}")
+            elif diffs:
+                row["status"] = "differs"
+                row["details"] = diffs
+                logger.warning(f"Index {spec.collection}.{spec.name} differs from declaration: {'; '.join(diffs)}")
+            else:
+                row["status"] = "ok"
+        elif dry_run:
+            row["status"] = "missing"
+            logger.warning(f"Index {spec.collection}.{spec.name} is missing ({spec.purpose})")
+        else:
+            try:
+                await db[spec.collection].create_index(list(spec.keys), name=spec.name, **spec.options)
+                row["status"] = "created"
+                logger.info(f"Created index {spec.collection}.{spec.name}")
+            except Exception as e:
+                row["status"] = "error"
+                row["details"] = [str(e)]
+                logger.error(f"Could not create index {spec.collection}.{spec.name}: {str(e)}")
+        report.append(row)
+
+    for collection, infos in info_by_collection.items():
+        declared = [spec for spec in specs if spec.collection == collection]
+        for name, info in infos.items():
+            if "expireAfterSeconds" not in info or any(_same_keys(spec, info) for spec in declared):
+                continue
+            row = {
+                "collection": collection,
+                "name": name,
+                "keys": [list(k) for k in _normalize_keys(info["key"])],
+                "purpose": f"undeclared TTL index (expireAfterSeconds={info['expireAfterSeconds']})",
+            }
+            if dry_run:
+                row["status"] = "stale"
+                logger.warning(f"TTL index {collection}.{name} is no longer declared and still deletes documents")
+            else:
+                try:
+                    await db[collection].drop_index(name)
+                    row["status"] = "dropped"
+                    logger.info(f"Dropped undeclared TTL index {collection}.{name}")
+                except Exception as e:
+                    row["status"] = "error"
+                    row["details"] = [str(e)]
+                    logger.error(f"Could not drop index {collection}.{name}: {str(e)}")
+            report.append(row)
+    return report
+
+
+def format_report(report: List[dict]) -> str:
+    lines = []
+    for row in report:
+        keys = ", ".join(f"{k} {d}" for k, d in row["keys"])
+        lines.append(f"[{row['status']:>7}] {row['collection']}.{row['name']} ({keys}) - {row['purpose']}")
+        for detail in row.get("details", []):
+            lines.append(f"          {detail}")
+    return "\n".join(lines)
+
+
+async def _main(apply: bool):
+    from database import create_mongo_client
+    from server import db_name, mongo_url
+
+    client = create_mongo_client(mongo_url)
+    db = client[db_name]
+    try:
+        report = await ensure_indexes(db, dry_run=not apply)
+        print(format_report(report))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report (and optionally create) the indexes the API relies on.")
+    parser.add_argument("--apply", action="store_true", help="create missing indexes instead of only reporting")
+    args = parser.parse_args()
+    asyncio.run(_main(args.apply))
@@ -0,0 +1,180 @@
+"""In-process fan-out of contact events for GET /api/contacts/stream (SSE).
+
+`EventBroker.publish` stamps each event with an id, keeps the last
+`history` events in a ring buffer and puts it on every subscriber's bounded
+queue. A subscriber whose queue is full is dropped rather than slowing the
+publisher down; it reconnects with `Last-Event-ID` and is replayed from the
+ring buffer. Ids look like "<broker epoch>-<sequence>", so a client coming
+back from another worker or from before a restart gets a `reset` event and
+should reload through the REST endpoints.
+
+Events come from `on_contacts_stored` (this worker's writes only) or, on a
+replica set, from `watch_contacts`, a change stream that sees every worker's
+inserts.
+
+Uvicorn only runs the lifespan shutdown once open connections have drained,
+so closing the broker there would leave every stream open for the whole
+graceful timeout: `cli.py serve` closes it as soon as the worker is asked to
+stop (see `ShutdownAwareServer`).
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, List, Optional, Set, Tuple
+
+from fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+CLOSED = object()
+
+
+class Subscription:
+    def __init__(self, buffer_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+
+    async def get(self, timeout: float):
+        """Next event, `None` on timeout, or `CLOSED` once dropped or shut down."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    def __init__(self, history: int = 1000, buffer_size: int = 256):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.buffer_size = buffer_size
+        self._last_sequence = 0
+        self._history: Deque[Tuple[int, str, dict]] = deque(maxlen=history)
+        self._subscribers: Set[Subscription] = set()
+        self.closed = False
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event: str, data: dict):
+        self._last_sequence += 1
+        item = (f"{self.epoch}-{self._last_sequence}", event, data)
+        self._history.append((self._last_sequence, event, data))
+        self.published += 1
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._close(subscription)
+
+    def _close(self, subscription: Subscription):
+        # Make room for the close marker; the client resumes from history on reconnect
+        self._subscribers.discard(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(CLOSED)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Tuple[Subscription, List[tuple], bool]:
+        """Register a subscriber; returns it, the events to replay and whether the client must reset."""
+        subscription = Subscription(self.buffer_size)
+        if self.closed:
+            # Shutting down: the stream ends right away and the client reconnects elsewhere
+            subscription.queue.put_nowait(CLOSED)
+            return subscription, [], False
+        self._subscribers.add(subscription)
+        if not last_event_id:
+            return subscription, [], False
+
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return subscription, [], True
+        last_seen = int(sequence)
+        oldest = self._history[0][0] if self._history else self._last_sequence + 1
+        if last_seen > self._last_sequence or last_seen + 1 < oldest:
+            # Events were evicted from the ring buffer since the client's last one
+            return subscription, [], True
+        replay = [(f"{self.epoch}-{seq}", event, data) for seq, event, data in self._history if seq > last_seen]
+        return subscription, replay, False
+
+    @property
+    def last_event_id(self) -> str:
+        return f"{self.epoch}-{self._last_sequence}"
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def close(self):
+        """End every open stream, and any opened later, e.g. on shutdown."""
+        self.closed = True
+        for subscription in list(self._subscribers):
+            self._close(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "history": len(self._history),
+        }
+
+
+def format_event(event_id: str, event: str, data) -> bytes:
+    return f"id: {event_id}\nevent: {event}\n".encode("utf-8") + b"data: " + dumps(data) + b"\n\n"
+
+
+async def sse_stream(
+    broker: EventBroker,
+    last_event_id: Optional[str],
+    heartbeat: float = 15.0,
+    max_seconds: float = 300.0,
+    retry_ms: int = 3000,
+) -> AsyncIterator[bytes]:
+    """Server-sent events for one client: replay, then live events and keep-alives.
+
+    The stream ends after `max_seconds` so connections turn over, or when the
+    broker is closed; EventSource reconnects with Last-Event-ID.
+    """
+    subscription, replay, reset = broker.subscribe(last_event_id)
+    try:
+        yield f"retry: {retry_ms}\n\n".encode("utf-8")
+        if reset:
+            yield format_event(broker.last_event_id, "reset", {})
+        for item in replay:
+            yield format_event(*item)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_seconds
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            item = await subscription.get(min(heartbeat, remaining))
+            if item is CLOSED:
+                break
+            if item is None:
+                # Comment line: keeps proxies from timing out an idle connection
+                yield b": keep-alive\n\n"
+                continue
+            yield format_event(*item)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def watch_contacts(collection, on_inserted: Callable[[List[dict]], None], resume_retry: float = 5.0):
+    """Feed `on_inserted(documents)` from a change stream until cancelled.
+
+    Needs a replica set or sharded cluster. The stream is resumed after
+    transient errors with the last seen resume token.
+    """
+    resume_token = None
+    pipeline = [{"$match": {"operationType": "insert"}}]
+    while True:
+        try:
+            async with collection.watch(pipeline, resume_after=resume_token) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    on_inserted([change["fullDocument"]])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Contact change stream failed, retrying in {resume_retry:.0f}s: {str(e)}")
+            await asyncio.sleep(resume_retry)
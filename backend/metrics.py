@@ -0,0 +1,256 @@
+"""Prometheus-format metrics without extra dependencies.
+
+* `MetricsMiddleware` (pure ASGI) records request counts and latency
+  histograms labelled by route template, so path parameters do not explode
+  cardinality, plus in-flight gauges.
+* `MongoCommandListener` and `MongoPoolListener` are pymongo monitoring
+  listeners for per-command latency/errors and connection-pool gauges. Motor
+  runs pymongo on worker threads, hence the locks.
+
+Recording is a dict lookup plus a few additions under an uncontended lock.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = HTTP_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self.header()
+        names = self.label_names + ("le",)
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], List[str]]):
+        """Register a callback producing extra exposition lines at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and method", ("route", "method")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served by method", ("method",)))
+
+admission_admitted = registry.register(Counter(
+    "admission_admitted_total", "Requests admitted by admission control", ("route",)))
+admission_shed = registry.register(Counter(
+    "admission_shed_total", "Requests rejected by admission control by reason", ("route", "reason")))
+admission_in_flight = registry.register(Gauge(
+    "admission_in_flight", "Admitted requests currently running", ("route",)))
+admission_queued = registry.register(Gauge(
+    "admission_queued", "Requests waiting for a concurrency slot", ("route",)))
+compression_bytes_in = registry.register(Counter(
+    "compression_bytes_in_total", "Response bytes before compression by encoding", ("encoding",)))
+compression_bytes_out = registry.register(Counter(
+    "compression_bytes_out_total", "Response bytes sent after compression by encoding", ("encoding",)))
+notifications_sent = registry.register(Counter(
+    "notifications_sent_total", "Outbox notifications delivered by kind", ("kind",)))
+notifications_retried = registry.register(Counter(
+    "notifications_retried_total", "Failed notification deliveries scheduled for another attempt", ("kind",)))
+notifications_dead = registry.register(Counter(
+    "notifications_dead_total", "Notifications dead-lettered (permanent failure or out of attempts)", ("kind",)))
+
+mongo_commands = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by command", ("command",), MONGO_BUCKETS))
+mongo_command_failures = registry.register(Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by command", ("command",)))
+mongo_pool_checked_out = registry.register(Gauge(
+    "mongodb_pool_checked_out", "Connections currently checked out of the pool", ("address",)))
+mongo_pool_waiting = registry.register(Gauge(
+    "mongodb_pool_waiting", "Operations waiting for a pool connection", ("address",)))
+mongo_pool_open = registry.register(Gauge(
+    "mongodb_pool_connections", "Open pool connections", ("address",)))
+mongo_pool_created = registry.register(Counter(
+    "mongodb_pool_connections_created_total", "Connections created by the pool", ("address",)))
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        # The route template is only known once routing is done, so in-flight is per method
+        in_flight_key = scope["method"]
+        http_in_flight.inc(in_flight_key)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec(in_flight_key)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(path, scope["method"], status)
+            http_latency.observe(elapsed, path, scope["method"])
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_commands.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        mongo_commands.observe(event.duration_micros / 1e6, event.command_name)
+        mongo_command_failures.inc(event.command_name)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongo_pool_created.inc(_address(event))
+        mongo_pool_open.inc(_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_open.dec(_address(event))
+
+    def connection_check_out_started(self, event):
+        mongo_pool_waiting.inc(_address(event))
+
+    def connection_check_out_failed(self, event):
+        mongo_pool_waiting.dec(_address(event))
+
+    def connection_checked_out(self, event):
+        mongo_pool_waiting.dec(_address(event))
+        mongo_pool_checked_out.inc(_address(event))
+
+    def connection_checked_in(self, event):
+        mongo_pool_checked_out.dec(_address(event))
@@ -0,0 +1,502 @@
+"""Out-of-band notifications for new contacts (admin email, auto-reply, webhook).
+
+Nothing is sent while a request waits. When contacts are stored,
+`build_notifications` renders one outbox document per configured channel and
+they are inserted in the same post-store step as the stats counters:
+
+    {"_id": "<contact id>:admin_email", "kind": "admin_email", "channel": "email",
+     "contact_id": "…", "payload": {"to": "…", "subject": "…", "body": "…"},
+     "status": "pending", "attempts": 0, "next_attempt_at": ISODate, "created_at": ISODate}
+
+That step runs after the contact insert, so it can be lost to a crash or a
+failed outbox write. Contacts are therefore stored with
+`notification_pending: true` in the same document, and the marker is only
+removed once their outbox documents are in: each dispatcher sweeps for
+contacts still marked after `sweep_after` seconds, enqueues them (replays are
+skipped by `_id`) and clears the marker. A multi-document transaction would
+not fit the write-behind path, whose unordered insert_many keeps the rest of a
+batch when one document is a duplicate.
+
+Every API worker runs an `OutboxDispatcher`. It claims due documents in
+batches (the claim also leases them for `lease` seconds, so a worker that dies
+mid-batch only delays them), sends the batch's emails over one reused SMTP
+connection and its webhooks over a pooled HTTP client, and records every
+outcome with a single bulk_write. Failures are retried with exponential
+backoff; permanent failures (5xx SMTP replies, 4xx webhook answers) and
+documents out of attempts become `dead` and stay in the outbox for
+`python cli.py outbox --retry-dead`. Sent documents expire through a TTL
+index after a week.
+
+`SMTPSink` is a minimal in-process SMTP server that keeps what it receives,
+for tests and local development (`python cli.py smtp-sink`).
+"""
+
+import asyncio
+import email
+import email.policy
+import logging
+import random
+import smtplib
+import ssl
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Callable, List, Optional
+
+import httpx
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from fast_json import dumps
+from metrics import notifications_dead, notifications_retried, notifications_sent
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "outbox"
+COMPANY_NAME = "Mensura Maat"
+# Set on contacts whose outbox documents are not stored yet
+PENDING_FIELD = "notification_pending"
+
+
+class PermanentError(Exception):
+    """Delivery can never succeed (rejected recipient, webhook answering 4xx); not retried."""
+
+
+def build_notifications(
+    contact: dict,
+    admin_email: Optional[str] = None,
+    auto_reply: bool = False,
+    webhook: bool = False,
+) -> List[dict]:
+    """Outbox documents for one new contact, one per enabled channel."""
+    payloads = []
+    if admin_email:
+        lines = [
+            f"Nome: {contact['name']}",
+            f"E-mail: {contact['email']}",
+            f"Telefone: {contact.get('phone') or '-'}",
+            f"Serviço: {contact.get('service') or '-'}",
+            f"Recebido em: {contact['created_at']:%d/%m/%Y %H:%M} (UTC)",
+            "",
+            contact["message"],
+        ]
+        payloads.append(("admin_email", "email", {
+            "to": admin_email,
+            "reply_to": contact["email"],
+            "subject": f"Novo contato: {contact['name']}",
+            "body": "\n".join(lines),
+        }))
+    if auto_reply:
+        payloads.append(("auto_reply", "email", {
+            "to": contact["email"],
+            "subject": f"Recebemos sua mensagem - {COMPANY_NAME}",
+            "body": (
+                f"Olá, {contact['name']}!\n\n"
+                "Recebemos sua mensagem e entraremos em contato em breve.\n\n"
+                f"Equipe {COMPANY_NAME}"
+            ),
+        }))
+    if webhook:
+        fields = ("id", "name", "email", "phone", "service", "message", "status", "created_at")
+        payloads.append(("webhook", "webhook", {
+            "event": "contact.created",
+            "contact": {field: contact.get(field) for field in fields},
+        }))
+
+    return [
+        {
+            "_id": f"{contact['id']}:{kind}",
+            "kind": kind,
+            "channel": channel,
+            "contact_id": contact["id"],
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": contact["created_at"],
+            "created_at": contact["created_at"],
+        }
+        for kind, channel, payload in payloads
+    ]
+
+
+async def enqueue_notifications(collection, documents: List[dict]):
+    """Insert outbox documents; ones already present (replayed batches) are skipped."""
+    if not documents:
+        return
+    try:
+        await collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+
+async def clear_pending(contacts, contact_ids: List[str]):
+    """Drop the pending marker of contacts whose outbox documents are stored."""
+    if contact_ids:
+        await contacts.update_many({"id": {"$in": contact_ids}, PENDING_FIELD: True}, {"$unset": {PENDING_FIELD: ""}})
+
+
+class SMTPMailer:
+    """Sends emails over one SMTP connection kept open between batches. Blocking: run in a thread."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        sender: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = False,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._connection: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls(context=ssl.create_default_context())
+        if self.username:
+            connection.login(self.username, self.password or "")
+        return connection
+
+    def send_batch(self, payloads: List[dict]) -> List[Optional[Exception]]:
+        """One result per payload: None when sent, otherwise the error."""
+        results = []
+        for payload in payloads:
+            try:
+                self._send(payload)
+                results.append(None)
+            except smtplib.SMTPRecipientsRefused as e:
+                results.append(PermanentError(str(e)))
+            except smtplib.SMTPResponseException as e:
+                results.append(PermanentError(str(e)) if e.smtp_code >= 500 else e)
+            except Exception as e:
+                # Timeouts and the like leave the session in an unknown state
+                self.close()
+                results.append(e)
+        return results
+
+    def _send(self, payload: dict):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = payload["to"]
+        message["Subject"] = payload["subject"]
+        if payload.get("reply_to"):
+            message["Reply-To"] = payload["reply_to"]
+        message.set_content(payload["body"])
+
+        # A kept-alive connection may have been closed by the server in the meantime
+        for attempt in (1, 2):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.send_message(message)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._connection = None
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except Exception:
+                pass
+            self._connection = None
+
+
+class WebhookSender:
+    """POSTs JSON payloads to one URL over a pooled keep-alive HTTP client."""
+
+    def __init__(self, url: str, timeout: float = 10.0, max_connections: int = 10):
+        self.url = url
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def send(self, payload: dict):
+        response = await self._client.post(
+            self.url, content=dumps(payload), headers={"Content-Type": "application/json"}
+        )
+        if response.status_code < 300:
+            return
+        error = f"webhook answered {response.status_code}"
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            raise PermanentError(error)
+        raise RuntimeError(error)
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class OutboxDispatcher:
+    def __init__(
+        self,
+        collection,
+        mailer: Optional[SMTPMailer] = None,
+        webhook: Optional[WebhookSender] = None,
+        batch_size: int = 50,
+        poll_interval: float = 2.0,
+        lease: float = 60.0,
+        max_attempts: int = 8,
+        backoff_base: float = 30.0,
+        backoff_max: float = 3600.0,
+        contacts=None,
+        build: Optional[Callable[[dict], List[dict]]] = None,
+        sweep_after: float = 60.0,
+    ):
+        self.collection = collection
+        self.mailer = mailer
+        self.webhook = webhook
+        # Where to look for contacts whose notifications never reached the outbox
+        self.contacts = contacts
+        self.build = build
+        self.sweep_after = timedelta(seconds=sweep_after)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.swept = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def wake(self):
+        """Look for due documents now instead of at the next poll."""
+        self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping contacts for notifications: {str(e)}")
+            try:
+                claimed = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Error dispatching notifications: {str(e)}")
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def sweep(self) -> int:
+        """Enqueue the notifications of contacts still marked pending after `sweep_after`."""
+        if self.contacts is None or self.build is None:
+            return 0
+        # Younger contacts are still in their own post-store step
+        stale = {PENDING_FIELD: True, "created_at": {"$lte": datetime.utcnow() - self.sweep_after}}
+        contacts = await self.contacts.find(stale, {"_id": 0}).limit(self.batch_size).to_list(self.batch_size)
+        if not contacts:
+            return 0
+        await enqueue_notifications(self.collection, [doc for contact in contacts for doc in self.build(contact)])
+        await clear_pending(self.contacts, [contact["id"] for contact in contacts])
+        self.swept += len(contacts)
+        logger.warning(f"Queued notifications of {len(contacts)} contact(s) missed after they were stored")
+        return len(contacts)
+
+    async def dispatch_once(self) -> int:
+        """Claim one batch of due documents, deliver it and record the outcomes."""
+        now = datetime.utcnow()
+        documents = await self._claim(now)
+        if not documents:
+            return 0
+
+        emails = [doc for doc in documents if doc["channel"] == "email"]
+        hooks = [doc for doc in documents if doc["channel"] == "webhook"]
+        outcomes = {}
+        if emails:
+            if self.mailer is None:
+                errors = [RuntimeError("e-mail não configurado")] * len(emails)
+            else:
+                errors = await asyncio.to_thread(self.mailer.send_batch, [doc["payload"] for doc in emails])
+            outcomes.update(zip((doc["_id"] for doc in emails), errors))
+        if hooks:
+            if self.webhook is None:
+                errors = [RuntimeError("webhook não configurado")] * len(hooks)
+            else:
+                errors = await asyncio.gather(
+                    *(self.webhook.send(doc["payload"]) for doc in hooks), return_exceptions=True
+                )
+            outcomes.update(zip((doc["_id"] for doc in hooks), errors))
+
+        finished = datetime.utcnow()
+        ops = [self._outcome(doc, outcomes[doc["_id"]], finished) for doc in documents]
+        await self.collection.bulk_write(ops, ordered=False)
+        self.batches += 1
+        return len(documents)
+
+    async def _claim(self, now: datetime) -> List[dict]:
+        due = {"status": "pending", "next_attempt_at": {"$lte": now}}
+        ids = [
+            doc["_id"]
+            async for doc in self.collection.find(due, {"_id": 1}).sort("next_attempt_at", 1).limit(self.batch_size)
+        ]
+        if not ids:
+            return []
+        # Pushing next_attempt_at out is the lease: other workers skip these until it ends
+        claim = uuid.uuid4().hex
+        await self.collection.update_many(
+            {"_id": {"$in": ids}, **due}, {"$set": {"claim": claim, "next_attempt_at": now + self.lease}}
+        )
+        return await self.collection.find({"_id": {"$in": ids}, "claim": claim}).to_list(len(ids))
+
+    def _outcome(self, doc: dict, error: Optional[BaseException], now: datetime) -> UpdateOne:
+        # Matching the claim keeps a late answer from overwriting a newer claim's outcome
+        mine = {"_id": doc["_id"], "claim": doc["claim"]}
+        attempts = doc["attempts"] + 1
+        if error is None:
+            self.sent += 1
+            notifications_sent.inc(doc["kind"])
+            return UpdateOne(mine, {"$set": {"status": "sent", "attempts": attempts, "sent_at": now},
+                                    "$unset": {"claim": "", "last_error": ""}})
+        if isinstance(error, PermanentError) or attempts >= self.max_attempts:
+            self.dead += 1
+            notifications_dead.inc(doc["kind"])
+            logger.error(f"Notification {doc['_id']} dead-lettered after {attempts} attempt(s): {str(error)}")
+            return UpdateOne(mine, {"$set": {"status": "dead", "attempts": attempts, "last_error": str(error)},
+                                    "$unset": {"claim": ""}})
+        self.retried += 1
+        notifications_retried.inc(doc["kind"])
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max) * random.uniform(0.8, 1.2)
+        return UpdateOne(mine, {"$set": {"attempts": attempts, "last_error": str(error),
+                                         "next_attempt_at": now + timedelta(seconds=delay)},
+                                "$unset": {"claim": ""}})
+
+    async def stop(self):
+        """Finish the batch in progress; unsent documents wait for the next start."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        if self.mailer is not None:
+            await asyncio.to_thread(self.mailer.close)
+        if self.webhook is not None:
+            await self.webhook.close()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches, "sent": self.sent, "retried": self.retried, "dead": self.dead, "swept": self.swept,
+        }
+
+
+async def outbox_report(collection) -> List[dict]:
+    pipeline = [
+        {"$group": {"_id": {"status": "$status", "kind": "$kind"}, "count": {"$sum": 1}}},
+        {"$sort": {"_id.status": 1, "_id.kind": 1}},
+    ]
+    return [
+        {"status": row["_id"]["status"], "kind": row["_id"]["kind"], "count": row["count"]}
+        async for row in collection.aggregate(pipeline)
+    ]
+
+
+async def retry_dead(collection) -> int:
+    """Give dead-lettered documents a fresh set of attempts."""
+    result = await collection.update_many(
+        {"status": "dead"},
+        {"$set": {"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()}},
+    )
+    return result.modified_count
+
+
+class SMTPSink:
+    """In-process SMTP server that accepts every message and keeps it in `messages`.
+
+    Codes put in `fail_codes` answer the next DATA commands instead (e.g. 451
+    for a transient failure, 550 for a permanent one).
+    """
+
+    def __init__(self):
+        self.messages: List[EmailMessage] = []
+        self.fail_codes: List[int] = []
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+
+        async def reply(line: str):
+            writer.write(line.encode("ascii") + b"\r\n")
+            await writer.drain()
+
+        await reply("220 smtp-sink ready")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8", "replace").strip().split(" ", 1)[0].upper()
+                if command in ("EHLO", "HELO"):
+                    await reply("250 smtp-sink")
+                elif command in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk in (b".\r\n", b".\n"):
+                            break
+                        data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                    if self.fail_codes:
+                        await reply(f"{self.fail_codes.pop(0)} rejected by smtp-sink")
+                        continue
+                    self.messages.append(email.message_from_bytes(b"".join(data), policy=email.policy.default))
+                    await reply("250 OK")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+
+async def _main(retry: bool):
+    from database import create_mongo_client
+    from server import db_name, mongo_url
+
+    client = create_mongo_client(mongo_url)
+    db = client[db_name]
+    try:
+        if retry:
+            print(f"{await retry_dead(db[COLLECTION])} dead notification(s) queued again")
+        for row in await outbox_report(db[COLLECTION]):
+            print(f"{row['status']:<8} {row['kind']:<12} {row['count']}")
+    finally:
+        client.close()
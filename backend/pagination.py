@@ -0,0 +1,73 @@
+"""Keyset (cursor) pagination helpers shared by the list endpoints."""
+
+import base64
+import heapq
+import json
+from datetime import datetime
+from typing import AsyncIterator, Tuple
+
+
+def encode_cursor(sort_value: datetime, doc_id: str) -> str:
+    """Build an opaque cursor pointing just after the given row."""
+    payload = json.dumps({"v": sort_value.isoformat(), "i": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Parse a cursor produced by `encode_cursor`. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["v"]), str(payload["i"])
+    except Exception as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def keyset_filter(field: str, cursor: str) -> dict:
+    """Query matching the rows after `cursor` for a `(field desc, id desc)` sort."""
+    sort_value, doc_id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {field: {"$lt": sort_value}},
+            {field: sort_value, "id": {"$lt": doc_id}},
+        ]
+    }
+
+
+def keyset_sort(field: str) -> list:
+    """Sort specification matching `keyset_filter`; needs a `(field, id)` index."""
+    return [(field, -1), ("id", -1)]
+
+
+async def merge_keyset(field: str, *cursors) -> AsyncIterator[dict]:
+    """Merge cursors that are each sorted by `keyset_sort(field)` into one such stream."""
+    iterators = [cursor.__aiter__() for cursor in cursors]
+    heap = []
+
+    async def push(position: int):
+        try:
+            row = await iterators[position].__anext__()
+        except StopAsyncIteration:
+            return
+        # heapq pops the smallest: negate the order by wrapping the key
+        heapq.heappush(heap, (_Descending((row[field], row["id"])), position, row))
+
+    for position in range(len(iterators)):
+        await push(position)
+    while heap:
+        _, position, row = heapq.heappop(heap)
+        yield row
+        await push(position)
+
+
+class _Descending:
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+    def __eq__(self, other):
+        return self.key == other.key
@@ -0,0 +1,201 @@
+"""Contact full-text search helpers.
+
+GET /api/contacts/search normally runs on the MongoDB text index declared in
+indexes.py (Portuguese stemming, case and diacritic insensitive). For
+deployments whose MongoDB flavour has no text indexes, `ContactSearchIndex`
+is an in-process inverted index with the same field weights:
+
+* documents are added as this worker stores them (`add`), and `refresh`
+  pulls contacts written by other workers through the created_at index,
+* contacts that leave the collection (archived, deleted by hand) are dropped
+  with `remove`: search drops hits that are no longer stored, and `refresh`
+  runs a full `prune` when the collection holds fewer documents than the
+  index, so `total` counts the same contacts the pages show,
+* terms are casefolded and stripped of accents, so "gestao" finds "Gestão",
+* every query term must match; results are ranked by the sum of
+  idf * field weight of the best field each term appears in.
+
+Postings are compact arrays (about 5 bytes per term occurrence) intersected
+with numpy, so queries take milliseconds at a million contacts; the index
+still lives in every worker's memory and is built at startup, so prefer the
+text index wherever the server supports it.
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+import unicodedata
+from array import array
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Also the weights of the MongoDB text index
+FIELD_WEIGHTS = {"name": 10, "email": 8, "service": 5, "message": 1}
+
+STOPWORDS = frozenset(
+    "a as ao aos com da das de do dos e em na nas no nos o os ou para pela pelo por que se um uma".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Casefold and drop combining accents ("Gestão" -> "gestao")."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [t for t in _TOKEN.findall(normalize(text)) if len(t) > 1 and t not in STOPWORDS]
+
+
+class ContactSearchIndex:
+    def __init__(self, refresh_interval: float = 5.0, lookback: float = 60.0, batch_size: int = 5000):
+        self.refresh_interval = refresh_interval
+        # Other workers' clocks and write-behind flushes can land slightly in the past
+        self.lookback = timedelta(seconds=lookback)
+        self.batch_size = batch_size
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        # 1 per indexed position, 0 once the contact is removed (postings are append-only)
+        self._live = bytearray()
+        self._removed = 0
+        # term -> ascending doc positions, and the best field weight at each position
+        self._postings: Dict[str, array] = {}
+        self._weights: Dict[str, array] = {}
+        self._latest = None
+        self._refreshed_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._ids) - self._removed
+
+    def add(self, contact: dict):
+        """Index one contact document; documents already indexed are ignored."""
+        contact_id = contact["id"]
+        position = self._positions.get(contact_id)
+        if position is not None:
+            # Back in the collection (e.g. restored from the archive) with the same content
+            if not self._live[position]:
+                self._live[position] = 1
+                self._removed -= 1
+            return
+        position = len(self._ids)
+        self._ids.append(contact_id)
+        self._positions[contact_id] = position
+        self._live.append(1)
+
+        best: Dict[str, int] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(contact.get(field)):
+                if weight > best.get(term, 0):
+                    best[term] = weight
+        for term, weight in best.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = array("I")
+                self._weights[term] = array("B")
+            postings.append(position)
+            self._weights[term].append(weight)
+
+        created_at = contact.get("created_at")
+        if created_at is not None and (self._latest is None or created_at > self._latest):
+            self._latest = created_at
+
+    async def refresh(self, collection, force: bool = False):
+        """Index contacts stored since the last refresh, at most every `refresh_interval` seconds."""
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        async with self._refresh_lock:
+            if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            started = time.monotonic()
+            before = len(self._ids)
+            query = {} if self._latest is None else {"created_at": {"$gte": self._latest - self.lookback}}
+            projection = {"_id": 0, "id": 1, "created_at": 1, **{field: 1 for field in FIELD_WEIGHTS}}
+            rows = collection.find(query, projection).sort([("created_at", 1), ("id", 1)]).batch_size(self.batch_size)
+            async for row in rows:
+                self.add(row)
+            # Fewer stored than indexed: some contacts were archived or deleted since
+            if await collection.estimated_document_count() < len(self):
+                await self.prune(collection)
+            self._refreshed_at = time.monotonic()
+            if len(self._ids) - before > 1000:
+                logger.info(
+                    f"Search index: added {len(self._ids) - before} contacts in {self._refreshed_at - started:.1f}s"
+                )
+
+    def remove(self, contact_ids) -> int:
+        """Drop contacts from the results; returns how many were indexed."""
+        removed = 0
+        for contact_id in contact_ids:
+            position = self._positions.get(contact_id)
+            if position is not None and self._live[position]:
+                self._live[position] = 0
+                removed += 1
+        self._removed += removed
+        return removed
+
+    async def prune(self, collection) -> int:
+        """Remove every indexed contact that is no longer in `collection`."""
+        # Contacts indexed from here on were read from the collection after the scan started
+        seen = bytearray(len(self._ids))
+        async for row in collection.find({}, {"_id": 0, "id": 1}).batch_size(self.batch_size):
+            position = self._positions.get(row["id"])
+            if position is not None and position < len(seen):
+                seen[position] = 1
+        removed = self.remove(
+            self._ids[position] for position in range(len(seen)) if self._live[position] and not seen[position]
+        )
+        if removed:
+            logger.info(f"Search index: removed {removed} contacts no longer stored")
+        return removed
+
+    def search(self, query: str, skip: int = 0, limit: int = 20) -> Tuple[int, List[Tuple[str, float]]]:
+        """Returns (total matches, [(contact id, score)] for the requested page)."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or any(term not in self._postings for term in terms):
+            return 0, []
+
+        # Intersect from the rarest term so every step shrinks the candidates
+        terms.sort(key=lambda term: len(self._postings[term]))
+        total_docs = len(self._ids)
+        positions = np.frombuffer(self._postings[terms[0]], dtype=np.uint32)
+        scores = np.frombuffer(self._weights[terms[0]], dtype=np.uint8) * self._idf(terms[0], total_docs)
+        for term in terms[1:]:
+            # Both sides are sorted: binary-search the (smaller) candidates in the longer postings
+            postings = np.frombuffer(self._postings[term], dtype=np.uint32)
+            found = np.minimum(np.searchsorted(postings, positions), len(postings) - 1)
+            mine = postings[found] == positions
+            weights = np.frombuffer(self._weights[term], dtype=np.uint8)[found[mine]]
+            positions, scores = positions[mine], scores[mine] + weights * self._idf(term, total_docs)
+        if self._removed:
+            live = np.frombuffer(self._live, dtype=np.uint8)[positions].astype(bool)
+            positions, scores = positions[live], scores[live]
+
+        total = len(positions)
+        wanted = min(skip + limit, total)
+        if wanted <= skip:
+            return total, []
+        # Best `wanted` by score in O(n); ties go to the more recently indexed contact, and
+        # positions are ascending, so the last tied entries are the newest
+        threshold = np.partition(scores, total - wanted)[total - wanted]
+        above = np.flatnonzero(scores > threshold)
+        above = above[np.lexsort((-positions[above].astype(np.int64), -scores[above]))]
+        tied = np.flatnonzero(scores == threshold)[::-1][:wanted - len(above)]
+        page = np.concatenate([above, tied])[skip:wanted]
+        return total, [(self._ids[int(positions[i])], round(float(scores[i]), 4)) for i in page]
+
+    def _idf(self, term: str, total_docs: int) -> float:
+        return math.log(1 + total_docs / len(self._postings[term]))
+
+    def stats(self) -> dict:
+        return {"documents": len(self), "removed": self._removed, "terms": len(self._postings)}
@@ -1,90 +1,277 @@
- from fastapi import FastAPI, APIRouter, HTTPException
- from fastapi.responses import JSONResponse
- from dotenv import load_dotenv
- from starlette.middleware.cors import CORSMiddleware
- from motor.motor_asyncio import AsyncIOMotorClient
- import os
- import logging
- from pathlib import Path
- from pydantic import BaseModel, Field, EmailStr, validator
- from typing import List, Optional
- import uuid
- from datetime import datetime
- import re
- 
- 
- ROOT_DIR = Path(__file__).parent
- load_dotenv(ROOT_DIR / '.env')
- 
-+
-+def _get_mongo_settings():
-+    """Load MongoDB settings with clear error messages for deployment."""
-+
-+    mongo_url = os.getenv("MONGO_URL")
-+    db_name = os.getenv("DB_NAME")
-+
-+    if not mongo_url:
-+        raise RuntimeError("Environment variable MONGO_URL is required for the API to start.")
-+    if not db_name:
-+        raise RuntimeError("Environment variable DB_NAME is required for the API to start.")
-+
-+    return mongo_url, db_name
-+
-+
- # MongoDB connection
--mongo_url = os.environ['MONGO_URL']
-+mongo_url, db_name = _get_mongo_settings()
- client = AsyncIOMotorClient(mongo_url)
--db = client[os.environ['DB_NAME']]
-+db = client[db_name]
- 
- # Create the main app without a prefix
- app = FastAPI(title="Mensura Maat API", version="1.0.0")
- 
- # Create a router with the /api prefix
- api_router = APIRouter(prefix="/api")
- 
- 
- # Define Models
- class StatusCheck(BaseModel):
-     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-     client_name: str
-     timestamp: datetime = Field(default_factory=datetime.utcnow)
- 
- class StatusCheckCreate(BaseModel):
-     client_name: str
- 
- class ContactCreate(BaseModel):
-     name: str = Field(..., min_length=2, max_length=100)
-     email: EmailStr
-     phone: Optional[str] = Field(None, max_length=20)
-     service: Optional[str] = Field(None, max_length=100)
-     message: str = Field(..., min_length=10, max_length=1000)
-     
-     @validator('name')
- 
-EOF
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from dotenv import load_dotenv
+from starlette.middleware.cors import CORSMiddleware
+import asyncio
+import os
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+from pydantic import AfterValidator, BaseModel, Field, WithJsonSchema, field_validator
+from pydantic.networks import validate_email
+from pydantic_core import PydanticCustomError
+from typing import Annotated, Dict, List, Optional, Tuple, Union
+from functools import lru_cache
+import hashlib
+import time
+import uuid
+from datetime import date, datetime, timedelta
+import re
+
+from admission import AdmissionMiddleware, AdmissionRule
+from archive import ARCHIVE_COLLECTION
+from bulk_ingest import ingest_lines, iter_ndjson_lines
+from cache import ResponseCache
+from compression import CompressionMiddleware
+from conditional import WriteVersions, make_etag, matching_etag
+from database import create_mongo_client, warm_up
+from export import MEDIA_TYPES, stream_rows
+from fast_json import FastJSONResponse
+from indexes import INDEXES, TEXT_SEARCH_INDEX, ensure_indexes
+from live_feed import EventBroker, sse_stream, watch_contacts
+from metrics import MetricsMiddleware, registry as metrics_registry
+from notifications import (
+    COLLECTION as OUTBOX_COLLECTION, PENDING_FIELD as NOTIFICATION_PENDING_FIELD, OutboxDispatcher, SMTPMailer,
+    WebhookSender, build_notifications, clear_pending, enqueue_notifications,
+)
+from pymongo.errors import DuplicateKeyError
+from search_index import ContactSearchIndex
+from pagination import encode_cursor, keyset_filter, keyset_sort, merge_keyset
+from stats_counters import (
+    has_counters, month_key, read_stats, record_contacts_created, record_status_changes,
+)
+from stats_timeseries import (
+    period_count, read_timeseries, record_contacts_rolled_up,
+)
+# Bulk requests on contacts must be translatable to the storage schema
+from storage_schema import UpdateOne, storage_database
+from write_behind import BatchWriter, WriteQueueFull
+
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+def _get_mongo_settings():
+    """Load MongoDB settings with clear error messages for deployment."""
+
+    mongo_url = os.getenv("MONGO_URL")
+    db_name = os.getenv("DB_NAME")
+
+    if not mongo_url:
+        raise RuntimeError("Environment variable MONGO_URL is required for the API to start.")
+    if not db_name:
+        raise RuntimeError("Environment variable DB_NAME is required for the API to start.")
+
+    return mongo_url, db_name
+
+
+# MongoDB connection, opened per worker process by the lifespan below
+mongo_url, db_name = _get_mongo_settings()
+client = None
+db = None
+
+# How long startup waits for MongoDB before the worker gives up
+MONGO_STARTUP_TIMEOUT = float(os.environ.get('MONGO_STARTUP_TIMEOUT', '30'))
+# Readiness flag for /api/health/ready: set once startup completes, cleared on shutdown
+app_state = {"ready": False}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    # A client injected before startup (benchmarks) is used as is and left open
+    owns_client = client is None
+    if owns_client:
+        client = create_mongo_client(mongo_url)
+        # Contacts and status checks are read and written through STORAGE_SCHEMA
+        db = storage_database(client[db_name])
+        try:
+            await warm_up(client, db_name, timeout=MONGO_STARTUP_TIMEOUT)
+        except Exception:
+            client.close()
+            client = None
+            db = None
+            raise
+    await on_startup()
+    app_state["ready"] = True
+    try:
+        yield
+    finally:
+        app_state["ready"] = False
+        await on_shutdown()
+        if owns_client:
+            client.close()
+            client = None
+            db = None
+
+
+# Create the main app without a prefix
+app = FastAPI(title="Mensura Maat API", version="1.0.0", lifespan=lifespan)
+
+# Create a router with the /api prefix
+api_router = APIRouter(prefix="/api")
+
+# In-process cache for the polled read endpoints (a TTL of 0 disables it)
+response_cache = ResponseCache(max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', '256')))
+CACHE_TTL_STATS = float(os.environ.get('CACHE_TTL_STATS', '5'))
+CACHE_TTL_CONTACTS = float(os.environ.get('CACHE_TTL_CONTACTS', '5'))
+CACHE_STALE_TTL = float(os.environ.get('CACHE_STALE_TTL', '30'))
+
+# Contact writes: "direct" inserts per request, "batched" queues them for a background insert_many
+CONTACT_WRITE_MODE = os.environ.get('CONTACT_WRITE_MODE', 'direct')
+# In batched mode: "flush" answers after the batch is stored, "enqueue" as soon as it is queued
+CONTACT_WRITE_ACK = os.environ.get('CONTACT_WRITE_ACK', 'flush')
+contact_writer: Optional[BatchWriter] = None
+
+# Repeated submissions (same Idempotency-Key, or same email+message without one) within
+# the window return the first contact instead of inserting again. 0 turns off the
+# email+message dedup; an Idempotency-Key is then only enforced by the unique index
+IDEMPOTENCY_WINDOW = float(os.environ.get('IDEMPOTENCY_WINDOW_SECONDS', '600'))
+idempotency_cache = ResponseCache(max_entries=int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '10000')))
+
+# Documents per insert_many in POST /api/contacts/bulk
+CONTACT_BULK_CHUNK_SIZE = int(os.environ.get('CONTACT_BULK_CHUNK_SIZE', '1000'))
+
+# Contact search: "text" uses the MongoDB text index, "memory" an in-process index per worker
+CONTACT_SEARCH_BACKEND = os.environ.get('CONTACT_SEARCH_BACKEND', 'text')
+contact_search_index: Optional[ContactSearchIndex] = None
+
+# Strong ETags on reads derived from contacts: each worker re-reads the
+# collection's write version at most this often (its own writes apply at once)
+write_versions = WriteVersions(ttl=float(os.environ.get('WRITE_VERSION_TTL', '1')))
+# Responses from this many bytes on are compressed (brotli when installed, else gzip)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# GET /api/stats/timeseries default window and largest series, in points
+TIMESERIES_DEFAULT_DAYS = int(os.environ.get('TIMESERIES_DEFAULT_DAYS', '30'))
+TIMESERIES_MAX_POINTS = int(os.environ.get('TIMESERIES_MAX_POINTS', '1000'))
+
+# New contact notifications, delivered from the outbox by background dispatchers.
+# Emails need NOTIFY_SMTP_HOST and NOTIFY_FROM; each channel is off while unset.
+NOTIFY_SMTP_HOST = os.environ.get('NOTIFY_SMTP_HOST', '')
+NOTIFY_FROM = os.environ.get('NOTIFY_FROM', '')
+NOTIFY_ADMIN_EMAIL = os.environ.get('NOTIFY_ADMIN_EMAIL', '')
+NOTIFY_AUTO_REPLY = os.environ.get('NOTIFY_AUTO_REPLY', 'false').lower() == 'true'
+NOTIFY_WEBHOOK_URL = os.environ.get('NOTIFY_WEBHOOK_URL', '')
+NOTIFY_EMAIL_ENABLED = bool(NOTIFY_SMTP_HOST and NOTIFY_FROM)
+NOTIFY_CHANNELS = {
+    "admin_email": NOTIFY_ADMIN_EMAIL if NOTIFY_EMAIL_ENABLED else None,
+    "auto_reply": NOTIFY_AUTO_REPLY and NOTIFY_EMAIL_ENABLED,
+    "webhook": bool(NOTIFY_WEBHOOK_URL),
+}
+# Contacts not yet swept into the outbox are found again after this long
+NOTIFY_SWEEP_SECONDS = float(os.environ.get('NOTIFY_SWEEP_SECONDS', '60'))
+outbox_dispatcher: Optional[OutboxDispatcher] = None
+
+# Live feed for GET /api/contacts/stream: "local" publishes this worker's writes,
+# "changestream" every worker's inserts (needs a replica set)
+LIVE_FEED_SOURCE = os.environ.get('LIVE_FEED_SOURCE', 'local')
+live_feed = EventBroker(
+    history=int(os.environ.get('LIVE_FEED_HISTORY', '1000')),
+    buffer_size=int(os.environ.get('LIVE_FEED_CLIENT_BUFFER', '256')),
 )
-    def validate_name(cls, v):
-        if not v.strip():
+LIVE_FEED_MAX_SECONDS = float(os.environ.get('LIVE_FEED_MAX_SECONDS', '300'))
+# Batches larger than this (bulk imports) are announced as one contacts_bulk event
+LIVE_FEED_MAX_BATCH = int(os.environ.get('LIVE_FEED_MAX_BATCH', '100'))
+
+# Status updates per find + bulk_write round trip in POST /api/contacts/status:batch
+CONTACT_STATUS_CHUNK_SIZE = int(os.environ.get('CONTACT_STATUS_CHUNK_SIZE', '1000'))
+
+# Documents fetched per cursor round trip by the export endpoints
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Admission control for the contact write path, per worker. The per-client limit is
+# off (rate 0) unless configured: behind a proxy it needs CONTACT_RATE_TRUSTED_HOPS
+# (proxies in front of the app), or every client shares the proxy's bucket
+CONTACT_RATE_PER_MINUTE = float(os.environ.get('CONTACT_RATE_PER_MINUTE', '0'))
+CONTACT_RATE_TRUSTED_HOPS = int(os.environ.get('CONTACT_RATE_TRUSTED_HOPS', '0'))
+CONTACT_RATE_BURST = int(os.environ.get('CONTACT_RATE_BURST', '30'))
+CONTACT_MAX_CONCURRENCY = int(os.environ.get('CONTACT_MAX_CONCURRENCY', '64'))
+CONTACT_MAX_QUEUE = int(os.environ.get('CONTACT_MAX_QUEUE', '256'))
+CONTACT_QUEUE_TIMEOUT = float(os.environ.get('CONTACT_QUEUE_TIMEOUT', '2'))
+CONTACT_BULK_MAX_CONCURRENCY = int(os.environ.get('CONTACT_BULK_MAX_CONCURRENCY', '2'))
+
+
+# Define Models
+class StatusCheck(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    client_name: str
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class StatusCheckCreate(BaseModel):
+    client_name: str
+
+class StatusSummary(BaseModel):
+    client_name: str
+    last_id: str
+    last_seen: datetime
+
+# Compiled once; validation runs on every form submission and bulk line
+PHONE_PATTERN = re.compile(r'^[\(\)\+\-\s\d]+$')
+
+@lru_cache(maxsize=4096)
+def _check_email(value: str) -> tuple:
+    try:
+        return validate_email(value)[1], None
+    except PydanticCustomError as e:
+        return None, (e.type, e.message_template, e.context)
+
+def _validate_email_cached(value: str) -> str:
+    # Same checks and errors as EmailStr, which spends most of its time in
+    # email-validator's IDNA handling; repeated addresses (retries, form spam)
+    # are answered from the cache
+    email, error = _check_email(value)
+    if error is not None:
+        raise PydanticCustomError(*error)
+    return email
+
+CachedEmailStr = Annotated[str, AfterValidator(_validate_email_cached), WithJsonSchema({"type": "string", "format": "email"})]
+
+class ContactCreate(BaseModel):
+    name: str = Field(..., min_length=2, max_length=100)
+    email: CachedEmailStr
+    phone: Optional[str] = Field(None, max_length=20)
+    service: Optional[str] = Field(None, max_length=100)
+    message: str = Field(..., min_length=10, max_length=1000)
+    
+    @field_validator('name')
+    @classmethod
+    def validate_name(cls, v: str) -> str:
+        v = v.strip()
+        if not v:
             raise ValueError('Nome não pode estar vazio')
-        return v.strip()
+        return v
     
-    @validator('phone')
-    def validate_phone(cls, v):
-        if v and v.strip():
-            # Basic phone validation - allow Brazilian format
-            phone_pattern = r'^[\(\)\+\-\s\d]+$'
-            if not re.match(phone_pattern, v.strip()):
-                raise ValueError('Telefone inválido')
-            return v.strip()
-        return None
+    @field_validator('phone')
+    @classmethod
+    def validate_phone(cls, v: Optional[str]) -> Optional[str]:
+        if v:
+            v = v.strip()
+        if not v:
+            return None
+        # Basic phone validation - allow Brazilian format
+        if not PHONE_PATTERN.match(v):
+            raise ValueError('Telefone inválido')
+        return v
     
-    @validator('message')
-    def validate_message(cls, v):
-        if not v.strip():
+    @field_validator('message')
+    @classmethod
+    def validate_message(cls, v: str) -> str:
+        v = v.strip()
+        if not v:
             raise ValueError('Mensagem não pode estar vazia')
-        return v.strip()
+        return v
+
+CONTACT_STATUSES = ("new", "contacted", "converted", "closed")
+CONTACT_STATUS_PATTERN = f"^({'|'.join(CONTACT_STATUSES)})$"
+# Allowed status changes; setting the current status again is a no-op
+CONTACT_STATUS_TRANSITIONS = {
+    "new": ("contacted", "converted", "closed"),
+    "contacted": ("converted", "closed"),
+    "converted": ("closed",),
+    "closed": ("contacted",),
+}
 
 class Contact(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -97,21 +284,104 @@ class Contact(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+def new_contact_document(contact_data: ContactCreate) -> dict:
+    """Document to store for an already validated ContactCreate"""
+    # model_construct fills id/status/timestamps without validating the fields again
+    contact_doc = Contact.model_construct(**contact_data.model_dump()).model_dump()
+    if any(NOTIFY_CHANNELS.values()):
+        # Stored with the contact itself, cleared once its outbox documents are in
+        contact_doc[NOTIFICATION_PENDING_FIELD] = True
+    return contact_doc
+
+def contact_document_from_json(raw) -> dict:
+    """Validate one JSON contact (str or bytes) and build its document.
+
+    Shared entry point for the bulk and batch paths; raises pydantic's
+    ValidationError (a ValueError) on invalid input.
+    """
+    return new_contact_document(ContactCreate.model_validate_json(raw))
+
 class ContactResponse(BaseModel):
     success: bool
     message: str
     contact_id: Optional[str] = None
 
+class ContactSummary(BaseModel):
+    id: str
+    name: str
+    email: str
+    service: Optional[str]
+    status: str
+    created_at: datetime
+
 class ContactsListResponse(BaseModel):
     success: bool
-    contacts: List[Contact]
-    total: int
+    contacts: List[Union[Contact, ContactSummary]]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class ContactSearchResult(Contact):
+    score: float
+
+class ContactSearchResponse(BaseModel):
+    success: bool
+    contacts: List[ContactSearchResult]
+    total: Optional[int] = None
+    next_skip: Optional[int] = None
+
+class BulkContactResult(BaseModel):
+    line: int
+    success: bool
+    contact_id: Optional[str] = None
+    errors: Optional[List[str]] = None
+
+class BulkContactsResponse(BaseModel):
+    success: bool
+    received: int
+    inserted: int
+    failed: int
+    results: List[BulkContactResult]
+
+class ContactStatusUpdate(BaseModel):
+    status: str = Field(..., pattern=CONTACT_STATUS_PATTERN)
+
+class ContactStatusChange(ContactStatusUpdate):
+    id: str
+
+class BatchStatusRequest(BaseModel):
+    updates: List[ContactStatusChange] = Field(..., min_length=1, max_length=10000)
+
+class StatusChangeResult(BaseModel):
+    id: str
+    success: bool
+    previous_status: Optional[str] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchStatusResponse(BaseModel):
+    success: bool
+    updated: int
+    unchanged: int
+    failed: int
+    results: List[StatusChangeResult]
 
 class StatsResponse(BaseModel):
     total_contacts: int
     contacts_this_month: int
     popular_services: List[dict]
 
+class TimeseriesPoint(BaseModel):
+    start: date
+    count: int
+    services: Dict[str, int]
+
+class TimeseriesResponse(BaseModel):
+    success: bool
+    granularity: str
+    service: Optional[str] = None
+    total: int
+    points: List[TimeseriesPoint]
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -124,37 +394,264 @@ async def create_status_check(input: StatusCheckCreate):
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
+# Stored fields the list endpoints return, without Mongo's _id
+STATUS_CHECK_PROJECTION = {"_id": 0, **{field: 1 for field in StatusCheck.model_fields}}
+CONTACT_PROJECTION = {"_id": 0, **{field: 1 for field in Contact.model_fields}}
+# Every field is in the contacts_*_summary indexes, so summary reads never touch the documents
+CONTACT_SUMMARY_PROJECTION = {"_id": 0, **{field: 1 for field in ContactSummary.model_fields}}
+CONTACT_PROJECTIONS = {"full": CONTACT_PROJECTION, "summary": CONTACT_SUMMARY_PROJECTION}
+
+def contact_filter(
+    status: Optional[str], service: Optional[str], created_from: Optional[datetime], created_to: Optional[datetime]
+) -> dict:
+    query = {}
+    if status:
+        query["status"] = status
+    if service:
+        query["service"] = service
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lt"] = created_to
+    return query
+
+def status_check_filter(
+    since: Optional[datetime], until: Optional[datetime], client_name: Optional[str]
+) -> dict:
+    query = {}
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+    if client_name:
+        query["client_name"] = client_name
+    return query
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    client_name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Newest status checks first, optionally within [since, until) for one client
+
+    When more rows exist, the `X-Next-Cursor` header holds the cursor for the next page.
+    """
+    query = status_check_filter(since, until, client_name)
+    if cursor:
+        try:
+            query = {"$and": [query, keyset_filter("timestamp", cursor)]}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    rows_cursor = db.status_checks.find(query, STATUS_CHECK_PROJECTION).sort(keyset_sort("timestamp")).limit(limit + 1)
+    status_checks = await rows_cursor.to_list(limit + 1)
+    headers = {}
+    if len(status_checks) > limit:
+        status_checks = status_checks[:limit]
+        last = status_checks[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["timestamp"], last["id"])
+    # Rows are ours: encode them as stored instead of re-validating each one
+    return FastJSONResponse(status_checks, headers=headers)
+
+@api_router.get("/status/latest", response_model=List[StatusSummary])
+async def get_latest_status_checks(
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Most recent status check per client_name, most recently seen first"""
+    pipeline = [
+        {"$match": status_check_filter(since, None, None)},
+        # Same order as the (client_name, timestamp) index so $first needs no extra sort
+        {"$sort": {"client_name": 1, "timestamp": -1}},
+        {"$group": {"_id": "$client_name", "last_id": {"$first": "$id"}, "last_seen": {"$first": "$timestamp"}}},
+        {"$sort": {"last_seen": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "client_name": "$_id", "last_id": 1, "last_seen": 1}},
+    ]
+    return FastJSONResponse(await db.status_checks.aggregate(pipeline).to_list(limit))
+
+async def enqueue_contact_notifications(contact_docs: List[dict]):
+    """Outbox documents for new contacts; sending happens in the background"""
+    documents = [
+        notification
+        for contact_doc in contact_docs
+        for notification in build_notifications(contact_doc, **NOTIFY_CHANNELS)
+    ]
+    if documents:
+        await enqueue_notifications(db[OUTBOX_COLLECTION], documents)
+        await clear_pending(db.contacts, [doc["id"] for doc in contact_docs if doc.get(NOTIFICATION_PENDING_FIELD)])
+        if outbox_dispatcher is not None:
+            outbox_dispatcher.wake()
+
+async def bump_contacts_version():
+    """New ETags for contact reads; called once contacts and their counters are stored"""
+    try:
+        await write_versions.bump(db, "contacts")
+    except Exception as e:
+        # Every worker keeps answering 304 with the old version until the next write
+        logger.error(f"Error bumping contacts write version: {str(e)}")
+
+def publish_contacts(contact_docs: List[dict]):
+    """Push new contacts, and the stats deltas they cause, to live feed subscribers"""
+    if len(contact_docs) > LIVE_FEED_MAX_BATCH:
+        live_feed.publish("contacts_bulk", {"count": len(contact_docs)})
+    else:
+        for contact_doc in contact_docs:
+            live_feed.publish("contact", {field: contact_doc.get(field) for field in ContactSummary.model_fields})
+
+    this_month = month_key(datetime.utcnow())
+    services = {}
+    for contact_doc in contact_docs:
+        if contact_doc.get("service"):
+            services[contact_doc["service"]] = services.get(contact_doc["service"], 0) + 1
+    live_feed.publish("stats", {
+        "total_contacts": len(contact_docs),
+        "contacts_this_month": sum(1 for doc in contact_docs if month_key(doc["created_at"]) == this_month),
+        "services": services,
+    })
+
+async def on_contacts_stored(contact_docs: List[dict]):
+    """Bookkeeping after contacts are persisted, by either write path"""
+    counters, rollups, outbox = await asyncio.gather(
+        record_contacts_created(db, contact_docs),
+        record_contacts_rolled_up(db, contact_docs),
+        enqueue_contact_notifications(contact_docs),
+        return_exceptions=True,
+    )
+    # The contacts are saved; stats_counters.py / stats_timeseries.py --apply repair these
+    if isinstance(counters, Exception):
+        logger.error(f"Error updating stats counters: {str(counters)}")
+    if isinstance(rollups, Exception):
+        logger.error(f"Error updating contact rollups: {str(rollups)}")
+    if isinstance(outbox, Exception):
+        # Still marked pending: the outbox dispatchers' sweep queues them later
+        logger.error(f"Error queueing contact notifications: {str(outbox)}")
+    await bump_contacts_version()
+    if contact_search_index is not None:
+        for contact_doc in contact_docs:
+            contact_search_index.add(contact_doc)
+    if LIVE_FEED_SOURCE == "local":
+        publish_contacts(contact_docs)
+    response_cache.invalidate("contacts:")
+    response_cache.invalidate("stats")
+
+@api_router.get("/status/export")
+async def export_status_checks(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    client_name: Optional[str] = None,
+):
+    """Stream status checks as CSV or NDJSON, newest first, with the GET /api/status filters"""
+    fields = list(StatusCheck.model_fields)
+    rows = (
+        db.status_checks.find(status_check_filter(since, until, client_name), STATUS_CHECK_PROJECTION)
+        .sort(keyset_sort("timestamp"))
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    return StreamingResponse(
+        stream_rows(rows, fields, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="status_checks.{format}"'}
+    )
 
 # Contact Routes
-@api_router.post("/contacts", response_model=ContactResponse)
-async def create_contact(contact_data: ContactCreate):
+class IdempotencyKeyReused(Exception):
+    """An Idempotency-Key sent again with a different submission."""
+
+def submission_keys(contact_data: ContactCreate, idempotency_key: Optional[str]):
+    """(in-process cache key, key stored on the document) for one submission.
+
+    Without a header the stored key carries the window number, so the unique
+    index only merges repeats that fall in the same window across workers;
+    within a worker the cache covers the full window. Both are None when
+    there is no header and no window.
+    """
+    if idempotency_key:
+        key = f"key:{idempotency_key}"
+        return key, key
+    if IDEMPOTENCY_WINDOW <= 0:
+        return None, None
+    content = f"{contact_data.email.lower()}\n{contact_data.message}".encode("utf-8")
+    key = f"hash:{hashlib.sha256(content).hexdigest()}"
+    return key, f"{key}:{int(time.time() // IDEMPOTENCY_WINDOW)}"
+
+async def store_contact(contact_doc: dict) -> Tuple[str, Optional[str]]:
+    """Persist a new contact; returns the id and payload hash of the contact that holds its idempotency key"""
     try:
-        # Create contact object
-        contact = Contact(
-            name=contact_data.name,
-            email=contact_data.email,
-            phone=contact_data.phone,
-            service=contact_data.service,
-            message=contact_data.message
+        if contact_writer is not None:
+            # Batched mode: bookkeeping runs once per flushed batch. With "enqueue" acks a
+            # duplicate is only dropped at flush time, after its own id was returned.
+            await contact_writer.submit(contact_doc, wait=CONTACT_WRITE_ACK == "flush")
+            logger.info(f"New contact queued: {contact_doc['email']}")
+            return contact_doc["id"], contact_doc.get("idempotency_hash")
+
+        await db.contacts.insert_one(contact_doc)
+        logger.info(f"New contact created: {contact_doc['email']}")
+        await on_contacts_stored([contact_doc])
+        return contact_doc["id"], contact_doc.get("idempotency_hash")
+    except DuplicateKeyError:
+        if "idempotency_key" not in contact_doc:
+            raise
+        # Stored earlier by another worker, or before this worker's cache entry expired
+        original = await db.contacts.find_one(
+            {"idempotency_key": contact_doc["idempotency_key"]}, {"_id": 0, "id": 1, "idempotency_hash": 1}
         )
-        
-        # Save to database
-        result = await db.contacts.insert_one(contact.dict())
-        
-        if result.inserted_id:
-            logger.info(f"New contact created: {contact.email}")
-            return ContactResponse(
-                success=True,
-                message="Contato enviado com sucesso! Entraremos em contato em breve.",
-                contact_id=contact.id
-            )
+        if original is None:
+            raise
+        return original["id"], original.get("idempotency_hash")
+
+@api_router.post("/contacts", response_model=ContactResponse)
+async def create_contact(
+    contact_data: ContactCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    try:
+        # Create contact document
+        contact_doc = new_contact_document(contact_data)
+        cache_key, stored_key = submission_keys(contact_data, idempotency_key)
+        if stored_key is None:
+            contact_id, _ = await store_contact(contact_doc)
         else:
-            raise HTTPException(status_code=500, detail="Erro ao salvar contato")
-            
+            contact_doc["idempotency_key"] = stored_key
+            if idempotency_key:
+                # A reused key must come with the same submission
+                contact_doc["idempotency_hash"] = hashlib.sha256(contact_data.model_dump_json().encode()).hexdigest()
+            # Single-flight: a double-click waits for the first insert instead of racing it
+            contact_id, original_hash = await idempotency_cache.get_or_load(
+                cache_key, lambda: store_contact(contact_doc), IDEMPOTENCY_WINDOW
+            )
+            if contact_id != contact_doc["id"]:
+                if idempotency_key and original_hash and original_hash != contact_doc["idempotency_hash"]:
+                    raise IdempotencyKeyReused(idempotency_key)
+                logger.info(f"Repeated contact submission answered with {contact_id}")
+                response.headers["Idempotent-Replayed"] = "true"
+
+        return ContactResponse(
+            success=True,
+            message="Contato enviado com sucesso! Entraremos em contato em breve.",
+            contact_id=contact_id
+        )
+
+    except WriteQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor sobrecarregado. Tente novamente em instantes.",
+            headers={"Retry-After": "1"}
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key já usada com outro conteúdo. Use uma nova chave para um novo contato."
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -164,74 +661,530 @@ async def create_contact(contact_data: ContactCreate):
             detail="Erro interno do servidor. Tente novamente ou entre em contato via WhatsApp."
         )
 
-@api_router.get("/contacts", response_model=ContactsListResponse)
-async def get_contacts(skip: int = 0, limit: int = 50):
-    """Get all contacts - for admin use"""
+@api_router.post("/contacts/bulk", response_model=BulkContactsResponse)
+async def create_contacts_bulk(
+    request: Request,
+    chunk_size: int = Query(CONTACT_BULK_CHUNK_SIZE, ge=1, le=10000),
+):
+    """Import contacts from an NDJSON body, one ContactCreate object per line"""
     try:
-        # Get total count
-        total = await db.contacts.count_documents({})
-        
-        # Get contacts with pagination
-        contacts_cursor = db.contacts.find().sort("created_at", -1).skip(skip).limit(limit)
-        contacts_list = await contacts_cursor.to_list(limit)
-        
-        contacts = [Contact(**contact) for contact in contacts_list]
-        
-        return ContactsListResponse(
-            success=True,
-            contacts=contacts,
-            total=total
+        report = await ingest_lines(
+            iter_ndjson_lines(request.stream()), contact_document_from_json, db.contacts, chunk_size, on_contacts_stored
+        )
+        logger.info(f"Bulk import: {report['inserted']} inserted, {report['failed']} failed")
+        return FastJSONResponse(report)
+    except Exception as e:
+        logger.error(f"Error importing contacts: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao importar contatos")
+
+@api_router.get("/contacts/export")
+async def export_contacts(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    cursor: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern=CONTACT_STATUS_PATTERN),
+    service: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    include_archived: bool = False,
+):
+    """Stream contacts as CSV or NDJSON, newest first - for admin use
+
+    Accepts the same filters, `fields`, `cursor` and `include_archived` as
+    GET /api/contacts.
+    """
+    query = contact_filter(status, service, created_from, created_to)
+    if cursor:
+        try:
+            query = {"$and": [query, keyset_filter("created_at", cursor)]}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    projection = CONTACT_PROJECTIONS[fields]
+    columns = [field for field in projection if field != "_id"]
+    rows = merge_keyset("created_at", *(
+        collection.find(query, projection).sort(keyset_sort("created_at")).batch_size(EXPORT_BATCH_SIZE)
+        for collection in contact_collections(include_archived)
+    ))
+    return StreamingResponse(
+        stream_rows(rows, columns, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'}
+    )
+
+async def contacts_etag(request: Request) -> Tuple[str, Optional[Response]]:
+    """ETag for a read derived from contacts, and the 304 to send if the client's copy is current"""
+    if_none_match = request.headers.get("if-none-match")
+    # A 304 must reflect other workers' writes too, so revalidations skip the token cache
+    token = await write_versions.get(db, "contacts", fresh=bool(if_none_match))
+    # The UTC day is part of it: "this month" and default date windows move without writes
+    etag = make_etag(token, datetime.utcnow().strftime("%Y%m%d"))
+    matched = matching_etag(if_none_match, etag)
+    if matched:
+        return etag, Response(status_code=304, headers=etag_headers(matched))
+    return etag, None
+
+def etag_headers(etag: Optional[str]) -> dict:
+    # no-cache: clients may keep the body but must revalidate before reusing it
+    return {"ETag": etag, "Cache-Control": "no-cache"} if etag else {}
+
+# Exact counts served from memory for a short while ("cached" count mode)
+CONTACTS_COUNT_CACHE_TTL = float(os.environ.get('CONTACTS_COUNT_CACHE_TTL', '30'))
+
+# include_archived pages merge skip + limit rows from each collection, so deep skips must use cursors
+ARCHIVED_MAX_SKIP = int(os.environ.get('ARCHIVED_MAX_SKIP', '1000'))
+
+def contact_collections(include_archived: bool) -> list:
+    """Collections a contact read covers: archived contacts only when asked for"""
+    return [db.contacts, db[ARCHIVE_COLLECTION]] if include_archived else [db.contacts]
+
+async def count_contacts(mode: str, query: dict, cache_key: str = "", include_archived: bool = False) -> Optional[int]:
+    """Number of contacts matching `query` according to the requested count mode"""
+    if mode == "none":
+        return None
+    collections = contact_collections(include_archived)
+    if mode == "estimated" and not query:
+        # Read from collection metadata, constant time regardless of size
+        return sum([await collection.estimated_document_count() for collection in collections])
+
+    async def count_documents():
+        # Filtered counts (including "estimated" ones) scan only the matching index range
+        return sum([await collection.count_documents(query) for collection in collections])
+
+    if mode == "cached":
+        return await response_cache.get_or_load(f"contacts:count{cache_key}", count_documents, CONTACTS_COUNT_CACHE_TTL)
+    return await count_documents()
+
+@api_router.get("/contacts", response_model=ContactsListResponse)
+async def get_contacts(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern="^(exact|estimated|cached|none)$"),
+    status: Optional[str] = Query(None, pattern=CONTACT_STATUS_PATTERN),
+    service: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    include_archived: bool = False,
+):
+    """Get all contacts - for admin use
+
+    Pass the returned `next_cursor` as `cursor` to page with constant cost;
+    `skip` is kept for older clients. `count` defaults to `exact` for
+    skip/limit requests and `estimated` for cursor requests.
+
+    `status`, `service` and the [created_from, created_to) window narrow the
+    list; `fields=summary` returns only id/name/email/service/status/created_at,
+    read from the index alone. Archived contacts are left out unless
+    `include_archived` is set; with it, `skip` goes up to ARCHIVED_MAX_SKIP.
+    """
+    if include_archived and not cursor and skip > ARCHIVED_MAX_SKIP:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Com include_archived, skip vai até {ARCHIVED_MAX_SKIP}; use cursor para páginas além disso",
         )
+    filters = contact_filter(status, service, created_from, created_to)
+    query = filters
+    if cursor:
+        try:
+            query = {"$and": [filters, keyset_filter("created_at", cursor)]}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        skip = 0
+
+    count_mode = count or ("estimated" if cursor else "exact")
+    filter_key = f":{status}:{service}:{created_from}:{created_to}" if filters else ""
+    if include_archived:
+        filter_key += ":archived"
+
+    async def load_page():
+        # Fetch one extra row to know whether another page exists
+        if include_archived:
+            # Each collection's first skip + limit + 1 rows hold the merged page
+            merged = merge_keyset("created_at", *(
+                collection.find(query, CONTACT_PROJECTIONS[fields]).sort(keyset_sort("created_at")).limit(skip + limit + 1)
+                for collection in contact_collections(True)
+            ))
+            contacts_list = [row async for row in merged][skip:skip + limit + 1]
+        else:
+            contacts_cursor = (
+                db.contacts.find(query, CONTACT_PROJECTIONS[fields])
+                .sort(keyset_sort("created_at"))
+                .skip(skip)
+                .limit(limit + 1)
+            )
+            contacts_list = await contacts_cursor.to_list(limit + 1)
+
+        next_cursor = None
+        if len(contacts_list) > limit:
+            contacts_list = contacts_list[:limit]
+            last = contacts_list[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+
+        total = await count_contacts(count_mode, filters, filter_key, include_archived)
+
+        # Same shape as ContactsListResponse, built from trusted rows without re-validation
+        return {
+            "success": True,
+            "contacts": contacts_list,
+            "total": total,
+            "next_cursor": next_cursor
+        }
+
+    try:
+        etag = None
+        # "cached" counts lag behind writes, so those pages get no ETag
+        if count_mode != "cached":
+            etag, not_modified = await contacts_etag(request)
+            if not_modified is not None:
+                return not_modified
+        if cursor or skip:
+            return FastJSONResponse(await load_page(), headers=etag_headers(etag))
+        # The first page is what the dashboard polls; keyed by version, a cached
+        # page is never older than the ETag it is sent with
+        return FastJSONResponse(await response_cache.get_or_load(
+            f"contacts:first:{etag}:{limit}:{count_mode}:{fields}{filter_key}", load_page,
+            CACHE_TTL_CONTACTS, CACHE_STALE_TTL
+        ), headers=etag_headers(etag))
     except Exception as e:
         logger.error(f"Error fetching contacts: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar contatos")
 
-@api_router.get("/stats", response_model=StatsResponse)
-async def get_stats():
-    """Get basic statistics about contacts"""
+@api_router.get("/contacts/stream")
+async def stream_contacts(last_event_id: Optional[str] = Header(None, max_length=64)):
+    """Server-sent events for the admin dashboard - for admin use
+
+    `contact` events carry new contacts (summary fields), `stats` events the
+    deltas to apply to GET /api/stats, `contacts_bulk` a large import, and
+    `reset` means events were missed: reload through the REST endpoints.
+    """
+    return StreamingResponse(
+        sse_stream(live_feed, last_event_id, max_seconds=LIVE_FEED_MAX_SECONDS),
+        media_type="text/event-stream",
+        # No caching or proxy buffering, or events arrive in bursts
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/contacts/search", response_model=ContactSearchResponse)
+async def search_contacts(
+    q: str = Query(..., min_length=2, max_length=200),
+    skip: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Ranked full-text search over name, email, service and message - for admin use
+
+    Accent and case insensitive. Page with `skip` = the returned `next_skip`.
+    `total` is only known with the in-process backend.
+    """
     try:
-        # Total contacts
-        total_contacts = await db.contacts.count_documents({})
-        
-        # Contacts this month
-        from datetime import datetime, timedelta
-        start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        contacts_this_month = await db.contacts.count_documents({
-            "created_at": {"$gte": start_of_month}
+        if contact_search_index is None:
+            # Fetch one extra row to know whether another page exists
+            rows = await (
+                db.contacts.find({"$text": {"$search": q}}, {**CONTACT_PROJECTION, "score": {"$meta": "textScore"}})
+                .sort([("score", {"$meta": "textScore"})])
+                .skip(skip)
+                .limit(limit + 1)
+                .to_list(limit + 1)
+            )
+            total = None
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            await contact_search_index.refresh(db.contacts)
+            while True:
+                total, ranked = contact_search_index.search(q, skip, limit)
+                by_id = {
+                    row["id"]: row
+                    async for row in db.contacts.find({"id": {"$in": [i for i, _ in ranked]}}, CONTACT_PROJECTION)
+                }
+                # Archived or deleted since the last prune: drop them and rank again so total agrees
+                if not contact_search_index.remove([i for i, _ in ranked if i not in by_id]):
+                    break
+            rows = [{**by_id[i], "score": score} for i, score in ranked]
+            has_more = skip + limit < total
+
+        return FastJSONResponse({
+            "success": True,
+            "contacts": rows,
+            "total": total,
+            "next_skip": skip + limit if has_more else None
         })
-        
-        # Popular services
-        pipeline = [
-            {"$match": {"service": {"$ne": None, "$ne": ""}}},
-            {"$group": {"_id": "$service", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 5},
-            {"$project": {"service": "$_id", "count": 1, "_id": 0}}
-        ]
-        
-        popular_services_cursor = db.contacts.aggregate(pipeline)
-        popular_services = await popular_services_cursor.to_list(5)
-        
-        return StatsResponse(
-            total_contacts=total_contacts,
-            contacts_this_month=contacts_this_month,
-            popular_services=popular_services
+    except Exception as e:
+        logger.error(f"Error searching contacts: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar contatos")
+
+async def apply_status_chunk(changes: List[ContactStatusChange], now: datetime) -> List[dict]:
+    """Validate and apply one chunk of status changes with one find and one bulk_write"""
+    ids = [change.id for change in changes]
+    current = {
+        row["id"]: row["status"]
+        async for row in db.contacts.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "status": 1})
+    }
+
+    results, ops, pending = [], [], []
+    for change in changes:
+        previous = current.get(change.id)
+        result = {"id": change.id, "success": False, "previous_status": previous}
+        results.append(result)
+        if change.id not in current:
+            result["error"] = "Contato não encontrado"
+        elif previous == change.status:
+            result.update(success=True, status=previous)
+        elif change.status not in CONTACT_STATUS_TRANSITIONS.get(previous, ()):
+            result["error"] = f"Transição de status inválida: {previous} -> {change.status}"
+        else:
+            # Conditional on the status we validated against, so concurrent updates cannot skip a check
+            ops.append(UpdateOne(
+                {"id": change.id, "status": previous},
+                {"$set": {"status": change.status, "updated_at": now}},
+            ))
+            pending.append((result, change.status))
+
+    if ops:
+        outcome = await db.contacts.bulk_write(ops, ordered=False)
+        if outcome.modified_count < len(ops):
+            # Some contacts changed since the find: only ours carry this exact updated_at
+            stamped = {
+                row["id"]
+                async for row in db.contacts.find(
+                    {"id": {"$in": [result["id"] for result, _ in pending]}, "updated_at": now}, {"_id": 0, "id": 1}
+                )
+            }
+            pending_ok = []
+            for result, status in pending:
+                if result["id"] in stamped:
+                    pending_ok.append((result, status))
+                else:
+                    result["error"] = "Contato alterado por outra requisição. Tente novamente."
+            pending = pending_ok
+        for result, status in pending:
+            result.update(success=True, status=status, changed=True)
+    return results
+
+async def change_contact_statuses(changes: List[ContactStatusChange]) -> List[dict]:
+    """Apply status changes chunk by chunk; repeated ids in one request are rejected"""
+    now = datetime.utcnow()
+    results, unique, seen = [None] * len(changes), [], set()
+    for position, change in enumerate(changes):
+        if change.id in seen:
+            results[position] = {
+                "id": change.id, "success": False, "previous_status": None, "error": "Contato repetido no lote"
+            }
+        else:
+            seen.add(change.id)
+            unique.append((position, change))
+
+    moves = {}
+    for start in range(0, len(unique), CONTACT_STATUS_CHUNK_SIZE):
+        chunk = unique[start:start + CONTACT_STATUS_CHUNK_SIZE]
+        for (position, _), result in zip(chunk, await apply_status_chunk([c for _, c in chunk], now)):
+            if result.pop("changed", False):
+                key = (result["previous_status"], result["status"])
+                moves[key] = moves.get(key, 0) + 1
+            results[position] = result
+
+    if moves:
+        try:
+            await record_status_changes(db, moves)
+        except Exception as e:
+            # The statuses are saved; counters are repaired by stats_counters.py --apply
+            logger.error(f"Error updating status counters: {str(e)}")
+        await bump_contacts_version()
+        response_cache.invalidate("contacts:")
+    return results
+
+@api_router.patch("/contacts/{contact_id}", response_model=Contact)
+async def update_contact_status(contact_id: str, update: ContactStatusUpdate):
+    """Change one contact's status - for admin use"""
+    try:
+        [result] = await change_contact_statuses([ContactStatusChange(id=contact_id, status=update.status)])
+        contact = await db.contacts.find_one({"id": contact_id}, CONTACT_PROJECTION) if result["success"] else None
+    except Exception as e:
+        logger.error(f"Error updating contact status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao atualizar contato")
+
+    if contact is None:
+        status_code = 404 if result["previous_status"] is None else 409
+        raise HTTPException(status_code=status_code, detail=result.get("error") or "Contato não encontrado")
+    return FastJSONResponse(contact)
+
+@api_router.post("/contacts/status:batch", response_model=BatchStatusResponse)
+async def batch_update_contact_status(request: BatchStatusRequest):
+    """Change many contacts' statuses at once - for CRM sync
+
+    Each id gets its own result; invalid transitions or unknown ids do not
+    stop the others. Statuses are written with one bulk_write per
+    CONTACT_STATUS_CHUNK_SIZE updates.
+    """
+    try:
+        results = await change_contact_statuses(request.updates)
+    except Exception as e:
+        logger.error(f"Error updating contact statuses: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao atualizar contatos")
+
+    failed = sum(1 for result in results if not result["success"])
+    unchanged = sum(1 for result, change in zip(results, request.updates)
+                    if result["success"] and result["previous_status"] == change.status)
+    return FastJSONResponse({
+        "success": failed == 0,
+        "updated": len(results) - failed - unchanged,
+        "unchanged": unchanged,
+        "failed": failed,
+        "results": results
+    })
+
+@api_router.get("/stats", response_model=StatsResponse)
+async def get_stats(request: Request, response: Response):
+    """Get basic statistics about contacts (served from stats_counters)"""
+    try:
+        etag, not_modified = await contacts_etag(request)
+        if not_modified is not None:
+            return not_modified
+        response.headers.update(etag_headers(etag))
+        return await response_cache.get_or_load(
+            f"stats:{etag}", lambda: read_stats(db), CACHE_TTL_STATS, CACHE_STALE_TTL
         )
     except Exception as e:
         logger.error(f"Error fetching stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar estatísticas")
 
+@api_router.get("/stats/timeseries", response_model=TimeseriesResponse)
+async def get_stats_timeseries(
+    request: Request,
+    response: Response,
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    service: Optional[str] = None,
+):
+    """Contact volume per day or week over [from, to), per service
+
+    Served from the daily contact_rollups buckets. `to` defaults to tomorrow
+    (so today is included) and `from` to TIMESERIES_DEFAULT_DAYS before it;
+    weeks start on Monday. Days are UTC.
+    """
+    date_to = date_to or datetime.utcnow().date() + timedelta(days=1)
+    date_from = date_from or date_to - timedelta(days=TIMESERIES_DEFAULT_DAYS)
+    if date_from >= date_to:
+        raise HTTPException(status_code=400, detail="'from' deve ser anterior a 'to'")
+    if period_count(date_from, date_to, granularity) > TIMESERIES_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Intervalo muito longo: no máximo {TIMESERIES_MAX_POINTS} pontos por consulta",
+        )
+
+    async def load_timeseries():
+        points = await read_timeseries(db, granularity, date_from, date_to, service)
+        return {
+            "success": True,
+            "granularity": granularity,
+            "service": service,
+            "total": sum(point["count"] for point in points),
+            "points": points,
+        }
+
+    try:
+        etag, not_modified = await contacts_etag(request)
+        if not_modified is not None:
+            return not_modified
+        response.headers.update(etag_headers(etag))
+        # Under the "stats" prefix, so new contacts invalidate it
+        return await response_cache.get_or_load(
+            f"stats:timeseries:{etag}:{granularity}:{date_from}:{date_to}:{service}",
+            load_timeseries, CACHE_TTL_STATS, CACHE_STALE_TTL
+        )
+    except Exception as e:
+        logger.error(f"Error fetching stats timeseries: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar estatísticas")
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss/eviction counters of the in-process response cache"""
+    return response_cache.stats()
+
+# Health probes for the load balancer
+READINESS_PING_TIMEOUT = float(os.environ.get('READINESS_PING_TIMEOUT', '1'))
+
+@api_router.get("/health/live")
+async def health_live():
+    """The worker's event loop is responsive"""
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def health_ready():
+    """Startup finished and MongoDB answers; 503 tells the balancer to skip this worker"""
+    if not app_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    try:
+        await asyncio.wait_for(db.command("ping"), READINESS_PING_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {str(e)}")
+        return JSONResponse(status_code=503, content={"status": "database unavailable"})
+    return {"status": "ready"}
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of HTTP, MongoDB and cache metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+def collect_component_metrics() -> List[str]:
+    lines = []
+    for key, value in response_cache.stats().items():
+        lines.append(f"response_cache_{key} {value}")
+    for key, value in idempotency_cache.stats().items():
+        lines.append(f"idempotency_cache_{key} {value}")
+    for key, value in live_feed.stats().items():
+        lines.append(f"live_feed_{key} {value}")
+    if contact_search_index is not None:
+        for key, value in contact_search_index.stats().items():
+            lines.append(f"contact_search_index_{key} {value}")
+    if contact_writer is not None:
+        for key, value in contact_writer.stats().items():
+            lines.append(f"contact_writer_{key} {value}")
+    if outbox_dispatcher is not None:
+        for key, value in outbox_dispatcher.stats().items():
+            lines.append(f"outbox_dispatcher_{key} {value}")
+    return lines
+
+metrics_registry.add_collector(collect_component_metrics)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Innermost, so admission rejections and CORS preflights skip it
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+# Inside CORS so browsers can read the 429/503 answers
+app.add_middleware(AdmissionMiddleware, rules=[
+    AdmissionRule(
+        "POST", "/api/contacts",
+        max_concurrency=CONTACT_MAX_CONCURRENCY,
+        max_queue=CONTACT_MAX_QUEUE,
+        queue_timeout=CONTACT_QUEUE_TIMEOUT,
+        rate=CONTACT_RATE_PER_MINUTE / 60,
+        burst=CONTACT_RATE_BURST,
+    ),
+    AdmissionRule(
+        "POST", "/api/contacts/bulk",
+        max_concurrency=CONTACT_BULK_MAX_CONCURRENCY,
+        max_queue=CONTACT_BULK_MAX_CONCURRENCY,
+        queue_timeout=CONTACT_QUEUE_TIMEOUT,
+    ),
+], trusted_hops=CONTACT_RATE_TRUSTED_HOPS)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After", "Idempotent-Replayed", "ETag"],
 )
 
+# Outermost, so CORS preflights and error responses are measured too
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -239,6 +1192,108 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# Index bootstrap at startup: "ensure" creates missing indexes, "report" only logs them
+INDEX_BOOTSTRAP = os.environ.get('INDEX_BOOTSTRAP', 'ensure')
+
+async def bootstrap_indexes():
+    if INDEX_BOOTSTRAP == "off":
+        return
+    # The in-process search backend exists for servers that cannot build the text index
+    specs = [spec for spec in INDEXES if CONTACT_SEARCH_BACKEND == "text" or spec.name != TEXT_SEARCH_INDEX]
+    await ensure_indexes(db, dry_run=INDEX_BOOTSTRAP == "report", specs=specs)
+
+async def check_stats_counters():
+    # Not rebuilt here: a worker's $set rebuild would overwrite the $inc writes of workers already serving
+    try:
+        if not await has_counters(db) and await db.contacts.find_one({}, {"_id": 1}) is not None:
+            logger.warning("No stats counters for the existing contacts: run `python cli.py stats-counters --apply`")
+    except Exception as e:
+        logger.error(f"Error checking stats counters: {str(e)}")
+
+async def start_contact_writer():
+    global contact_writer
+    if CONTACT_WRITE_MODE != "batched":
+        return
+    contact_writer = BatchWriter(
+        db.contacts,
+        max_queue=int(os.environ.get('CONTACT_WRITE_QUEUE_SIZE', '10000')),
+        batch_size=int(os.environ.get('CONTACT_WRITE_BATCH_SIZE', '500')),
+        flush_interval=float(os.environ.get('CONTACT_WRITE_FLUSH_MS', '50')) / 1000,
+        on_flushed=on_contacts_stored,
+    )
+    contact_writer.start()
+
+async def start_outbox_dispatcher():
+    global outbox_dispatcher
+    mailer = None
+    if NOTIFY_EMAIL_ENABLED:
+        mailer = SMTPMailer(
+            NOTIFY_SMTP_HOST,
+            int(os.environ.get('NOTIFY_SMTP_PORT', '587')),
+            NOTIFY_FROM,
+            username=os.environ.get('NOTIFY_SMTP_USER') or None,
+            password=os.environ.get('NOTIFY_SMTP_PASSWORD') or None,
+            starttls=os.environ.get('NOTIFY_SMTP_STARTTLS', 'true').lower() == 'true',
+        )
+    webhook = WebhookSender(NOTIFY_WEBHOOK_URL) if NOTIFY_WEBHOOK_URL else None
+    if mailer is None and webhook is None:
+        return
+    outbox_dispatcher = OutboxDispatcher(
+        db[OUTBOX_COLLECTION],
+        mailer=mailer,
+        webhook=webhook,
+        batch_size=int(os.environ.get('NOTIFY_BATCH_SIZE', '50')),
+        poll_interval=float(os.environ.get('NOTIFY_POLL_SECONDS', '2')),
+        max_attempts=int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '8')),
+        backoff_base=float(os.environ.get('NOTIFY_BACKOFF_SECONDS', '30')),
+        contacts=db.contacts,
+        build=lambda contact_doc: build_notifications(contact_doc, **NOTIFY_CHANNELS),
+        sweep_after=NOTIFY_SWEEP_SECONDS,
+    )
+    outbox_dispatcher.start()
+
+background_tasks = set()
+
+def start_background_task(coro):
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def build_search_index():
+    try:
+        await contact_search_index.refresh(db.contacts, force=True)
+    except Exception as e:
+        # Searches retry the refresh themselves
+        logger.error(f"Error building contact search index: {str(e)}")
+
+async def start_search_index():
+    global contact_search_index
+    if CONTACT_SEARCH_BACKEND != "memory":
+        return
+    contact_search_index = ContactSearchIndex(
+        refresh_interval=float(os.environ.get('CONTACT_SEARCH_REFRESH_SECONDS', '5')),
+    )
+    # Built in the background; the first search waits for it instead of startup
+    start_background_task(build_search_index())
+
+async def on_startup():
+    await bootstrap_indexes()
+    await check_stats_counters()
+    await start_contact_writer()
+    await start_search_index()
+    await start_outbox_dispatcher()
+    if LIVE_FEED_SOURCE == "changestream":
+        start_background_task(watch_contacts(db.contacts, publish_contacts))
+
+async def on_shutdown():
+    global contact_writer, outbox_dispatcher
+    # Drain queued contacts before the connection goes away
+    if contact_writer is not None:
+        await contact_writer.stop()
+        contact_writer = None
+    if outbox_dispatcher is not None:
+        await outbox_dispatcher.stop()
+        outbox_dispatcher = None
+    for task in list(background_tasks):
+        task.cancel()
+    live_feed.close()
@@ -0,0 +1,198 @@
+"""Incrementally maintained contact counters backing GET /api/stats.
+
+Counter documents live in the `stats_counters` collection, one per bucket:
+
+    {"_id": "total", "kind": "total", "count": 1234}
+    {"_id": "month:2025-09", "kind": "month", "month": "2025-09", "count": 87}
+    {"_id": "service:Consultoria", "kind": "service", "service": "Consultoria", "count": 40}
+    {"_id": "status:new", "kind": "status", "status": "new", "count": 900}
+
+Writes use `$inc` upserts so concurrent workers never lose updates. Run
+`python cli.py stats-counters` to compare the counters with the raw
+`contacts` collection, and `--apply` to rewrite them (once after upgrading an
+existing database; the API never rebuilds them on its own, since the rebuild's
+`$set` would overwrite increments made while it runs).
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from archive import ARCHIVE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "stats_counters"
+POPULAR_SERVICES_LIMIT = 5
+
+
+def month_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m")
+
+
+def _bucket_ops(contact: dict, amount: int) -> List[UpdateOne]:
+    ops = [
+        UpdateOne({"_id": "total"}, {"$inc": {"count": amount}, "$setOnInsert": {"kind": "total"}}, upsert=True),
+    ]
+    month = month_key(contact["created_at"])
+    ops.append(UpdateOne(
+        {"_id": f"month:{month}"},
+        {"$inc": {"count": amount}, "$setOnInsert": {"kind": "month", "month": month}},
+        upsert=True,
+    ))
+    if contact.get("service"):
+        ops.append(UpdateOne(
+            {"_id": f"service:{contact['service']}"},
+            {"$inc": {"count": amount}, "$setOnInsert": {"kind": "service", "service": contact["service"]}},
+            upsert=True,
+        ))
+    if contact.get("status"):
+        ops.append(_status_op(contact["status"], amount))
+    return ops
+
+
+def _status_op(status: str, amount: int) -> UpdateOne:
+    return UpdateOne(
+        {"_id": f"status:{status}"},
+        {"$inc": {"count": amount}, "$setOnInsert": {"kind": "status", "status": status}},
+        upsert=True,
+    )
+
+
+async def record_contacts_created(db, contacts: List[dict]):
+    """Add newly inserted contacts to every counter in a single round trip."""
+    ops = [op for contact in contacts for op in _bucket_ops(contact, 1)]
+    if ops:
+        await db[COLLECTION].bulk_write(ops, ordered=False)
+
+
+async def record_status_change(db, old_status: Optional[str], new_status: str, amount: int = 1):
+    """Move `amount` contacts from one status counter to another."""
+    await record_status_changes(db, {(old_status, new_status): amount})
+
+
+async def record_status_changes(db, changes: Dict[Tuple[Optional[str], str], int]):
+    """Apply many `(old, new) -> amount` moves in a single round trip."""
+    deltas: Dict[str, int] = {}
+    for (old_status, new_status), amount in changes.items():
+        if old_status == new_status:
+            continue
+        deltas[new_status] = deltas.get(new_status, 0) + amount
+        if old_status:
+            deltas[old_status] = deltas.get(old_status, 0) - amount
+    ops = [_status_op(status, amount) for status, amount in deltas.items() if amount]
+    if ops:
+        await db[COLLECTION].bulk_write(ops, ordered=False)
+
+
+async def has_counters(db) -> bool:
+    return await db[COLLECTION].find_one({"_id": "total"}, {"_id": 1}) is not None
+
+
+async def read_stats(db, now: Optional[datetime] = None) -> dict:
+    """Build the StatsResponse payload from counter documents only."""
+    now = now or datetime.utcnow()
+    wanted = ["total", f"month:{month_key(now)}"]
+    found = {doc["_id"]: doc["count"] async for doc in db[COLLECTION].find({"_id": {"$in": wanted}})}
+
+    services_cursor = (
+        db[COLLECTION]
+        .find({"kind": "service", "count": {"$gt": 0}}, {"_id": 0, "service": 1, "count": 1})
+        .sort("count", -1)
+        .limit(POPULAR_SERVICES_LIMIT)
+    )
+    popular_services = await services_cursor.to_list(POPULAR_SERVICES_LIMIT)
+
+    return {
+        "total_contacts": found.get("total", 0),
+        "contacts_this_month": found.get(wanted[1], 0),
+        "popular_services": popular_services,
+    }
+
+
+async def compute_counters(db) -> Dict[str, dict]:
+    """Recompute every counter document from the raw contacts, archived ones included."""
+    counters: Dict[str, dict] = {}
+
+    def add(key: str, doc: dict, count: int):
+        counters.setdefault(key, {**doc, "count": 0})["count"] += count
+
+    add("total", {"kind": "total"}, 0)
+    for collection in (db.contacts, db[ARCHIVE_COLLECTION]):
+        add("total", {"kind": "total"}, await collection.count_documents({}))
+
+        pipeline = [
+            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}}, "count": {"$sum": 1}}},
+        ]
+        async for row in collection.aggregate(pipeline):
+            add(f"month:{row['_id']}", {"kind": "month", "month": row["_id"]}, row["count"])
+
+        pipeline = [
+            {"$match": {"service": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$service", "count": {"$sum": 1}}},
+        ]
+        async for row in collection.aggregate(pipeline):
+            add(f"service:{row['_id']}", {"kind": "service", "service": row["_id"]}, row["count"])
+
+        pipeline = [
+            {"$match": {"status": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ]
+        async for row in collection.aggregate(pipeline):
+            add(f"status:{row['_id']}", {"kind": "status", "status": row["_id"]}, row["count"])
+
+    return counters
+
+
+async def reconcile_counters(db, apply: bool = False) -> List[dict]:
+    """Compare stored counters with recomputed ones, rewriting them when `apply`.
+
+    Returns the counters that drifted. Contacts written while the rebuild runs
+    can still be off by their own increments; run it during quiet periods.
+    """
+    expected = await compute_counters(db)
+    stored = {doc["_id"]: doc async for doc in db[COLLECTION].find()}
+
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key, {}).get("count", 0)
+        have = stored.get(key, {}).get("count", 0)
+        if want != have:
+            drift.append({"counter": key, "stored": have, "expected": want})
+
+    if apply:
+        ops = [UpdateOne({"_id": key}, {"$set": doc}, upsert=True) for key, doc in expected.items()]
+        if ops:
+            await db[COLLECTION].bulk_write(ops, ordered=False)
+        stale = [key for key in stored if key not in expected]
+        if stale:
+            await db[COLLECTION].delete_many({"_id": {"$in": stale}})
+        logger.info(f"Rebuilt {len(expected)} stats counters ({len(drift)} had drifted)")
+
+    return drift
+
+
+async def _main(apply: bool):
+    from database import create_mongo_client
+    from server import db_name, mongo_url
+
+    client = create_mongo_client(mongo_url)
+    db = client[db_name]
+    try:
+        drift = await reconcile_counters(db, apply=apply)
+        for row in drift:
+            print(f"{row['counter']}: stored {row['stored']}, expected {row['expected']}")
+        print(f"{len(drift)} counter(s) drifted" + (" and were rewritten" if apply and drift else ""))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check (and optionally rebuild) the GET /api/stats counters.")
+    parser.add_argument("--apply", action="store_true", help="rewrite counters from the contacts collection")
+    args = parser.parse_args()
+    asyncio.run(_main(args.apply))
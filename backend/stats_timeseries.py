@@ -0,0 +1,195 @@
+"""Daily contact volume per service backing GET /api/stats/timeseries.
+
+Rollup documents live in the `contact_rollups` collection, one per UTC day
+and service (`service` is null for contacts without one):
+
+    {"_id": "2025-09-14|Consultoria", "day": ISODate("2025-09-14"), "service": "Consultoria", "count": 12}
+
+Inserts `$inc` their day/service bucket; weekly series are summed from the
+daily buckets at read time. Run `python cli.py rollups` to compare the
+rollups with the raw `contacts` collection, and `--apply` to rewrite them
+(once after upgrading, on an existing database). The rebuild streams contacts
+in batches and buckets each batch with pandas rather than one document at a
+time. It only touches days before a high-water mark (yesterday by default):
+recent buckets belong to the live `$inc`s, which a `$set` would overwrite.
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from pymongo import UpdateOne
+
+from archive import ARCHIVE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "contact_rollups"
+GRANULARITIES = ("day", "week")
+BACKFILL_BATCH_SIZE = 50000
+WRITE_CHUNK_SIZE = 1000
+# Write-behind flushes and clock skew can still $inc yesterday's bucket just after midnight
+SETTLE_DAYS = 1
+
+
+def bucket_id(day: date, service: Optional[str]) -> str:
+    return f"{day.isoformat()}|{service or ''}"
+
+
+def period_start(day: date, granularity: str) -> date:
+    """First day of the period holding `day`; weeks start on Monday."""
+    return day - timedelta(days=day.weekday()) if granularity == "week" else day
+
+
+def _as_datetime(day: date) -> datetime:
+    # BSON has no date type: days are stored as UTC midnight
+    return datetime.combine(day, time.min)
+
+
+async def record_contacts_rolled_up(db, contacts: List[dict]):
+    """Add newly inserted contacts to their day/service buckets in a single round trip."""
+    amounts: Dict[Tuple[date, Optional[str]], int] = {}
+    for contact in contacts:
+        key = (contact["created_at"].date(), contact.get("service") or None)
+        amounts[key] = amounts.get(key, 0) + 1
+    ops = [
+        UpdateOne(
+            {"_id": bucket_id(day, service)},
+            {"$inc": {"count": amount}, "$setOnInsert": {"day": _as_datetime(day), "service": service}},
+            upsert=True,
+        )
+        for (day, service), amount in amounts.items()
+    ]
+    if ops:
+        await db[COLLECTION].bulk_write(ops, ordered=False)
+
+
+def period_count(start: date, end: date, granularity: str) -> int:
+    """Number of points a [start, end) series has."""
+    step = 7 if granularity == "week" else 1
+    first = period_start(start, granularity)
+    return max(0, -(-(end - first).days // step))
+
+
+async def read_timeseries(db, granularity: str, start: date, end: date, service: Optional[str] = None) -> List[dict]:
+    """Contact counts per period over [start, end), with empty periods as zeros.
+
+    Weekly series start on the Monday of `start`'s week, so the first point
+    can include days before `start`.
+    """
+    first = period_start(start, granularity)
+    step = timedelta(days=7 if granularity == "week" else 1)
+    points: Dict[date, dict] = {}
+    current = first
+    while current < end:
+        points[current] = {"start": current, "count": 0, "services": {}}
+        current += step
+
+    query = {"day": {"$gte": _as_datetime(first), "$lt": _as_datetime(end)}}
+    if service:
+        query["service"] = service
+    async for row in db[COLLECTION].find(query, {"_id": 0, "day": 1, "service": 1, "count": 1}):
+        point = points[period_start(row["day"].date(), granularity)]
+        point["count"] += row["count"]
+        if row.get("service"):
+            point["services"][row["service"]] = point["services"].get(row["service"], 0) + row["count"]
+    return list(points.values())
+
+
+def _bucket_batch(rows: List[dict]) -> pd.Series:
+    """Counts of one batch of contacts by (day, service), computed column-wise."""
+    # Only the column extraction touches documents one by one; parsing,
+    # flooring and grouping run over whole arrays
+    frame = pd.DataFrame({
+        "day": pd.to_datetime([row.get("created_at") for row in rows]).floor("D"),
+        "service": [row.get("service") or "" for row in rows],
+    })
+    return frame.dropna(subset=["day"]).groupby(["day", "service"]).size()
+
+
+def high_water_mark(settle_days: int = SETTLE_DAYS) -> date:
+    """First day the backfill leaves alone: live increments may still land on it."""
+    return datetime.utcnow().date() - timedelta(days=settle_days)
+
+
+async def compute_rollups(db, before: date, batch_size: int = BACKFILL_BATCH_SIZE) -> Dict[str, dict]:
+    """Recompute the rollup documents of days before `before` from the raw contacts, archived ones included."""
+    totals = None
+    query = {"created_at": {"$lt": _as_datetime(before)}}
+    for collection in (db.contacts, db[ARCHIVE_COLLECTION]):
+        cursor = collection.find(query, {"_id": 0, "created_at": 1, "service": 1}).batch_size(batch_size)
+        while True:
+            rows = await cursor.to_list(batch_size)
+            if not rows:
+                break
+            counts = _bucket_batch(rows)
+            totals = counts if totals is None else totals.add(counts, fill_value=0)
+
+    rollups = {}
+    for (day, service), count in ([] if totals is None else totals.items()):
+        day = day.date()
+        rollups[bucket_id(day, service)] = {"day": _as_datetime(day), "service": service or None, "count": int(count)}
+    return rollups
+
+
+async def reconcile_rollups(db, apply: bool = False, settle_days: int = SETTLE_DAYS) -> List[dict]:
+    """Compare stored rollups with recomputed ones, rewriting them when `apply`.
+
+    Returns the buckets that drifted. Only days before the high-water mark are
+    compared or written, so concurrent inserts never lose their increments.
+    """
+    before = high_water_mark(settle_days)
+    expected = await compute_rollups(db, before)
+    stored = {
+        doc["_id"]: doc["count"]
+        async for doc in db[COLLECTION].find({"day": {"$lt": _as_datetime(before)}}, {"count": 1})
+    }
+
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key, {}).get("count", 0)
+        have = stored.get(key, 0)
+        if want != have:
+            drift.append({"bucket": key, "stored": have, "expected": want})
+
+    if apply:
+        ops = [UpdateOne({"_id": key}, {"$set": doc}, upsert=True) for key, doc in expected.items()]
+        for offset in range(0, len(ops), WRITE_CHUNK_SIZE):
+            await db[COLLECTION].bulk_write(ops[offset:offset + WRITE_CHUNK_SIZE], ordered=False)
+        stale = [key for key in stored if key not in expected]
+        if stale:
+            await db[COLLECTION].delete_many({"_id": {"$in": stale}})
+        logger.info(f"Rebuilt {len(expected)} contact rollups before {before} ({len(drift)} had drifted)")
+
+    return drift
+
+
+async def _main(apply: bool, settle_days: int = SETTLE_DAYS):
+    from database import create_mongo_client
+    from server import db_name, mongo_url
+
+    client = create_mongo_client(mongo_url)
+    db = client[db_name]
+    try:
+        drift = await reconcile_rollups(db, apply=apply, settle_days=settle_days)
+        for row in drift[:50]:
+            print(f"{row['bucket']}: stored {row['stored']}, expected {row['expected']}")
+        if len(drift) > 50:
+            print(f"... and {len(drift) - 50} more")
+        print(
+            f"{len(drift)} rollup(s) before {high_water_mark(settle_days)} drifted"
+            + (" and were rewritten" if apply and drift else "")
+        )
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check (and optionally rebuild) the GET /api/stats/timeseries rollups.")
+    parser.add_argument("--apply", action="store_true", help="rewrite rollups from the contacts collection")
+    parser.add_argument("--settle-days", type=int, default=SETTLE_DAYS, help="leave the buckets of the last N days alone")
+    args = parser.parse_args()
+    asyncio.run(_main(args.apply, args.settle_days))
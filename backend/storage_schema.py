@@ -0,0 +1,601 @@
+"""Compact storage schema: the public UUID stored as `_id`, as BSON binary.
+
+Legacy contact and status check documents carry two identifiers, MongoDB's
+ObjectId `_id` and the public `id` string (36 characters), each with its own
+unique index. In the compact schema the UUID is the `_id`, a 16-byte binary
+(subtype 4), and there is no `id` field. The API keeps using the string `id`:
+`storage_database` wraps the collections in COMPACT_COLLECTIONS so that
+documents, filters, projections, sorts and pipelines written against `id` are
+translated on the way in, and rows get their string `id` back on the way out.
+UUID bytes sort like their canonical strings, so keyset cursors do not change.
+Only the operations the API uses are wrapped; anything else raises
+AttributeError instead of silently running untranslated. `bulk_write` takes
+this module's request classes, which keep their constructor arguments so they
+can be rebuilt with the translated filter and document.
+
+STORAGE_SCHEMA selects the mode:
+
+- `legacy` (default): documents as before, nothing is translated.
+- `migrating`: new documents get the binary `_id` and keep `id`; lookups by
+  id match either field, so workers read whatever the other steps wrote.
+- `compact`: the binary `_id` only.
+
+Switching an existing database without downtime:
+
+1. run every worker with STORAGE_SCHEMA=migrating (startup creates the
+   non-unique `*_id_lookup` indexes),
+2. `python cli.py storage-schema --apply` re-keys ObjectId documents in
+   batches and drops the unique `id` indexes,
+3. run every worker with STORAGE_SCHEMA=compact (startup creates the
+   `_id` keyed indexes),
+4. `python cli.py storage-schema --apply --strip` removes the `id` fields and
+   every index keyed on `id`.
+
+A document is re-keyed by deleting it, only if unchanged since it was read,
+and inserting its copy. The copy is parked in `storage_schema_rekey` first,
+so an interrupted run restores it when started again. Each run prints
+document and index sizes before and after.
+"""
+
+import inspect
+import logging
+import os
+import uuid
+from typing import Dict, List, Optional
+
+import bson
+import pymongo
+from bson import Binary
+from bson.binary import UUID_SUBTYPE
+from pymongo.errors import BulkWriteError
+
+from archive import ARCHIVE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# How contacts and status checks are stored: "legacy", "migrating" or "compact"
+STORAGE_SCHEMA = os.environ.get('STORAGE_SCHEMA', 'legacy')
+COMPACT_COLLECTIONS = ("contacts", ARCHIVE_COLLECTION, "status_checks")
+REKEY_COLLECTION = "storage_schema_rekey"
+# Collection methods that do not depend on how documents are keyed
+PASSTHROUGH_METHODS = frozenset({
+    "name", "full_name", "database", "estimated_document_count",
+    "index_information", "list_indexes", "create_index", "create_indexes", "drop_index",
+})
+
+
+class _Request:
+    """Keeps the constructor arguments of a bulk_write request, so it can be rebuilt translated."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.arguments = inspect.signature(super().__init__).bind(*args, **kwargs).arguments
+
+
+class InsertOne(_Request, pymongo.InsertOne):
+    pass
+
+
+class ReplaceOne(_Request, pymongo.ReplaceOne):
+    pass
+
+
+class UpdateOne(_Request, pymongo.UpdateOne):
+    pass
+
+
+class UpdateMany(_Request, pymongo.UpdateMany):
+    pass
+
+
+class DeleteOne(_Request, pymongo.DeleteOne):
+    pass
+
+
+class DeleteMany(_Request, pymongo.DeleteMany):
+    pass
+
+
+def uuid_key(value):
+    """The binary `_id` for a public id.
+
+    Anything but a canonical UUID string is returned unchanged, so it matches
+    no compact document, just as it matched no legacy one.
+    """
+    if isinstance(value, str):
+        try:
+            parsed = uuid.UUID(value)
+        except ValueError:
+            return value
+        if str(parsed) == value:
+            return Binary.from_uuid(parsed)
+    return value
+
+
+def public_id(value):
+    if isinstance(value, Binary) and value.subtype == UUID_SUBTYPE:
+        return str(value.as_uuid())
+    return value
+
+
+def _keys(value):
+    # Operator expressions ({"$in": [...]}, {"$lt": ...}) convert their operands
+    if isinstance(value, dict):
+        return {op: [uuid_key(v) for v in operand] if isinstance(operand, list) else uuid_key(operand)
+                for op, operand in value.items()}
+    return uuid_key(value)
+
+
+class StorageSchema:
+    """Translation between the `id`-based queries of the API and stored documents."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.compact = mode == "compact"
+
+    def document(self, document: dict) -> dict:
+        stored = {key: value for key, value in document.items() if key != "_id"}
+        key = uuid_key(stored["id"])
+        if self.compact:
+            del stored["id"]
+        return {"_id": key, **stored}
+
+    def filter(self, query):
+        if not isinstance(query, dict):
+            return query
+        translated, clauses = {}, []
+        for field, value in query.items():
+            if field in ("$and", "$or", "$nor"):
+                translated[field] = [self.filter(clause) for clause in value]
+            elif field != "id":
+                translated[field] = value
+            elif self.compact:
+                translated["_id"] = _keys(value)
+            else:
+                clauses.append({"$or": [{"id": value}, {"_id": _keys(value)}]})
+        if not clauses:
+            return translated
+        return {"$and": [translated, *clauses]} if translated else clauses[0]
+
+    def projection(self, projection: Optional[dict]) -> Optional[dict]:
+        # Only projections that return `id` change: `{"_id": 0}` alone means "every field"
+        if not projection or not (projection.get("id") or set(projection) == {"_id"}):
+            return projection
+        translated = {field: value for field, value in projection.items()
+                      if field != "_id" and not (self.compact and field == "id")}
+        return {"_id": 1, **translated} if translated else None
+
+    def sort(self, key_or_list, direction=None):
+        if not self.compact:
+            return key_or_list, direction
+        if isinstance(key_or_list, str):
+            return ("_id" if key_or_list == "id" else key_or_list), direction
+        return [("_id" if field == "id" else field, order) for field, order in key_or_list], direction
+
+    def pipeline(self, pipeline: List[dict]) -> List[dict]:
+        # Stages before the first $group see stored documents, which is where "$id" appears
+        return [{"$match": self.filter(stage["$match"])} if "$match" in stage else self._field_paths(stage)
+                for stage in pipeline]
+
+    def _field_paths(self, value):
+        if value == "$id":
+            return "$_id" if self.compact else {"$ifNull": ["$id", "$_id"]}
+        if isinstance(value, dict):
+            return {key: self._field_paths(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._field_paths(item) for item in value]
+        return value
+
+    def request(self, request):
+        """Translate one bulk_write request built with this module's request classes."""
+        if not isinstance(request, _Request):
+            raise TypeError(
+                f"bulk_write under the {self.mode} schema takes storage_schema.{type(request).__name__}, "
+                "whose arguments can be translated"
+            )
+        arguments = dict(request.arguments)
+        if arguments.get("hint") is not None:
+            # Index names and keys differ between schemas (see indexes.schema_indexes)
+            raise TypeError(f"Index hints cannot be translated to the {self.mode} schema")
+        if "filter" in arguments:
+            arguments["filter"] = self.filter(arguments["filter"])
+        if "document" in arguments:
+            arguments["document"] = self.document(arguments["document"])
+        if "replacement" in arguments and self.compact:
+            # In migrating, a replacement cannot change `_id`, and any legacy document
+            # it replaces has an ObjectId; the next migration run re-keys it
+            arguments["replacement"] = self.document(arguments["replacement"])
+        # Collation, array_filters and upsert carry over unchanged
+        return type(request)(**arguments)
+
+    @staticmethod
+    def row(row: Optional[dict]) -> Optional[dict]:
+        if row is None:
+            return None
+        key = row.pop("_id", None)
+        if "id" in row or key is None:
+            return row
+        return {"id": public_id(key), **row}
+
+    @staticmethod
+    def values(row: dict) -> dict:
+        # Aggregation results keep their own _id (the group key); UUIDs become strings
+        return {field: public_id(value) for field, value in row.items()}
+
+
+class _Cursor:
+    def __init__(self, cursor, schema: StorageSchema, decode):
+        self.cursor = cursor
+        self.schema = schema
+        self.decode = decode
+
+    def sort(self, key_or_list, direction=None):
+        self.cursor = self.cursor.sort(*self.schema.sort(key_or_list, direction))
+        return self
+
+    def skip(self, skip: int):
+        self.cursor = self.cursor.skip(skip)
+        return self
+
+    def limit(self, limit: int):
+        self.cursor = self.cursor.limit(limit)
+        return self
+
+    def batch_size(self, batch_size: int):
+        self.cursor = self.cursor.batch_size(batch_size)
+        return self
+
+    async def to_list(self, length: Optional[int]) -> List[dict]:
+        return [self.decode(row) for row in await self.cursor.to_list(length)]
+
+    def __aiter__(self):
+        return self._rows()
+
+    async def _rows(self):
+        async for row in self.cursor:
+            yield self.decode(row)
+
+
+class _ChangeStream:
+    def __init__(self, stream, schema: StorageSchema):
+        self.stream = stream
+        self.schema = schema
+
+    @property
+    def resume_token(self):
+        return self.stream.resume_token
+
+    async def __aenter__(self):
+        await self.stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self.stream.__aexit__(*exc_info)
+
+    def __aiter__(self):
+        return self._changes()
+
+    async def _changes(self):
+        async for change in self.stream:
+            if change.get("fullDocument") is not None:
+                change["fullDocument"] = self.schema.row(change["fullDocument"])
+            yield change
+
+
+class CompactCollection:
+    """A collection stored in the migrating or compact schema, used through `id`.
+
+    Covers the operations the API runs on contacts and status checks, plus the
+    PASSTHROUGH_METHODS (index management, metadata) that need no translation.
+    """
+
+    def __init__(self, collection, schema: StorageSchema):
+        self.collection = collection
+        self.schema = schema
+
+    def __getattr__(self, name):
+        if name in PASSTHROUGH_METHODS:
+            return getattr(self.collection, name)
+        # replace_one, distinct, find_one_and_* and the like would run untranslated
+        raise AttributeError(
+            f"{type(self).__name__} does not translate {name!r} to the {self.schema.mode} schema; "
+            "add it to CompactCollection or use the raw collection"
+        )
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> _Cursor:
+        cursor = self.collection.find(self.schema.filter(filter or {}), self.schema.projection(projection), **kwargs)
+        return _Cursor(cursor, self.schema, self.schema.row)
+
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        return self.schema.row(await self.collection.find_one(
+            self.schema.filter(filter or {}), self.schema.projection(projection), **kwargs
+        ))
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        return await self.collection.count_documents(self.schema.filter(filter), **kwargs)
+
+    async def insert_one(self, document: dict, **kwargs):
+        return await self.collection.insert_one(self.schema.document(document), **kwargs)
+
+    async def insert_many(self, documents: List[dict], **kwargs):
+        return await self.collection.insert_many([self.schema.document(doc) for doc in documents], **kwargs)
+
+    async def update_one(self, filter: dict, update, **kwargs):
+        return await self.collection.update_one(self.schema.filter(filter), update, **kwargs)
+
+    async def update_many(self, filter: dict, update, **kwargs):
+        return await self.collection.update_many(self.schema.filter(filter), update, **kwargs)
+
+    async def delete_many(self, filter: dict, **kwargs):
+        return await self.collection.delete_many(self.schema.filter(filter), **kwargs)
+
+    async def bulk_write(self, requests: list, **kwargs):
+        return await self.collection.bulk_write([self.schema.request(request) for request in requests], **kwargs)
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> _Cursor:
+        return _Cursor(self.collection.aggregate(self.schema.pipeline(pipeline), **kwargs), self.schema, self.schema.values)
+
+    def watch(self, pipeline: Optional[List[dict]] = None, **kwargs) -> _ChangeStream:
+        return _ChangeStream(self.collection.watch(pipeline, **kwargs), self.schema)
+
+
+class SchemaDatabase:
+    """A database whose COMPACT_COLLECTIONS are wrapped in `CompactCollection`."""
+
+    def __init__(self, db, schema: StorageSchema):
+        self.db = db
+        self.schema = schema
+
+    def __getattr__(self, name):
+        return self[name] if name in COMPACT_COLLECTIONS else getattr(self.db, name)
+
+    def __getitem__(self, name):
+        collection = self.db[name]
+        return CompactCollection(collection, self.schema) if name in COMPACT_COLLECTIONS else collection
+
+
+def storage_database(db, mode: str = STORAGE_SCHEMA):
+    """`db` as the API should use it under the storage schema `mode`."""
+    if mode in ("migrating", "compact"):
+        return SchemaDatabase(db, StorageSchema(mode))
+    return db
+
+
+# --- Migration (runs against the raw database) ---
+
+async def _restore_parked(db, name: str) -> int:
+    """Insert the copies an interrupted run deleted but never stored; returns how many."""
+    parked = await db[REKEY_COLLECTION].find({"collection": name}).to_list(None)
+    if not parked:
+        return 0
+    copies = [entry["document"] for entry in parked]
+    present = set()
+    async for doc in db[name].find(
+        {"$or": [{"_id": {"$in": [copy["_id"] for copy in copies]}}, {"id": {"$in": [copy["id"] for copy in copies]}}]},
+        {"_id": 1, "id": 1},
+    ):
+        present.update([doc["_id"], doc.get("id")])
+    missing = [copy for copy in copies if copy["_id"] not in present and copy["id"] not in present]
+    if missing:
+        await db[name].insert_many(missing, ordered=False)
+    await db[REKEY_COLLECTION].delete_many({"_id": {"$in": [entry["_id"] for entry in parked]}})
+    return len(missing)
+
+
+async def rekey_collection(db, name: str, batch_size: int = 1000) -> Dict[str, int]:
+    """Give every ObjectId-keyed document of `name` its binary `_id`, keeping `id`.
+
+    Returns counts: `rekeyed`, `changed` (modified while being copied, left
+    for the next run), `skipped` (no UUID `id`) and `restored`.
+    """
+    counts = {"rekeyed": 0, "changed": 0, "skipped": 0, "restored": await _restore_parked(db, name)}
+    after = None
+    while True:
+        query = {"_id": {"$type": "objectId"}} if after is None else {"_id": {"$type": "objectId", "$gt": after}}
+        batch = await db[name].find(query).sort("_id", 1).to_list(batch_size)
+        if not batch:
+            break
+        after = batch[-1]["_id"]
+
+        originals, copies = [], {}
+        for doc in batch:
+            key = uuid_key(doc.get("id"))
+            if isinstance(key, Binary):
+                originals.append(doc)
+                copies[doc["_id"]] = {"_id": key, **{field: value for field, value in doc.items() if field != "_id"}}
+            else:
+                counts["skipped"] += 1
+        if not originals:
+            continue
+
+        parked_ids = [f"{name}:{copy['id']}" for copy in copies.values()]
+        await db[REKEY_COLLECTION].bulk_write([
+            pymongo.ReplaceOne({"_id": parked_id}, {"collection": name, "document": copy}, upsert=True)
+            for parked_id, copy in zip(parked_ids, copies.values())
+        ], ordered=False)
+        # Matching every field, so a document changed since the read is not deleted
+        await db[name].bulk_write([pymongo.DeleteOne(doc) for doc in originals], ordered=False)
+        kept = {doc["_id"] async for doc in db[name].find({"_id": {"$in": list(copies)}}, {"_id": 1})}
+        replacements = [copy for original_id, copy in copies.items() if original_id not in kept]
+        if replacements:
+            try:
+                await db[name].insert_many(replacements, ordered=False)
+            except BulkWriteError as e:
+                # A copy already stored by an earlier, interrupted run is fine
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+        await db[REKEY_COLLECTION].delete_many({"_id": {"$in": parked_ids}})
+
+        counts["rekeyed"] += len(replacements)
+        counts["changed"] += len(kept)
+        logger.info(f"Re-keyed {counts['rekeyed']} {name} documents so far")
+    return counts
+
+
+async def strip_ids(db, name: str, batch_size: int = 1000) -> int:
+    """Remove the `id` field from UUID-keyed documents; returns how many changed."""
+    stripped = 0
+    after = None
+    while True:
+        query = {"_id": {"$type": "binData"}} if after is None else {"_id": {"$type": "binData", "$gt": after}}
+        batch = await db[name].find(query, {"_id": 1, "id": 1}).sort("_id", 1).to_list(batch_size)
+        if not batch:
+            break
+        after = batch[-1]["_id"]
+        keys = [doc["_id"] for doc in batch if "id" in doc]
+        if keys:
+            result = await db[name].update_many({"_id": {"$in": keys}}, {"$unset": {"id": ""}})
+            stripped += result.modified_count
+    return stripped
+
+
+async def drop_id_indexes(db, name: str, unique_only: bool) -> List[str]:
+    """Drop the indexes keyed on `id` (only the unique single-field one with `unique_only`)."""
+    dropped = []
+    for index_name, info in (await db[name].index_information()).items():
+        fields = [field for field, _ in info["key"]]
+        if "id" not in fields or (unique_only and not (info.get("unique") and fields == ["id"])):
+            continue
+        await db[name].drop_index(index_name)
+        dropped.append(index_name)
+    return dropped
+
+
+async def has_lookup_index(db, name: str) -> bool:
+    """Whether a non-unique index still serves lookups by `id` (created by the migrating schema)."""
+    return any(
+        info["key"][0][0] == "id" and not info.get("unique")
+        for info in (await db[name].index_information()).values()
+    )
+
+
+# --- Report ---
+
+async def collection_report(db, name: str) -> dict:
+    """Document shapes and storage sizes of one collection."""
+    report = {
+        "collection": name,
+        "documents": await db[name].count_documents({}),
+        "objectid_keyed": await db[name].count_documents({"_id": {"$type": "objectId"}}),
+        "uuid_keyed": await db[name].count_documents({"_id": {"$type": "binData"}}),
+        "with_id_field": await db[name].count_documents({"id": {"$exists": True}}),
+        "size": None, "avg_size": None, "storage_size": None, "index_size": None, "indexes": {},
+    }
+    try:
+        shards = await db[name].aggregate([{"$collStats": {"storageStats": {}}}]).to_list(None)
+    except Exception as e:
+        logger.warning(f"No storage stats for {name}: {str(e)}")
+        return report
+    stats = [shard["storageStats"] for shard in shards]
+    report["size"] = sum(s.get("size", 0) for s in stats)
+    report["storage_size"] = sum(s.get("storageSize", 0) for s in stats)
+    report["index_size"] = sum(s.get("totalIndexSize", 0) for s in stats)
+    report["avg_size"] = report["size"] / report["documents"] if report["documents"] else 0
+    for s in stats:
+        for index_name, size in s.get("indexSizes", {}).items():
+            report["indexes"][index_name] = report["indexes"].get(index_name, 0) + size
+    return report
+
+
+async def estimate_saving(db, name: str, sample_size: int = 1000) -> Optional[float]:
+    """Average bytes per document saved by the compact schema, from a sample of documents."""
+    sample = await db[name].aggregate([{"$sample": {"size": sample_size}}]).to_list(sample_size)
+    if not sample:
+        return None
+    saved = 0
+    for doc in sample:
+        public = doc.get("id") or public_id(doc["_id"])
+        fields = {field: value for field, value in doc.items() if field not in ("_id", "id")}
+        legacy = {"_id": bson.ObjectId(), "id": public, **fields}
+        compact = {"_id": uuid_key(public), **fields}
+        saved += len(bson.encode(legacy)) - len(bson.encode(compact))
+    return saved / len(sample)
+
+
+def _bytes(value: Optional[float]) -> str:
+    if value is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(value) < 1024 or unit == "GB":
+            return f"{value:,.0f} {unit}" if unit == "B" else f"{value:,.1f} {unit}"
+        value /= 1024
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"{report['collection']}: {report['documents']} documents "
+        f"({report['objectid_keyed']} ObjectId-keyed, {report['uuid_keyed']} UUID-keyed, "
+        f"{report['with_id_field']} with an id field)",
+        f"  data {_bytes(report['size'])} (avg {_bytes(report['avg_size'])}), "
+        f"storage {_bytes(report['storage_size'])}, indexes {_bytes(report['index_size'])}",
+    ]
+    for index_name, size in sorted(report["indexes"].items()):
+        lines.append(f"    {index_name}: {_bytes(size)}")
+    return "\n".join(lines)
+
+
+def format_savings(before: dict, after: dict) -> str:
+    def change(old, new):
+        if old is None or new is None:
+            return "n/a"
+        return f"{_bytes(old)} -> {_bytes(new)} ({_bytes(new - old)})"
+
+    lines = [
+        f"{after['collection']}: data {change(before['size'], after['size'])}, "
+        f"avg document {change(before['avg_size'], after['avg_size'])}, "
+        f"indexes {change(before['index_size'], after['index_size'])}"
+    ]
+    for index_name in sorted(set(before["indexes"]) | set(after["indexes"])):
+        old, new = before["indexes"].get(index_name), after["indexes"].get(index_name)
+        if old is None:
+            lines.append(f"    + {index_name}: {_bytes(new)}")
+        elif new is None:
+            lines.append(f"    - {index_name}: {_bytes(old)}")
+    return "\n".join(lines)
+
+
+async def _main(apply: bool, strip: bool, batch_size: int):
+    from database import create_mongo_client
+    from server import db_name, mongo_url
+
+    client = create_mongo_client(mongo_url)
+    db = client[db_name]
+    try:
+        before = {name: await collection_report(db, name) for name in COMPACT_COLLECTIONS}
+        for report in before.values():
+            print(format_report(report))
+        if not apply:
+            for name in COMPACT_COLLECTIONS:
+                saving = await estimate_saving(db, name)
+                if saving is not None:
+                    total = saving * before[name]["documents"]
+                    print(f"{name}: compact documents are {_bytes(saving)} smaller each, {_bytes(total)} in all")
+            return
+
+        for name in COMPACT_COLLECTIONS:
+            counts = await rekey_collection(db, name, batch_size)
+            print(f"{name}: {counts['rekeyed']} re-keyed, {counts['changed']} changed meanwhile (run again), "
+                  f"{counts['skipped']} without a UUID id, {counts['restored']} restored from an interrupted run")
+            if await has_lookup_index(db, name):
+                dropped = await drop_id_indexes(db, name, unique_only=True)
+                if dropped:
+                    print(f"{name}: dropped {', '.join(dropped)}")
+            else:
+                print(f"{name}: unique id index kept; start the API with STORAGE_SCHEMA=migrating first")
+
+            if strip:
+                remaining = await db[name].count_documents({"_id": {"$type": "objectId"}})
+                if remaining:
+                    print(f"{name}: not stripped, {remaining} ObjectId-keyed documents remain")
+                    continue
+                # Every worker must run STORAGE_SCHEMA=compact by now: nothing reads `id` any more
+                dropped = await drop_id_indexes(db, name, unique_only=False)
+                stripped = await strip_ids(db, name, batch_size)
+                print(f"{name}: removed id from {stripped} documents, dropped {', '.join(dropped) or 'no indexes'}")
+
+        for name in COMPACT_COLLECTIONS:
+            after = await collection_report(db, name)
+            print(format_report(after))
+            print(format_savings(before[name], after))
+    finally:
+        client.close()
@@ -0,0 +1,171 @@
+"""Write-behind batching for contact inserts.
+
+Validated contact documents are put on a bounded asyncio queue; a single
+background task flushes them with `insert_many(ordered=False)` whenever
+`batch_size` documents are waiting or `flush_interval` seconds have passed
+since the first one arrived. Callers either return as soon as the document
+is queued (`wait=False`) or wait for the batch holding it to be written.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueueFull(Exception):
+    """Raised when the queue is at capacity (or draining) and the caller should back off."""
+
+
+def _write_error(error: dict) -> Exception:
+    message = error.get("errmsg", "write error")
+    if error.get("code") == 11000:
+        return DuplicateKeyError(message, 11000, error)
+    return RuntimeError(message)
+
+
+class BatchWriter:
+    def __init__(
+        self,
+        collection,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        retries: int = 3,
+        on_flushed: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.on_flushed = on_flushed
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.rejected = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def submit(self, document: dict, wait: bool = False):
+        """Queue a document; with `wait`, return only once it is stored."""
+        if self._closing:
+            self.rejected += 1
+            raise WriteQueueFull("writer is shutting down")
+        future = asyncio.get_running_loop().create_future() if wait else None
+        try:
+            self._queue.put_nowait((document, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise WriteQueueFull("write queue is full")
+        if future is not None:
+            await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stop:
+                break
+
+    async def _flush(self, batch: list):
+        documents = [document for document, _ in batch]
+        failed_positions = {}
+        # After a failed attempt some documents may be stored without us knowing
+        uncertain = False
+        for attempt in range(1, self.retries + 1):
+            try:
+                await self.collection.insert_many(documents, ordered=False)
+                break
+            except BulkWriteError as e:
+                # Per-document failures (e.g. duplicate keys) are final, the rest were stored
+                for error in e.details.get("writeErrors", []):
+                    failed_positions[error["index"]] = error
+                if uncertain:
+                    duplicates = [p for p, error in failed_positions.items() if error.get("code") == 11000]
+                    for position in await self._stored(documents, duplicates):
+                        del failed_positions[position]
+                break
+            except Exception as e:
+                uncertain = True
+                if attempt == self.retries:
+                    logger.error(f"Dropping batch of {len(batch)} contacts after {attempt} attempts: {str(e)}")
+                    failed_positions = {i: {"errmsg": str(e)} for i in range(len(batch))}
+                    try:
+                        for position in await self._stored(documents, list(failed_positions)):
+                            del failed_positions[position]
+                    except Exception as check_error:
+                        logger.error(f"Could not check which contacts were stored: {str(check_error)}")
+                else:
+                    await asyncio.sleep(0.1 * 2 ** (attempt - 1))
+
+        stored = []
+        for position, (document, future) in enumerate(batch):
+            if position in failed_positions:
+                if future is not None and not future.done():
+                    future.set_exception(_write_error(failed_positions[position]))
+            else:
+                stored.append(document)
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+        self.batches += 1
+        self.written += len(stored)
+        self.failed += len(failed_positions)
+        if stored and self.on_flushed is not None:
+            try:
+                await self.on_flushed(stored)
+            except Exception as e:
+                logger.error(f"Error in post-flush hook: {str(e)}")
+
+    async def _stored(self, documents: List[dict], positions: List[int]) -> List[int]:
+        """The positions whose document is in the collection, i.e. an earlier attempt stored it."""
+        if not positions:
+            return []
+        by_id = {documents[position]["id"]: position for position in positions}
+        rows = self.collection.find({"id": {"$in": list(by_id)}}, {"_id": 0, "id": 1})
+        return [by_id[row["id"]] async for row in rows]
+
+    async def stop(self):
+        """Stop accepting documents and flush everything already queued."""
+        if self._task is None or self._closing:
+            return
+        self._closing = True
+        # The sentinel goes after every queued document, waiting for room if needed
+        await self._queue.put(None)
+        await self._task
+        logger.info(f"Write-behind queue drained ({self.written} written, {self.failed} failed)")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "rejected": self.rejected,
+        }
@@ -108,6 +108,34 @@ class ContactFormTester:
         
         return False
 
+    def test_idempotent_contact_submission(self):
+        """Test POST /api/contacts returns the original contact for a repeated Idempotency-Key"""
+        contact_data = {
+            "name": "Carlos Pereira",
+            "email": "carlos.pereira@email.com",
+            "message": "Mensagem enviada duas vezes para validar que o contato não é duplicado no sistema."
+        }
+        headers = {**HEADERS, "Idempotency-Key": str(uuid.uuid4())}
+        
+        try:
+            first = requests.post(f"{BASE_URL}/contacts", json=contact_data, headers=headers, timeout=10)
+            second = requests.post(f"{BASE_URL}/contacts", json=contact_data, headers=headers, timeout=10)
+            
+            if first.status_code == 200 and second.status_code == 200:
+                first_id = first.json().get("contact_id")
+                second_id = second.json().get("contact_id")
+                if first_id and first_id == second_id:
+                    self.log_test("Create Contact - Idempotent Retry", True, f"Repeat answered with original ID: {first_id}")
+                    return True
+                else:
+                    self.log_test("Create Contact - Idempotent Retry", False, f"IDs differ: {first_id} vs {second_id}")
+            else:
+                self.log_test("Create Contact - Idempotent Retry", False, f"Status: {first.status_code}/{second.status_code}, Response: {second.text}")
+        except Exception as e:
+            self.log_test("Create Contact - Idempotent Retry", False, f"Request error: {str(e)}")
+        
+        return False
+
     def test_invalid_email_format(self):
         """Test POST /api/contacts with invalid email format"""
         contact_data = {
@@ -304,6 +332,38 @@ class ContactFormTester:
         self.log_test("Name Length Validation", all_passed, f"Tested {len(test_cases)} cases")
         return all_passed
 
+    def test_bulk_import_ndjson(self):
+        """Test POST /api/contacts/bulk with valid and invalid NDJSON lines"""
+        lines = [
+            {"name": "Lote Um", "email": "lote1@email.com", "message": "Primeiro contato importado em lote via NDJSON."},
+            {"name": "X", "email": "email-invalido", "message": "Curta"},
+            {"name": "Lote Dois", "email": "lote2@email.com", "message": "Segundo contato importado em lote via NDJSON."},
+        ]
+        body = "\n".join(json.dumps(line) for line in lines)
+
+        try:
+            response = requests.post(
+                f"{BASE_URL}/contacts/bulk?chunk_size=2",
+                data=body.encode("utf-8"),
+                headers={"Content-Type": "application/x-ndjson"},
+                timeout=10
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+                statuses = [result["success"] for result in data.get("results", [])]
+                if data.get("inserted") == 2 and statuses == [True, False, True]:
+                    self.log_test("Bulk NDJSON Import", True, f"Inserted {data['inserted']}, rejected {data['failed']}")
+                    return True
+                else:
+                    self.log_test("Bulk NDJSON Import", False, f"Unexpected results: {data}")
+            else:
+                self.log_test("Bulk NDJSON Import", False, f"Status: {response.status_code}, Response: {response.text}")
+        except Exception as e:
+            self.log_test("Bulk NDJSON Import", False, f"Request error: {str(e)}")
+
+        return False
+
     def test_get_contacts_list(self):
         """Test GET /api/contacts endpoint"""
         try:
@@ -342,6 +402,139 @@ class ContactFormTester:
         
         return False
 
+    def test_get_contacts_cursor_pagination(self):
+        """Test GET /api/contacts keyset pagination via next_cursor"""
+        try:
+            response = requests.get(f"{BASE_URL}/contacts?limit=2", timeout=10)
+            if response.status_code != 200:
+                self.log_test("Get Contacts Cursor Pagination", False, f"Status: {response.status_code}, Response: {response.text}")
+                return False
+
+            first_page = response.json()
+            next_cursor = first_page.get("next_cursor")
+            if not next_cursor:
+                self.log_test("Get Contacts Cursor Pagination", True, "Single page only, no cursor returned")
+                return True
+
+            response = requests.get(f"{BASE_URL}/contacts", params={"limit": 2, "cursor": next_cursor}, timeout=10)
+            if response.status_code == 200:
+                second_page = response.json()
+                first_ids = {c["id"] for c in first_page["contacts"]}
+                second_ids = {c["id"] for c in second_page["contacts"]}
+                if second_ids and not (first_ids & second_ids):
+                    self.log_test("Get Contacts Cursor Pagination", True, f"Second page returned {len(second_ids)} new contacts")
+                    return True
+                else:
+                    self.log_test("Get Contacts Cursor Pagination", False, f"Pages overlap or are empty: {second_page}")
+            else:
+                self.log_test("Get Contacts Cursor Pagination", False, f"Status: {response.status_code}, Response: {response.text}")
+        except Exception as e:
+            self.log_test("Get Contacts Cursor Pagination", False, f"Request error: {str(e)}")
+
+        return False
+
+    def test_get_contacts_include_archived(self):
+        """Test GET /api/contacts?include_archived=true also counts archived contacts"""
+        try:
+            hot = requests.get(f"{BASE_URL}/contacts", params={"limit": 1}, timeout=10)
+            everything = requests.get(f"{BASE_URL}/contacts", params={"limit": 1, "include_archived": "true"}, timeout=10)
+            if hot.status_code == 200 and everything.status_code == 200:
+                hot_total, all_total = hot.json().get("total"), everything.json().get("total")
+                if all_total is not None and hot_total is not None and all_total >= hot_total:
+                    self.log_test("Get Contacts Include Archived", True, f"{hot_total} active, {all_total} with archived")
+                    return True
+                else:
+                    self.log_test("Get Contacts Include Archived", False, f"Totals: {hot_total} active, {all_total} with archived")
+            else:
+                self.log_test("Get Contacts Include Archived", False, f"Status: {hot.status_code} / {everything.status_code}")
+        except Exception as e:
+            self.log_test("Get Contacts Include Archived", False, f"Request error: {str(e)}")
+
+        return False
+
+    def test_search_contacts(self):
+        """Test GET /api/contacts/search finds a contact created earlier, accent-insensitively"""
+        try:
+            response = requests.get(f"{BASE_URL}/contacts/search", params={"q": "joao silva", "limit": 5}, timeout=10)
+            if response.status_code == 200:
+                data = response.json()
+                names = [c.get("name") for c in data.get("contacts", [])]
+                if data.get("success") and "João Silva" in names and all("score" in c for c in data["contacts"]):
+                    self.log_test("Search Contacts", True, f"Found {len(names)} ranked results, next_skip: {data.get('next_skip')}")
+                    return True
+                else:
+                    self.log_test("Search Contacts", False, f"Expected 'João Silva' in results: {data}")
+            else:
+                self.log_test("Search Contacts", False, f"Status: {response.status_code}, Response: {response.text}")
+        except Exception as e:
+            self.log_test("Search Contacts", False, f"Request error: {str(e)}")
+
+        return False
+
+    def test_update_contact_status(self):
+        """Test PATCH /api/contacts/{id} and POST /api/contacts/status:batch"""
+        contact_data = {
+            "name": "Beatriz Lima",
+            "email": "beatriz.lima@email.com",
+            "message": f"Contato para validar a mudança de status pela API ({uuid.uuid4()})."
+        }
+        try:
+            response = requests.post(f"{BASE_URL}/contacts", json=contact_data, headers=HEADERS, timeout=10)
+            contact_id = response.json().get("contact_id")
+            if response.status_code != 200 or not contact_id:
+                self.log_test("Update Contact Status", False, f"Could not create contact: {response.text}")
+                return False
+
+            response = requests.patch(f"{BASE_URL}/contacts/{contact_id}", json={"status": "contacted"}, headers=HEADERS, timeout=10)
+            if response.status_code != 200 or response.json().get("status") != "contacted":
+                self.log_test("Update Contact Status", False, f"PATCH status: {response.status_code}, Response: {response.text}")
+                return False
+
+            updates = [
+                {"id": contact_id, "status": "converted"},
+                {"id": str(uuid.uuid4()), "status": "closed"},
+            ]
+            response = requests.post(f"{BASE_URL}/contacts/status:batch", json={"updates": updates}, headers=HEADERS, timeout=10)
+            if response.status_code == 200:
+                results = response.json().get("results", [])
+                if len(results) == 2 and results[0].get("success") and not results[1].get("success"):
+                    self.log_test("Update Contact Status", True, f"PATCH and batch applied; unknown id reported: {results[1].get('error')}")
+                    return True
+                else:
+                    self.log_test("Update Contact Status", False, f"Unexpected batch results: {results}")
+            else:
+                self.log_test("Update Contact Status", False, f"Batch status: {response.status_code}, Response: {response.text}")
+        except Exception as e:
+            self.log_test("Update Contact Status", False, f"Request error: {str(e)}")
+
+        return False
+
+    def test_contacts_stream(self):
+        """Test GET /api/contacts/stream delivers a new contact as a server-sent event"""
+        contact_data = {
+            "name": "Camila Rocha",
+            "email": "camila.rocha@email.com",
+            "message": f"Contato para validar o feed em tempo real ({uuid.uuid4()})."
+        }
+        try:
+            with requests.get(f"{BASE_URL}/contacts/stream", stream=True, timeout=10) as stream:
+                if stream.status_code != 200 or not stream.headers.get("content-type", "").startswith("text/event-stream"):
+                    self.log_test("Contacts Stream", False, f"Status: {stream.status_code}, Content-Type: {stream.headers.get('content-type')}")
+                    return False
+
+                response = requests.post(f"{BASE_URL}/contacts", json=contact_data, headers=HEADERS, timeout=10)
+                contact_id = response.json().get("contact_id")
+                for line in stream.iter_lines(decode_unicode=True):
+                    if line.startswith("data:") and contact_id and contact_id in line:
+                        self.log_test("Contacts Stream", True, f"Received event for contact {contact_id}")
+                        return True
+        except Exception as e:
+            self.log_test("Contacts Stream", False, f"Request error: {str(e)}")
+            return False
+
+        self.log_test("Contacts Stream", False, "Stream ended without the new contact")
+        return False
+
     def test_get_stats(self):
         """Test GET /api/stats endpoint"""
         try:
@@ -363,6 +556,47 @@ class ContactFormTester:
         
         return False
 
+    def test_get_stats_timeseries(self):
+        """Test GET /api/stats/timeseries endpoint"""
+        try:
+            response = requests.get(f"{BASE_URL}/stats/timeseries", params={"granularity": "week"}, timeout=10)
+
+            if response.status_code == 200:
+                data = response.json()
+                points = data.get("points", [])
+                if points and all({"start", "count", "services"} <= set(point) for point in points):
+                    self.log_test("Get Stats Timeseries", True, f"{len(points)} weekly points, {data.get('total')} contacts")
+                    return True
+                else:
+                    self.log_test("Get Stats Timeseries", False, f"Unexpected points: {data}")
+            else:
+                self.log_test("Get Stats Timeseries", False, f"Status: {response.status_code}, Response: {response.text}")
+        except Exception as e:
+            self.log_test("Get Stats Timeseries", False, f"Request error: {str(e)}")
+
+        return False
+
+    def test_conditional_get(self):
+        """Test ETag / If-None-Match on GET /api/stats"""
+        try:
+            response = requests.get(f"{BASE_URL}/stats", timeout=10)
+            etag = response.headers.get("ETag")
+            if response.status_code != 200 or not etag:
+                self.log_test("Conditional GET", False, f"Status: {response.status_code}, ETag: {etag}")
+                return False
+
+            response = requests.get(f"{BASE_URL}/stats", headers={"If-None-Match": etag}, timeout=10)
+            if response.status_code == 304:
+                self.log_test("Conditional GET", True, f"304 for unchanged stats (ETag {etag})")
+                return True
+            else:
+                # A contact written in between legitimately changes the version
+                self.log_test("Conditional GET", False, f"Expected 304, got {response.status_code} (ETag now {response.headers.get('ETag')})")
+        except Exception as e:
+            self.log_test("Conditional GET", False, f"Request error: {str(e)}")
+
+        return False
+
     def run_all_tests(self):
         """Run all backend tests"""
         print("=" * 80)
@@ -381,6 +615,7 @@ class ContactFormTester:
         # Test contact creation
         self.test_create_contact_valid_all_fields()
         self.test_create_contact_required_fields_only()
+        self.test_idempotent_contact_submission()
         
         # Test validation
         self.test_invalid_email_format()
@@ -389,13 +624,21 @@ class ContactFormTester:
         self.test_phone_validation()
         self.test_message_length_validation()
         self.test_name_length_validation()
+        self.test_bulk_import_ndjson()
         
         # Test admin endpoints
         print("Running Admin Endpoint Tests...")
         print("-" * 40)
         self.test_get_contacts_list()
         self.test_get_contacts_pagination()
+        self.test_get_contacts_cursor_pagination()
+        self.test_get_contacts_include_archived()
+        self.test_search_contacts()
+        self.test_update_contact_status()
+        self.test_contacts_stream()
         self.test_get_stats()
+        self.test_get_stats_timeseries()
+        self.test_conditional_get()
         
         # Print summary
         print("=" * 80)
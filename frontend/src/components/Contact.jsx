@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
 import { Button } from './ui/button';
@@ -36,12 +36,19 @@ export const Contact = () => {
   const [loading, setLoading] = useState(false);
   const [submitStatus, setSubmitStatus] = useState(null); // 'success', 'error', null
   const [errorMessage, setErrorMessage] = useState('');
+  // One key per submission, reused by retries and double-clicks so the backend stores it once
+  const idempotencyKey = useRef(null);
+
+  const newIdempotencyKey = () =>
+    window.crypto?.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`;
 
   const handleInputChange = (e) => {
     setFormData({
       ...formData,
       [e.target.name]: e.target.value
     });
+    // Edited content is a new submission
+    idempotencyKey.current = null;
     // Clear status when user starts typing again
     if (submitStatus) {
       setSubmitStatus(null);
@@ -54,6 +61,7 @@ export const Contact = () => {
       ...formData,
       service: value
     });
+    idempotencyKey.current = null;
   };
 
   const handleSubmit = async (e) => {
@@ -61,6 +69,9 @@ export const Contact = () => {
     setLoading(true);
     setSubmitStatus(null);
     setErrorMessage('');
+    if (!idempotencyKey.current) {
+      idempotencyKey.current = newIdempotencyKey();
+    }
 
     try {
       const response = await axios.post(`${API}/contacts`, {
@@ -69,10 +80,13 @@ export const Contact = () => {
         phone: formData.phone || null,
         service: formData.service || null,
         message: formData.message
+      }, {
+        headers: { 'Idempotency-Key': idempotencyKey.current }
       });
 
       if (response.data.success) {
         setSubmitStatus('success');
+        idempotencyKey.current = null;
         // Reset form
         setFormData({
           name: '',
@@ -0,0 +1,11 @@
+"""Local tests: backend modules are imported flat, as the server imports them."""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server.py needs these at import time; the tests never connect to them
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
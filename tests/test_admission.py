@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+
+from admission import AdmissionMiddleware, AdmissionRule, TokenBuckets, client_key
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t")
+
+
+def rule(**overrides):
+    options = dict(max_concurrency=10, max_queue=10, queue_timeout=1.0)
+    options.update(overrides)
+    return AdmissionRule("POST", "/api/contacts", **options)
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    buckets = TokenBuckets(rate=1.0, burst=2)
+    assert buckets.take("a", now=0) == 0 and buckets.take("a", now=0) == 0
+    assert buckets.take("a", now=0) == 1.0
+    assert buckets.take("b", now=0) == 0
+    assert buckets.take("a", now=1.0) == 0
+
+
+def test_client_key_uses_peer_unless_hops_are_trusted():
+    scope = {"client": ("10.0.0.1", 5000), "headers": [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.7, 10.0.0.2")]}
+    assert client_key(scope) == "10.0.0.1"
+    assert client_key(scope, trusted_hops=1) == "10.0.0.2"
+    assert client_key(scope, trusted_hops=2) == "203.0.113.7"
+    # Not enough entries: the request bypassed a proxy, so the header is not trusted
+    assert client_key(scope, trusted_hops=4) == "10.0.0.1"
+
+
+def test_rate_limit_is_per_forwarded_client_behind_a_proxy():
+    app = AdmissionMiddleware(ok_app, rules=[rule(rate=1 / 60, burst=2)], trusted_hops=1)
+
+    async def main():
+        async with client(app) as c:
+            statuses = [(await c.post("/api/contacts", headers={"X-Forwarded-For": "203.0.113.7"})).status_code
+                        for _ in range(3)]
+            other = await c.post("/api/contacts", headers={"X-Forwarded-For": "198.51.100.1"})
+            unlimited = await c.post("/api/other")
+            return statuses, other, unlimited
+
+    statuses, other, unlimited = asyncio.run(main())
+    assert statuses == [200, 200, 429]
+    assert other.status_code == 200
+    assert unlimited.status_code == 200
+
+
+def test_rate_limit_is_off_without_a_rate():
+    app = AdmissionMiddleware(ok_app, rules=[rule()])
+
+    async def main():
+        async with client(app) as c:
+            return [(await c.post("/api/contacts")).status_code for _ in range(50)]
+
+    assert set(asyncio.run(main())) == {200}
+
+
+def test_full_queue_answers_503_with_retry_after():
+    async def main():
+        gate = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await gate.wait()
+            await ok_app(scope, receive, send)
+
+        app = AdmissionMiddleware(slow_app, rules=[rule(max_concurrency=1, max_queue=1, queue_timeout=5)])
+        async with client(app) as c:
+            first = asyncio.ensure_future(c.post("/api/contacts"))
+            queued = asyncio.ensure_future(c.post("/api/contacts"))
+            await asyncio.sleep(0.05)
+            shed = await c.post("/api/contacts")
+            gate.set()
+            return shed, await first, await queued, app
+
+    shed, first, queued, app = asyncio.run(main())
+    assert shed.status_code == 503 and shed.headers["retry-after"] == "5"
+    assert first.status_code == 200 and queued.status_code == 200
+    limiter = next(iter(app.limiters.values()))
+    assert limiter.active == 0 and limiter.queued == 0
+
+
+def test_queue_timeout_sheds_the_waiting_request():
+    async def main():
+        gate = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await gate.wait()
+            await ok_app(scope, receive, send)
+
+        app = AdmissionMiddleware(slow_app, rules=[rule(max_concurrency=1, max_queue=5, queue_timeout=0.05)])
+        async with client(app) as c:
+            first = asyncio.ensure_future(c.post("/api/contacts"))
+            await asyncio.sleep(0.01)
+            timed_out = await c.post("/api/contacts")
+            gate.set()
+            return timed_out, await first
+
+    timed_out, first = asyncio.run(main())
+    assert timed_out.status_code == 503
+    assert first.status_code == 200
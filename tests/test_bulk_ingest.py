@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+from pymongo.errors import AutoReconnect
+
+from bulk_ingest import ingest_lines
+
+
+class FlakyCollection:
+    """Fails the second insert_many, as a dropped connection would."""
+
+    def __init__(self):
+        self.calls = 0
+        self.documents = []
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.calls == 2:
+            raise AutoReconnect("connection closed")
+        self.documents.extend(documents)
+
+
+def test_a_failed_chunk_is_reported_and_the_rest_still_stored():
+    collection = FlakyCollection()
+
+    async def lines():
+        for number in range(1, 6):
+            yield number, json.dumps({"id": str(number)}).encode()
+
+    report = asyncio.run(ingest_lines(lines(), json.loads, collection, chunk_size=2))
+
+    assert collection.calls == 3
+    assert [document["id"] for document in collection.documents] == ["1", "2", "5"]
+    assert (report["received"], report["inserted"], report["failed"]) == (5, 3, 2)
+    assert [result["success"] for result in report["results"]] == [True, True, False, False, True]
+    assert "connection closed" in report["results"][2]["errors"][0]
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from cache import ResponseCache
+
+
+class Loader:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.calls
+
+
+def test_concurrent_misses_share_one_load():
+    async def main():
+        cache, loader = ResponseCache(), Loader(delay=0.02)
+        values = await asyncio.gather(*[cache.get_or_load("k", loader, ttl=10) for _ in range(20)])
+        return values, loader, cache
+
+    values, loader, cache = asyncio.run(main())
+    assert values == [1] * 20
+    assert loader.calls == 1
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 19
+
+
+def test_stale_value_is_served_while_one_background_reload_runs():
+    async def main():
+        cache, loader = ResponseCache(), Loader(delay=0.02)
+        first = await cache.get_or_load("k", loader, ttl=0.01, stale_ttl=10)
+        await asyncio.sleep(0.02)
+        stale = await asyncio.gather(*[cache.get_or_load("k", loader, ttl=0.01, stale_ttl=10) for _ in range(5)])
+        await asyncio.sleep(0.05)
+        refreshed = cache._entries["k"][0]
+        return first, stale, refreshed, loader, cache
+
+    first, stale, refreshed, loader, cache = asyncio.run(main())
+    assert first == 1
+    assert stale == [1] * 5
+    assert refreshed == 2
+    assert loader.calls == 2
+    assert cache.stats()["stale_hits"] == 5
+
+
+def test_invalidation_during_a_load_discards_its_result():
+    async def main():
+        cache, loader = ResponseCache(), Loader(delay=0.02)
+        pending = asyncio.ensure_future(cache.get_or_load("contacts:first", loader, ttl=10))
+        await asyncio.sleep(0)
+        cache.invalidate("contacts:")
+        assert await pending == 1
+        return await cache.get_or_load("contacts:first", loader, ttl=10), loader
+
+    value, loader = asyncio.run(main())
+    assert value == 2 and loader.calls == 2
+
+
+def test_failed_load_is_not_cached():
+    async def main():
+        cache, calls = ResponseCache(), []
+
+        async def failing():
+            calls.append(1)
+            raise RuntimeError("mongo down")
+
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await cache.get_or_load("k", failing, ttl=10)
+        return calls
+
+    assert len(asyncio.run(main())) == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    async def main():
+        cache = ResponseCache(max_entries=2)
+        for key in ("a", "b"):
+            await cache.get_or_load(key, Loader(), ttl=10)
+        await cache.get_or_load("a", Loader(), ttl=10)
+        await cache.get_or_load("c", Loader(), ttl=10)
+        return cache
+
+    cache = asyncio.run(main())
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+
+from compression import CompressionMiddleware
+
+
+def json_app(size, status=200):
+    async def app(scope, receive, send):
+        headers = [(b"etag", b'"v1"')]
+        if status != 304:
+            headers.append((b"content-type", b"application/json"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if status == 304 else b"[" + b"1," * size + b"1]"})
+    return app
+
+
+def get(app, **headers):
+    async def main():
+        transport = httpx.ASGITransport(app=CompressionMiddleware(app, minimum_size=100))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            # httpx adds its own Accept-Encoding unless told otherwise
+            return await c.get("/", headers={"Accept-Encoding": "identity", **headers})
+    return asyncio.run(main())
+
+
+def test_compressed_response_varies_and_tags_encoding():
+    response = get(json_app(500), **{"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == '"v1-gzip"'
+    assert response.content.startswith(b"[1,")  # httpx decodes the gzip body
+
+
+def test_identity_responses_still_vary():
+    small = get(json_app(5), **{"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.headers["vary"] == "Accept-Encoding"
+
+    identity = get(json_app(500))
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["vary"] == "Accept-Encoding" and identity.headers["etag"] == '"v1"'
+
+    not_modified = get(json_app(0, status=304), **{"Accept-Encoding": "gzip"})
+    assert not_modified.status_code == 304 and not_modified.headers["vary"] == "Accept-Encoding"
+
+
+def test_non_text_responses_do_not_vary():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"image/png")]})
+        await send({"type": "http.response.body", "body": b"\x89PNG" * 100})
+
+    response = get(app, **{"Accept-Encoding": "gzip"})
+    assert "vary" not in response.headers and "content-encoding" not in response.headers
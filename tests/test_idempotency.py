@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from cache import ResponseCache
+
+CONTACT = {"name": "João Silva", "email": "joao@example.com", "message": "Gostaria de um orçamento."}
+
+
+def run(monkeypatch, scenario, window=600.0):
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "contact_writer", None)
+    monkeypatch.setattr(server, "IDEMPOTENCY_WINDOW", window)
+    monkeypatch.setattr(server, "idempotency_cache", ResponseCache())
+
+    async def main():
+        await db.contacts.create_index("idempotency_key", unique=True, sparse=True)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await scenario(client, db)
+
+    return asyncio.run(main())
+
+
+def test_zero_window_turns_content_dedup_off(monkeypatch):
+    async def scenario(client, db):
+        first = await client.post("/api/contacts", json=CONTACT)
+        second = await client.post("/api/contacts", json=CONTACT)
+        return first, second, await db.contacts.count_documents({})
+
+    first, second, stored = run(monkeypatch, scenario, window=0)
+    assert first.status_code == 200 and second.status_code == 200
+    assert first.json()["contact_id"] != second.json()["contact_id"]
+    assert "idempotent-replayed" not in second.headers
+    assert stored == 2
+
+
+def test_zero_window_still_honours_idempotency_key(monkeypatch):
+    async def scenario(client, db):
+        headers = {"Idempotency-Key": "form-1"}
+        return [await client.post("/api/contacts", json=CONTACT, headers=headers) for _ in range(2)]
+
+    first, second = run(monkeypatch, scenario, window=0)
+    assert second.json()["contact_id"] == first.json()["contact_id"]
+    assert second.headers["idempotent-replayed"] == "true"
+
+
+def test_reused_idempotency_key_with_another_body_is_rejected(monkeypatch):
+    async def scenario(client, db):
+        headers = {"Idempotency-Key": "form-1"}
+        first = await client.post("/api/contacts", json=CONTACT, headers=headers)
+        cached = await client.post("/api/contacts", json={**CONTACT, "name": "Maria Souza"}, headers=headers)
+        # Another worker: no cache entry, the unique index finds the original
+        server.idempotency_cache.invalidate()
+        stored = await client.post("/api/contacts", json={**CONTACT, "name": "Maria Souza"}, headers=headers)
+        same = await client.post("/api/contacts", json=CONTACT, headers=headers)
+        return first, cached, stored, same, await db.contacts.count_documents({})
+
+    first, cached, stored, same, count = run(monkeypatch, scenario)
+    assert cached.status_code == 422 and stored.status_code == 422
+    assert same.status_code == 200 and same.json()["contact_id"] == first.json()["contact_id"]
+    assert count == 1
@@ -0,0 +1,44 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from indexes import INDEXES, IndexSpec, ensure_indexes
+
+
+def status_check_specs(retention_days=0):
+    specs = [spec for spec in INDEXES if spec.collection == "status_checks" and "expireAfterSeconds" not in spec.options]
+    if retention_days:
+        specs.append(IndexSpec(
+            "status_checks", (("timestamp", 1),), "status_checks_timestamp_ttl",
+            "status check retention", {"expireAfterSeconds": int(retention_days * 86400)},
+        ))
+    return specs
+
+
+def test_disabled_retention_drops_the_ttl_index():
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        await ensure_indexes(db, specs=status_check_specs(retention_days=90))
+        assert "status_checks_timestamp_ttl" in await db.status_checks.index_information()
+
+        # Retention set back to 0: the report flags the index, --apply drops it
+        report = await ensure_indexes(db, dry_run=True, specs=status_check_specs())
+        still_there = "status_checks_timestamp_ttl" in await db.status_checks.index_information()
+        applied = await ensure_indexes(db, specs=status_check_specs())
+        return report, still_there, applied, await db.status_checks.index_information()
+
+    report, still_there, applied, indexes = asyncio.run(main())
+    stale = [row for row in report if row["name"] == "status_checks_timestamp_ttl"]
+    assert [row["status"] for row in stale] == ["stale"] and still_there
+    assert [row["status"] for row in applied if row["name"] == "status_checks_timestamp_ttl"] == ["dropped"]
+    assert "status_checks_timestamp_ttl" not in indexes
+    assert all(row["status"] in ("ok", "dropped") for row in applied)
+
+
+def test_declared_ttl_indexes_are_kept():
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        await ensure_indexes(db, specs=status_check_specs(retention_days=30))
+        return await ensure_indexes(db, specs=status_check_specs(retention_days=30))
+
+    assert all(row["status"] == "ok" for row in asyncio.run(main()))
@@ -0,0 +1,44 @@
+import socket
+import threading
+
+import pytest
+import uvicorn
+
+from cli import Launcher, _run_worker
+
+
+async def failing_startup_app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await receive()
+        await send({"type": "lifespan.startup.failed", "message": "database unreachable"})
+
+
+def test_worker_exits_non_zero_when_startup_fails():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    config = uvicorn.Config(failing_startup_app, lifespan="on", log_level="critical")
+    ready = threading.Event()
+    try:
+        with pytest.raises(SystemExit) as exit_info:
+            _run_worker(config, [sock], ready)
+    finally:
+        sock.close()
+    assert exit_info.value.code == 1
+    assert not ready.is_set()
+
+
+class FakeWorker:
+    def stop(self, timeout):
+        pass
+
+
+def test_rolling_restart_resets_the_crash_count(monkeypatch):
+    launcher = Launcher.__new__(Launcher)
+    launcher.graceful_timeout = 1
+    launcher.workers = [FakeWorker(), None]
+    launcher.crashes = [3, 7]
+    monkeypatch.setattr(launcher, "spawn_worker", lambda wait_ready: FakeWorker())
+
+    launcher.rolling_restart()
+
+    assert launcher.crashes == [0, 0]
@@ -0,0 +1,53 @@
+import asyncio
+import signal
+import socket
+import time
+
+import httpx
+import uvicorn
+from starlette.responses import StreamingResponse
+
+import server
+from cli import ShutdownAwareServer
+from live_feed import EventBroker, sse_stream
+
+
+def test_open_streams_do_not_hold_up_shutdown(monkeypatch):
+    broker = EventBroker()
+    monkeypatch.setattr(server, "live_feed", broker)
+
+    async def app(scope, receive, send):
+        response = StreamingResponse(sse_stream(broker, None, heartbeat=0.5, max_seconds=300), media_type="text/event-stream")
+        await response(scope, receive, send)
+
+    async def main():
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        config = uvicorn.Config(app, lifespan="off", timeout_graceful_shutdown=30, log_level="warning")
+        uvicorn_server = ShutdownAwareServer(config)
+        serving = asyncio.ensure_future(uvicorn_server.serve(sockets=[sock]))
+        while not uvicorn_server.started:
+            await asyncio.sleep(0.01)
+
+        async with httpx.AsyncClient() as client:
+            async with client.stream("GET", f"http://127.0.0.1:{port}/") as response:
+                chunks = response.aiter_bytes()
+                assert (await chunks.__anext__()).startswith(b"retry:")
+                started = time.monotonic()
+                uvicorn_server.handle_exit(signal.SIGTERM, None)
+                await asyncio.wait_for(serving, 10)
+                return time.monotonic() - started
+
+    assert asyncio.run(main()) < 5
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_streams_opened_after_close_end_at_once():
+    broker = EventBroker()
+    broker.close()
+
+    async def main():
+        return [chunk async for chunk in sse_stream(broker, None, max_seconds=300)]
+
+    assert asyncio.run(main()) == [b"retry: 3000\n\n"]
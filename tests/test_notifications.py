@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from notifications import (
+    PENDING_FIELD, OutboxDispatcher, SMTPMailer, SMTPSink, build_notifications, enqueue_notifications,
+)
+
+
+def contact(contact_id="c1", created_at=None):
+    return {
+        "id": contact_id, "name": "João Silva", "email": "joao@example.com", "phone": None,
+        "service": "Consultoria", "message": "Gostaria de um orçamento.", "status": "new",
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+def build(contact_doc):
+    return build_notifications(contact_doc, admin_email="admin@example.com")
+
+
+async def with_sink(scenario, **options):
+    """Run `scenario(db, dispatcher, sink)` against a real SMTP conversation with SMTPSink."""
+    sink = SMTPSink()
+    port = await sink.start()
+    db = AsyncMongoMockClient()["test"]
+    mailer = SMTPMailer("127.0.0.1", port, "site@example.com", timeout=5)
+    dispatcher = OutboxDispatcher(db.outbox, mailer=mailer, backoff_base=0, contacts=db.contacts, build=build, **options)
+    try:
+        return await scenario(db, dispatcher, sink)
+    finally:
+        await asyncio.to_thread(mailer.close)
+        await sink.stop()
+
+
+def test_delivers_through_smtp():
+    async def scenario(db, dispatcher, sink):
+        await enqueue_notifications(db.outbox, build(contact()))
+        assert await dispatcher.dispatch_once() == 1
+        return sink.messages, await db.outbox.find_one({})
+
+    messages, doc = asyncio.run(with_sink(scenario))
+    assert len(messages) == 1
+    assert messages[0]["To"] == "admin@example.com" and messages[0]["Reply-To"] == "joao@example.com"
+    assert "Gostaria de um orçamento." in messages[0].get_content()
+    assert doc["status"] == "sent" and doc["attempts"] == 1
+
+
+def test_transient_rejection_is_retried():
+    async def scenario(db, dispatcher, sink):
+        await enqueue_notifications(db.outbox, build(contact()))
+        sink.fail_codes.append(451)
+        await dispatcher.dispatch_once()
+        after_failure = await db.outbox.find_one({})
+        await dispatcher.dispatch_once()
+        return sink.messages, after_failure, await db.outbox.find_one({})
+
+    messages, after_failure, doc = asyncio.run(with_sink(scenario))
+    assert after_failure["status"] == "pending" and after_failure["attempts"] == 1
+    assert "451" in after_failure["last_error"]
+    assert len(messages) == 1 and doc["status"] == "sent" and doc["attempts"] == 2
+
+
+def test_permanent_rejection_and_exhausted_attempts_are_dead_lettered():
+    async def scenario(db, dispatcher, sink):
+        await enqueue_notifications(db.outbox, build(contact("rejected")))
+        sink.fail_codes.append(550)
+        await dispatcher.dispatch_once()
+        await enqueue_notifications(db.outbox, build(contact("flaky")))
+        sink.fail_codes.extend([451, 451])
+        await dispatcher.dispatch_once()
+        await dispatcher.dispatch_once()
+        return sink.messages, {doc["contact_id"]: doc async for doc in db.outbox.find({})}
+
+    messages, docs = asyncio.run(with_sink(scenario, max_attempts=2))
+    assert messages == []
+    assert docs["rejected"]["status"] == "dead" and docs["rejected"]["attempts"] == 1
+    assert docs["flaky"]["status"] == "dead" and docs["flaky"]["attempts"] == 2
+
+
+def test_sweep_queues_contacts_left_pending():
+    async def scenario(db, dispatcher, sink):
+        old = datetime.utcnow() - timedelta(minutes=5)
+        await db.contacts.insert_many([
+            {**contact("lost", old), PENDING_FIELD: True},
+            # Still inside its own post-store step
+            {**contact("fresh"), PENDING_FIELD: True},
+            contact("queued", old),
+        ])
+        assert await dispatcher.sweep() == 1
+        await dispatcher.dispatch_once()
+        pending = [doc["id"] async for doc in db.contacts.find({PENDING_FIELD: True})]
+        return sink.messages, pending, await db.outbox.find_one({})
+
+    messages, pending, doc = asyncio.run(with_sink(scenario))
+    assert pending == ["fresh"]
+    assert doc["_id"] == "lost:admin_email" and doc["status"] == "sent"
+    assert len(messages) == 1
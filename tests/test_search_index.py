@@ -0,0 +1,44 @@
+import asyncio
+from datetime import datetime, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from search_index import ContactSearchIndex
+
+
+def contact(contact_id, name, service="Consultoria Empresarial"):
+    return {"id": contact_id, "name": name, "email": f"{contact_id}@empresa.com.br", "service": service,
+            "message": "Gostaria de saber mais sobre gestão.", "created_at": datetime.now(timezone.utc)}
+
+
+def test_removed_contacts_leave_total_and_pages():
+    index = ContactSearchIndex()
+    for i in range(5):
+        index.add(contact(f"c{i}", f"Cliente {i}"))
+    assert index.search("gestao")[0] == 5
+
+    assert index.remove(["c1", "c3", "missing"]) == 2
+    total, ranked = index.search("gestao", limit=10)
+    assert total == 3 and sorted(i for i, _ in ranked) == ["c0", "c2", "c4"]
+    assert len(index) == 3
+
+    # Restored from the archive: searchable again without being indexed twice
+    index.add(contact("c1", "Cliente 1"))
+    assert index.search("gestao")[0] == 4 and len(index) == 4
+
+
+def test_refresh_prunes_contacts_gone_from_the_collection():
+    async def main():
+        collection = AsyncMongoMockClient()["test"]["contacts"]
+        await collection.insert_many([contact(f"c{i}", f"Cliente {i}") for i in range(4)])
+        index = ContactSearchIndex()
+        await index.refresh(collection, force=True)
+        assert index.search("cliente")[0] == 4
+
+        # Archived by another process: this worker never sees the move itself
+        await collection.delete_many({"id": {"$in": ["c0", "c2"]}})
+        await index.refresh(collection, force=True)
+        return index.search("cliente", limit=10)
+
+    total, ranked = asyncio.run(main())
+    assert total == 2 and sorted(i for i, _ in ranked) == ["c1", "c3"]
@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from stats_timeseries import COLLECTION, bucket_id, record_contacts_rolled_up, reconcile_rollups
+
+
+def test_backfill_leaves_live_buckets_alone():
+    now = datetime.utcnow()
+    old = now - timedelta(days=10)
+
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        await db.contacts.insert_many([
+            {"id": "old-1", "created_at": old, "service": "Consultoria"},
+            {"id": "old-2", "created_at": old, "service": "Consultoria"},
+            {"id": "new-1", "created_at": now, "service": "Consultoria"},
+        ])
+        # Today's bucket was counted live (by two workers, say) and must survive the backfill
+        await record_contacts_rolled_up(db, [{"created_at": now, "service": "Consultoria"}] * 2)
+        stale = (old - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        await db[COLLECTION].insert_one({"_id": bucket_id(stale.date(), None), "day": stale, "service": None, "count": 4})
+
+        drift = await reconcile_rollups(db, apply=True)
+        counts = {doc["_id"]: doc["count"] async for doc in db[COLLECTION].find()}
+        return drift, counts
+
+    drift, counts = asyncio.run(main())
+    assert counts == {
+        bucket_id(old.date(), "Consultoria"): 2,
+        bucket_id(now.date(), "Consultoria"): 2,
+    }
+    assert {row["bucket"] for row in drift} == {
+        bucket_id(old.date(), "Consultoria"), bucket_id((old - timedelta(days=1)).date(), None),
+    }
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pymongo
+import pytest
+from bson import Binary, ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from archive import archive_contacts
+from storage_schema import (
+    ReplaceOne, StorageSchema, UpdateOne, drop_id_indexes, rekey_collection, storage_database, strip_ids, uuid_key,
+)
+
+CONTACT_ID = "0b7e5a52-1f3c-4d47-9a3e-2d8f6f1c0a11"
+
+
+def test_bulk_requests_are_rebuilt_from_their_arguments():
+    schema = StorageSchema("compact")
+    collation = {"locale": "pt"}
+    update = schema.request(UpdateOne(
+        {"id": CONTACT_ID}, {"$set": {"tags.$[t]": "x"}}, upsert=True, collation=collation, array_filters=[{"t": "y"}],
+    ))
+    assert type(update) is UpdateOne
+    assert update.arguments == {
+        "filter": {"_id": uuid_key(CONTACT_ID)}, "update": {"$set": {"tags.$[t]": "x"}}, "upsert": True,
+        "collation": collation, "array_filters": [{"t": "y"}],
+    }
+    replace = schema.request(ReplaceOne({"id": CONTACT_ID}, {"id": CONTACT_ID, "name": "A"}))
+    assert replace.arguments["replacement"] == {"_id": uuid_key(CONTACT_ID), "name": "A"}
+
+    with pytest.raises(TypeError):
+        schema.request(pymongo.UpdateOne({"id": CONTACT_ID}, {"$set": {"name": "B"}}))
+    with pytest.raises(TypeError):
+        schema.request(UpdateOne({"id": CONTACT_ID}, {"$set": {"name": "B"}}, hint="contacts_id_unique"))
+
+
+def test_untranslated_collection_methods_are_refused():
+    db = storage_database(AsyncMongoMockClient()["test"], "compact")
+    assert db.contacts.name == "contacts"
+    for name in ("replace_one", "delete_one", "distinct", "find_one_and_update", "rename"):
+        with pytest.raises(AttributeError):
+            getattr(db.contacts, name)
+    # Collections outside the schema are the driver's own
+    assert db.outbox.replace_one is not None
+
+
+async def post_contact(client, i):
+    response = await client.post("/api/contacts", json={
+        "name": f"Nome {i}", "email": f"contato{i}@empresa.com.br", "message": f"Mensagem de teste {i}",
+        "service": "Consultoria",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["contact_id"]
+
+
+async def list_ids(client, **params):
+    response = await client.get("/api/contacts", params={"limit": 100, **params})
+    assert response.status_code == 200, response.text
+    return [row["id"] for row in response.json()["contacts"]]
+
+
+def test_migration_keeps_the_api_working_at_every_step(monkeypatch):
+    raw = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", raw)
+    monkeypatch.setattr(server, "contact_writer", None)
+
+    async def main():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            ids = [await post_contact(client, i) for i in range(3)]
+            assert isinstance((await raw.contacts.find_one({"id": ids[0]}))["_id"], ObjectId)
+            listed = await list_ids(client)
+
+            # 1. Workers on "migrating": new documents are keyed by their UUID, old ones still found
+            monkeypatch.setattr(server, "db", storage_database(raw, "migrating"))
+            ids.append(await post_contact(client, 3))
+            assert (await raw.contacts.find_one({"id": ids[3]}))["_id"] == uuid_key(ids[3])
+            response = await client.patch(f"/api/contacts/{ids[0]}", json={"status": "contacted"})
+            assert response.status_code == 200, response.text
+
+            # 2. Re-key the remaining documents
+            counts = await rekey_collection(raw, "contacts", batch_size=2)
+            assert counts == {"rekeyed": 3, "changed": 0, "skipped": 0, "restored": 0}
+            assert await raw.contacts.count_documents({"_id": {"$type": "objectId"}}) == 0
+            server.response_cache.invalidate()
+            assert await list_ids(client) == [ids[3], *listed]
+
+            # 3. Workers on "compact": no id field on new documents, status updates go through bulk_write
+            monkeypatch.setattr(server, "db", storage_database(raw, "compact"))
+            ids.append(await post_contact(client, 4))
+            assert "id" not in await raw.contacts.find_one({"_id": uuid_key(ids[4])})
+            response = await client.post("/api/contacts/status:batch", json={"updates": [
+                {"id": ids[1], "status": "contacted"}, {"id": ids[4], "status": "contacted"},
+            ]})
+            assert response.json()["updated"] == 2, response.text
+
+            # Archiving replaces into contacts_archive through the wrapper
+            await raw.contacts.update_one(
+                {"_id": uuid_key(ids[0])}, {"$set": {"status": "closed", "updated_at": datetime.utcnow() - timedelta(days=400)}}
+            )
+            assert await archive_contacts(server.db, 365) == 1
+            assert isinstance((await raw.contacts_archive.find_one({}))["_id"], Binary)
+
+            # 4. Strip the id fields
+            assert await strip_ids(raw, "contacts", batch_size=2) == 3
+            await drop_id_indexes(raw, "contacts", unique_only=False)
+            server.response_cache.invalidate()
+            return ids, await list_ids(client), await list_ids(client, include_archived="true")
+
+    ids, hot, everything = asyncio.run(main())
+    assert hot == [ids[4], ids[3], ids[2], ids[1]]
+    assert everything == [ids[4], ids[3], ids[2], ids[1], ids[0]]
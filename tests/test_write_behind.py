@@ -0,0 +1,83 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect, BulkWriteError, DuplicateKeyError
+
+from write_behind import BatchWriter
+
+
+class FlakyCollection:
+    """Stores every insert, but the first `failures` calls then report a network error."""
+
+    def __init__(self, failures: int = 1):
+        self.failures = failures
+        self.docs = {}
+        self.keys = set()
+
+    async def insert_many(self, documents, ordered=False):
+        errors = []
+        for index, doc in enumerate(documents):
+            if doc["id"] in self.docs or doc.get("key") in self.keys:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                continue
+            self.docs[doc["id"]] = doc
+            if doc.get("key"):
+                self.keys.add(doc["key"])
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    def find(self, query, projection=None):
+        async def rows():
+            for doc_id in query["id"]["$in"]:
+                if doc_id in self.docs:
+                    yield {"id": doc_id}
+        return rows()
+
+
+def run_batch(collection, documents, retries=3):
+    async def main():
+        flushed = []
+
+        async def on_flushed(docs):
+            flushed.extend(docs)
+
+        writer = BatchWriter(collection, flush_interval=0.01, retries=retries, on_flushed=on_flushed)
+        writer.start()
+        results = await asyncio.gather(
+            *[writer.submit(doc, wait=True) for doc in documents], return_exceptions=True
+        )
+        await writer.stop()
+        return results, flushed, writer
+
+    return asyncio.run(main())
+
+
+def test_retry_after_network_error_keeps_documents_stored_by_first_attempt():
+    documents = [{"id": f"c{i}"} for i in range(5)]
+    results, flushed, writer = run_batch(FlakyCollection(failures=1), documents)
+
+    assert results == [None] * 5
+    assert [doc["id"] for doc in flushed] == [doc["id"] for doc in documents]
+    assert writer.stats()["written"] == 5 and writer.stats()["failed"] == 0
+
+
+def test_retry_still_fails_real_duplicates():
+    collection = FlakyCollection(failures=1)
+    collection.keys.add("taken")
+    documents = [{"id": "c1"}, {"id": "c2", "key": "taken"}]
+    results, flushed, writer = run_batch(collection, documents)
+
+    assert results[0] is None
+    assert isinstance(results[1], DuplicateKeyError)
+    assert [doc["id"] for doc in flushed] == ["c1"]
+
+
+def test_exhausted_retries_only_fail_documents_not_stored():
+    collection = FlakyCollection(failures=10)
+    results, flushed, writer = run_batch(collection, [{"id": "c1"}, {"id": "c2"}], retries=2)
+
+    # Every attempt stored them before the error, so none is lost
+    assert results == [None, None]
+    assert writer.stats()["failed"] == 0